@@ -1,4 +1,5 @@
 __version__ = "0.3.2"
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import struct
 
@@ -36,6 +37,16 @@ def _check_files(filename, exts):
             raise OSError('File "{}" was not found.'.format(ps))
     return p
 
+def mosaic_files(filename, tile_ext=".dmd"):
+    """
+    Return paths of the .dmt file and all tile files (tile_ext is .dmd or
+    .drd) of a mosaic.
+    """
+    p = _check_files(filename, [".dmt", tile_ext])
+    dmt = p.parent.joinpath(p.with_suffix(".dmt").name.lower())
+    tiles = p.parent.glob(p.stem + "_[0-9][0-9][0-9][0-9]_[0-9][0-9][0-9][0-9]" + tile_ext)
+    return [dmt] + sorted(tiles)
+
 def _readint(f):
     return struct.unpack("i", f.read(4))[0]
 
@@ -187,6 +198,21 @@ def _fpa_size(datasize, Npts):
     fpasize = int(np.sqrt(fpasize))
     return fpasize
 
+def _read_tile_file(p, mmap=False):
+    """
+    Read the raw float32 contents of a .dat, .dmd, .seq or .drd file.
+
+    Args:
+        p (Path):       path to the tile file
+        mmap (bool):    Map the file into memory instead of reading it.
+                        _reshape_tile() then returns a view into the mapping,
+                        so data is only read from disk when it is accessed.
+    """
+    if mmap:
+        return np.memmap(p, dtype=np.float32, mode='r')
+    with p.open(mode='rb') as f:
+        return np.fromfile(f, dtype=np.float32)
+
 def _reshape_tile(data, shape):
     """
     Reshape and transpose FPA tile data
@@ -200,6 +226,46 @@ def _reshape_tile(data, shape):
     return data
 
 
+def _fill_mosaic(data, tiles, fpasize, MAT, workers=1, callback=None, bands=slice(None)):
+    """
+    Read tiles with a pool of threads and copy each into its slot of the
+    preallocated mosaic array [ rows, columns, wavelengths ]
+
+    Args:
+        data (:obj:`ndarray`):  output mosaic array
+        tiles (:obj:`ndarray`): array of tile loading closures
+        fpasize (int):          FPA size
+        MAT (bool):             Output array using image coordinates (matplotlib/MATLAB)
+        workers (int):          Number of threads reading tiles concurrently
+        callback (callable):    Called with the fraction of tiles read
+        bands (slice or array): Index of wavelengths to copy
+    """
+    ytiles = tiles.shape[1]
+
+    def _fill_tile(x, y):
+        # memory-mapped tiles are stored band by band, so only the pages
+        # of the selected bands are read
+        tile = tiles[x, y]()[:, :, bands]
+        if MAT:
+            # Rotate and flip tile to match matplotlib/MATLAB image coordinates
+            tile = np.flipud(tile)
+            data[y*fpasize:(y+1)*fpasize, x*fpasize:(x+1)*fpasize, :] = tile
+        else:
+            # Tile data is in normal cartesian coordinates
+            # but tile numbering (000x_000y)
+            # is left-to-right, top-to-bottom (image coordinates)
+            data[(ytiles-y-1)*fpasize:(ytiles-y)*fpasize, (x)*fpasize:(x+1)*fpasize, :] = tile
+
+    # tiles do not overlap, so threads can write into data without locking;
+    # file reads and array copies release the GIL
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_fill_tile, x, y) for (x, y) in np.ndindex(tiles.shape)]
+        for i, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if callback is not None:
+                callback(i / len(futures))
+
+
 class DataObject(object):
     """
     Simple container of a data array and information about that array.
@@ -224,6 +290,7 @@ class agilentImage(DataObject):
     Args:
         filename (str): full path to .dat file
         MAT (bool):     Output array using image coordinates (matplotlib/MATLAB)
+        mmap (bool):    Memory-map the .dat file; .data is then a read-only view
 
     Attributes:
         info (dict):            Dictionary of acquisition information
@@ -238,10 +305,11 @@ class agilentImage(DataObject):
     https://bitbucket.org/AlexHenderson/agilent-file-formats
     """
 
-    def __init__(self, filename, MAT=False):
+    def __init__(self, filename, MAT=False, mmap=False):
         super().__init__()
         p = _check_files(filename, [".dat", ".bsp"])
         self.MAT = MAT
+        self.mmap = mmap
         self._get_bsp_info(p)
         self._get_dat(p)
 
@@ -259,8 +327,7 @@ class agilentImage(DataObject):
 
     def _get_dat(self, p_in):
         p = p_in.with_suffix(".dat")
-        with p.open(mode='rb') as f:
-            data = np.fromfile(f, dtype=np.float32)
+        data = _read_tile_file(p, self.mmap)
         fpasize = _fpa_size(data.size, self.info['Npts'])
         data = _reshape_tile(data, (self.info['Npts'], fpasize, fpasize))
 
@@ -278,17 +345,19 @@ class agilentMosaicTiles(DataObject):
     UNSTABLE API
 
     This class provides an array of _get_dmd() closures to allow lazy tile-by-tile
-    file loading by consumers.
+    file loading by consumers. With mmap=True the closures return read-only
+    views into memory-mapped .dmd files instead of reading them.
 
     The API is not considered stable at this time, so if you are wish to load
     mosiac files with a stable interface, use agilentMosaic as in previous
     versions.
     """
 
-    def __init__(self, filename, MAT=False):
+    def __init__(self, filename, MAT=False, mmap=False):
         super().__init__()
         p = _check_files(filename, [".dmt", ".dmd"])
         self.MAT = MAT
+        self.mmap = mmap
         self._get_dmt_info(p)
         self._get_tiles(p)
 
@@ -325,14 +394,13 @@ class agilentMosaicTiles(DataObject):
         tiles = np.zeros((xtiles, ytiles), dtype=object)
         for (x, y) in np.ndindex(tiles.shape):
             p_dmd = p_in.parent.joinpath(p_in.stem + "_{0:04d}_{1:04d}.dmd".format(x,y))
-            tiles[x, y] = self._get_dmd(p_dmd, Npts, fpasize)
+            tiles[x, y] = self._get_dmd(p_dmd, Npts, fpasize, self.mmap)
         self.tiles = tiles
 
     @staticmethod
-    def _get_dmd(p_dmd, Npts, fpasize):
+    def _get_dmd(p_dmd, Npts, fpasize, mmap=False):
         def _get_dmd_data(p_dmd=p_dmd):
-            with p_dmd.open(mode='rb') as f:
-                tile = np.fromfile(f, dtype=np.float32)
+            tile = _read_tile_file(p_dmd, mmap)
             tile = _reshape_tile(tile, (Npts, fpasize, fpasize))
             return tile
         return _get_dmd_data
@@ -348,6 +416,12 @@ class agilentMosaic(agilentMosaicTiles):
         filename (str):   full path to .dmt file
         MAT (bool):       Output array using image coordinates (matplotlib/MATLAB)
         dtype (np.dtype): Set dtype of output array (float32 or float64)
+        mmap (bool):      Memory-map the tile files and assemble .data only
+                          when it is first accessed
+        workers (int):    Number of threads reading tiles concurrently
+                          (None for the ThreadPoolExecutor default)
+        callback (callable): Called with the fraction of tiles read
+        bands (slice or array): Index of wavenumbers to read (default: all)
 
     Attributes:
         info (dict):            Dictionary of acquisition information
@@ -362,15 +436,48 @@ class agilentMosaic(agilentMosaicTiles):
     https://bitbucket.org/AlexHenderson/agilent-file-formats
     """
 
-    def __init__(self, filename, MAT=False, dtype=np.float32):
-        super().__init__(filename, MAT)
+    def __init__(self, filename, MAT=False, dtype=np.float32, mmap=False,
+                 workers=1, callback=None, bands=slice(None)):
+        super().__init__(filename, MAT, mmap)
         self.dtype = dtype
-        self._get_data()
+        self.workers = workers
+        self.callback = callback
+        self.bands = slice(None)
+        self.data = None
+        self.select_bands(bands)
+        if not mmap:
+            self._get_data()
+
+    def select_bands(self, bands):
+        """
+        Keep only bands (slice or array), an index into the current
+        wavenumbers. With mmap, bands are selected before tiles are read
+        if .data was not accessed yet.
+        """
+        index = np.arange(len(self.info['wavenumbers']))[self.bands][bands]
+        if len(index) and np.all(np.diff(index) == 1):
+            # slices of memory-mapped tiles are views
+            index = slice(index[0], index[-1] + 1)
+        self.bands = index
+        self.wavenumbers = list(np.asarray(self.info['wavenumbers'])[self.bands])
+        if self._data is not None:
+            self._data = self._data[:, :, bands]
+
+    @property
+    def data(self):
+        if self._data is None:
+            # Lazy assembly of memory-mapped tiles
+            self._get_data()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
 
     def _get_data(self):
         xtiles = self.tiles.shape[0]
         ytiles = self.tiles.shape[1]
-        Npts = self.info['Npts']
+        Npts = len(self.wavenumbers)
         fpasize = self.info['fpasize']
         # Allocate array
         # (rows, columns, wavenumbers)
@@ -380,17 +487,8 @@ class agilentMosaic(agilentMosaicTiles):
             print("self.tiles: ", self.tiles.shape)
             print("self.data: ", data.shape)
 
-        for (x, y) in np.ndindex(self.tiles.shape):
-            tile = self.tiles[x, y]()
-            if self.MAT:
-                # Rotate and flip tile to match matplotlib/MATLAB image coordinates
-                tile = np.flipud(tile)
-                data[y*fpasize:(y+1)*fpasize, x*fpasize:(x+1)*fpasize, :] = tile
-            else:
-                # Tile data is in normal cartesian coordinates
-                # but tile numbering (000x_000y)
-                # is left-to-right, top-to-bottom (image coordinates)
-                data[(ytiles-y-1)*fpasize:(ytiles-y)*fpasize, (x)*fpasize:(x+1)*fpasize, :] = tile
+        _fill_mosaic(data, self.tiles, fpasize, self.MAT,
+                     workers=self.workers, callback=self.callback, bands=self.bands)
 
         self.data = data
 
@@ -402,6 +500,7 @@ class agilentImageIFG(DataObject):
     Args:
         filename (str): full path to .seq file
         MAT (bool):     Output array using image coordinates (matplotlib/MATLAB)
+        mmap (bool):    Memory-map the .seq file; .data is then a read-only view
 
     Attributes:
         info (dict):            Dictionary of acquisition information
@@ -409,10 +508,11 @@ class agilentImageIFG(DataObject):
         filename (str):         Full path to .bsp file
     """
 
-    def __init__(self, filename, MAT=False):
+    def __init__(self, filename, MAT=False, mmap=False):
         super().__init__()
         p = _check_files(filename, [".seq", ".bsp"])
         self.MAT = MAT
+        self.mmap = mmap
         self._get_bsp_info(p)
         self._get_seq(p)
 
@@ -426,8 +526,7 @@ class agilentImageIFG(DataObject):
 
     def _get_seq(self, p_in):
         p = p_in.with_suffix(".seq")
-        with p.open(mode='rb') as f:
-            data = np.fromfile(f, dtype=np.float32)
+        data = _read_tile_file(p, self.mmap)
         fpasize = _fpa_size(data.size, self.info['Npts'])
         data = _reshape_tile(data, (self.info['Npts'], fpasize, fpasize))
 
@@ -446,17 +545,19 @@ class agilentMosaicIFGTiles(DataObject):
     UNSTABLE API
 
     This class provides an array of _get_drd() closures to allow lazy tile-by-tile
-    file loading by consumers.
+    file loading by consumers. With mmap=True the closures return read-only
+    views into memory-mapped .drd files instead of reading them.
 
     The API is not considered stable at this time, so if you are wish to load
     mosiac files with a stable interface, use agilentMosaic as in previous
     versions.
     """
 
-    def __init__(self, filename, MAT=False):
+    def __init__(self, filename, MAT=False, mmap=False):
         super().__init__()
         p = _check_files(filename, [".dmt", ".drd"])
         self.MAT = MAT
+        self.mmap = mmap
         self._get_dmt_info(p)
         self._get_tiles(p)
 
@@ -489,14 +590,13 @@ class agilentMosaicIFGTiles(DataObject):
         tiles = np.zeros((xtiles, ytiles), dtype=object)
         for (x, y) in np.ndindex(tiles.shape):
             p_drd = p_in.parent.joinpath(p_in.stem + "_{0:04d}_{1:04d}.drd".format(x,y))
-            tiles[x, y] = self._get_drd(p_drd, Npts, fpasize)
+            tiles[x, y] = self._get_drd(p_drd, Npts, fpasize, self.mmap)
         self.tiles = tiles
 
     @staticmethod
-    def _get_drd(p_drd, Npts, fpasize):
+    def _get_drd(p_drd, Npts, fpasize, mmap=False):
         def _get_drd_data(p_drd=p_drd):
-            with p_drd.open(mode='rb') as f:
-                tile = np.fromfile(f, dtype=np.float32)
+            tile = _read_tile_file(p_drd, mmap)
             tile = _reshape_tile(tile, (Npts, fpasize, fpasize))
             return tile
         return _get_drd_data
@@ -510,6 +610,11 @@ class agilentMosaicIFG(agilentMosaicIFGTiles):
         filename (str):   full path to .dmt file
         MAT (bool):       Output array using image coordinates (matplotlib/MATLAB)
         dtype (np.dtype): Set dtype of output array (float32 or float64))
+        mmap (bool):      Memory-map the tile files and assemble .data only
+                          when it is first accessed
+        workers (int):    Number of threads reading tiles concurrently
+                          (None for the ThreadPoolExecutor default)
+        callback (callable): Called with the fraction of tiles read
 
     Attributes:
         info (dict):            Dictionary of acquisition information
@@ -517,10 +622,26 @@ class agilentMosaicIFG(agilentMosaicIFGTiles):
         filename (str):         Full path to .dmt file
     """
 
-    def __init__(self, filename, MAT=False, dtype=np.float32):
-        super().__init__(filename, MAT)
+    def __init__(self, filename, MAT=False, dtype=np.float32, mmap=False,
+                 workers=1, callback=None):
+        super().__init__(filename, MAT, mmap)
         self.dtype = dtype
-        self._get_data()
+        self.workers = workers
+        self.callback = callback
+        self.data = None
+        if not mmap:
+            self._get_data()
+
+    @property
+    def data(self):
+        if self._data is None:
+            # Lazy assembly of memory-mapped tiles
+            self._get_data()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
 
     def _get_data(self):
         xtiles = self.tiles.shape[0]
@@ -535,16 +656,7 @@ class agilentMosaicIFG(agilentMosaicIFGTiles):
             print("self.tiles: ", self.tiles.shape)
             print("self.data: ", data.shape)
 
-        for (x, y) in np.ndindex(self.tiles.shape):
-            tile = self.tiles[x, y]()
-            if self.MAT:
-                # Rotate and flip tile to match matplotlib/MATLAB image coordinates
-                tile = np.flipud(tile)
-                data[y*fpasize:(y+1)*fpasize, x*fpasize:(x+1)*fpasize, :] = tile
-            else:
-                # Tile data is in normal cartesian coordinates
-                # but tile numbering (000x_000y)
-                # is left-to-right, top-to-bottom (image coordinates)
-                data[(ytiles-y-1)*fpasize:(ytiles-y)*fpasize, (x)*fpasize:(x+1)*fpasize, :] = tile
+        _fill_mosaic(data, self.tiles, fpasize, self.MAT,
+                     workers=self.workers, callback=self.callback)
 
         self.data = data
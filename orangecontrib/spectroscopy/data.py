@@ -1,27 +1,42 @@
-from collections import defaultdict
-from functools import reduce
-import numbers
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce, lru_cache
+from itertools import chain
+import json
 import struct
 from html.parser import HTMLParser
+from weakref import WeakKeyDictionary
 
 import numpy as np
 import spectral.io.envi
-from scipy.interpolate import interp1d
 from scipy.io import matlab
 
 import Orange
 from Orange.data import \
-    ContinuousVariable, StringVariable, TimeVariable, Domain, Table
+    ContinuousVariable, DiscreteVariable, StringVariable, TimeVariable, Domain, Table
 from Orange.data.io import FileFormat
 import Orange.data.io
 
 from .pymca5 import OmnicMap
-from .agilent import agilentImage, agilentMosaic, agilentImageIFG, agilentMosaicIFG, agilentMosaicTiles
+from .agilent import agilentImage, agilentMosaic, agilentImageIFG, agilentMosaicIFG, \
+    agilentMosaicTiles, mosaic_files
 from .utils import spc
+from .utils.cache import spectra_cache
 
 
 class SpectralFileFormat:
 
+    # outputs of read() are cached on disk (see SpectraCache) for readers
+    # that are slow to parse their files
+    CACHEABLE = False
+    # increase when read_spectra output changes to invalidate cached outputs
+    CACHE_VERSION = 0
+
+    def source_files(self):
+        """ Return paths of all files read_spectra reads; cached outputs
+        are used only while none of them change. """
+        return [self.filename]
+
     def read_spectra(self):
         """ Fast reading of spectra. Return spectral information
         in two arrays (wavelengths and values). Only additional
@@ -35,7 +50,7 @@ class SpectralFileFormat:
         pass
 
     def read(self):
-        return build_spec_table(*self.read_spectra())
+        return build_spec_table(*spectra_cache.read_spectra(self))
 
 
 class AsciiColReader(FileFormat, SpectralFileFormat):
@@ -43,11 +58,22 @@ class AsciiColReader(FileFormat, SpectralFileFormat):
     contains the wavelengths, the others contain the spectra. """
     EXTENSIONS = ('.dat', '.dpt', '.xy',)
     DESCRIPTION = 'Spectra ASCII'
+    CACHEABLE = True
+    CACHE_VERSION = 1
 
-    def read_spectra(self):
-        tbl = np.loadtxt(self.filename, ndmin=2)
-        wavenumbers = tbl.T[0]  # first column is attribute name
-        datavals = tbl.T[1:]
+    def read_spectra(self, spectra=None, dtype=np.float64):
+        """
+        Args:
+            spectra: indices of spectra (columns after the first) to read
+            dtype: dtype of spectra; np.float32 halves the memory use
+        """
+        usecols = None if spectra is None else [0] + [s + 1 for s in spectra]
+        with open(self.filename, "rb") as f:
+            cols = _read_ascii_columns(f, usecols=usecols, dtype=[np.float64, dtype])
+            if not cols:
+                raise ValueError("No data")
+        wavenumbers = cols[0]  # first column is attribute name
+        datavals = np.array(cols[1:], dtype=dtype).reshape(len(cols) - 1, len(wavenumbers))
         return wavenumbers, datavals, None
 
     @staticmethod
@@ -104,7 +130,7 @@ class AsciiMapReader(FileFormat):
             header = [a.strip() for a in header]
             assert header[0] == header[1] == ""
             dom_vals = [float(v) for v in header[2:]]
-            domain = Orange.data.Domain([ContinuousVariable.make("%f" % f) for f in dom_vals], None)
+            domain = spectral_domain(dom_vals)
             tbl = np.loadtxt(f, ndmin=2)
             data = Table.from_numpy(domain, X=tbl[:, 2:])
             metas = [ContinuousVariable.make('map_x'), ContinuousVariable.make('map_y')]
@@ -142,6 +168,150 @@ def _metatable_maplocs(x_locs, y_locs):
     return data
 
 
+def _interval_index(xs, limits):
+    """
+    Return an index of xs values within the closed interval limits, which
+    is a slice if the selected values are consecutive (so that indexing
+    returns a view). None limits select everything.
+    """
+    if limits is None:
+        return slice(None)
+    low, high = min(limits), max(limits)
+    ind = np.flatnonzero((xs >= low) & (xs <= high))
+    if len(ind) and np.all(np.diff(ind) == 1):
+        return slice(ind[0], ind[-1] + 1)
+    return ind
+
+
+# approximate number of bytes of text parsed at once
+_ASCII_CHUNK_SIZE = 2 ** 24
+
+
+def _read_ascii_columns(f, usecols=None, dtype=np.float64, chunk_size=None):
+    """
+    Read whitespace separated columns from a file opened in binary mode.
+
+    The file is read once, in chunks of whole lines, so that only one chunk
+    of text is held in memory at a time. Text after # is a comment and
+    empty lines are skipped. The number of columns is given by the first data line.
+
+    Args:
+        f: file object open for reading in binary mode
+        usecols: indices of columns to read (default: all); other columns
+            are not converted
+        dtype: dtype of all columns or a sequence of dtypes of the first
+            selected columns, where the last dtype is used for the remaining
+            columns ("S" dtypes keep text)
+        chunk_size: approximate size of a chunk in bytes
+
+    Returns:
+        a list of 1D arrays, one for each selected column
+    """
+    chunk_size = chunk_size or _ASCII_CHUNK_SIZE
+    ncols = None
+    parts = []
+    while True:
+        lines = f.readlines(chunk_size)
+        if not lines:
+            break
+        if any(b"#" in l for l in lines):
+            # text after # is a comment
+            lines = [l.split(b"#", 1)[0] for l in lines]
+        rows = [l.split() for l in lines]
+        lengths = set(map(len, rows))
+        lengths.discard(0)  # empty lines
+        if not lengths:
+            continue
+        if ncols is None:
+            ncols = len(next(r for r in rows if r))
+            if usecols is None:
+                usecols = list(range(ncols))
+            dtypes = [dtype] if isinstance(dtype, (str, type, np.dtype)) else list(dtype)
+            dtypes = (dtypes + dtypes[-1:] * len(usecols))[:len(usecols)]
+            # whole lines of floating point numbers are converted at once
+            whole = len(usecols) == ncols and all(np.dtype(d).kind == "f" for d in dtypes)
+            if whole:
+                common = np.result_type(*dtypes)
+        if lengths != {ncols}:
+            raise ValueError("Lines have different numbers of columns")
+        tokens = list(chain.from_iterable(rows))
+        if whole:
+            block = np.array(tokens, dtype=common).reshape(-1, ncols)
+            parts.append([block[:, c].astype(d) for c, d in zip(usecols, dtypes)])
+        else:
+            parts.append([np.array(tokens[c::ncols], dtype=d)
+                          for c, d in zip(usecols, dtypes)])
+    if ncols is None:
+        return []
+    if len(parts) == 1:
+        return parts[0]
+    return [np.concatenate(cols) for cols in zip(*parts)]
+
+
+def _interp_rows(x, xp, fp):
+    """
+    Linearly interpolate many functions at the same increasing points x.
+
+    Args:
+        x: increasing points, shape (k,)
+        xp: x coordinates of data points, shape (..., n); they do not need
+            to be sorted
+        fp: values at xp, shape (..., c, n), for c functions sharing xp
+
+    Returns:
+        an array of shape (..., c, k)
+    """
+    n = xp.shape[-1]
+    order = np.argsort(xp, axis=-1)
+    xp = np.take_along_axis(xp, order, axis=-1)
+    fp = np.take_along_axis(fp, order[..., None, :], axis=-1)
+    # a stable sort of xp followed by x gives the count of xp <= x
+    merged = np.concatenate((xp, np.broadcast_to(x, xp.shape[:-1] + x.shape)), axis=-1)
+    rank = np.argsort(np.argsort(merged, axis=-1, kind="stable"), axis=-1)[..., n:]
+    lower = np.clip(rank - np.arange(len(x)) - 1, 0, n - 2)
+    x0 = np.take_along_axis(xp, lower, axis=-1)
+    x1 = np.take_along_axis(xp, lower + 1, axis=-1)
+    f0 = np.take_along_axis(fp, lower[..., None, :], axis=-1)
+    f1 = np.take_along_axis(fp, lower[..., None, :] + 1, axis=-1)
+    slope = (f1 - f0) / (x1 - x0)[..., None, :]
+    return slope * (x - x0)[..., None, :] + f0
+
+
+# number of values read from an HDF5 dataset at once
+_HDF5_BLOCK_SIZE = 2 ** 24
+
+
+def _hdf5_read_image(dataset, axes, rows=slice(None), columns=slice(None),
+                     bands=slice(None), dtype=np.float64):
+    """
+    Read a hyperslab of a 3D HDF5 dataset into an image organized
+    [ rows, columns, wavelengths ].
+
+    axes are the dataset axes of rows, columns and wavelengths. Blocks of
+    whole chunks along the wavelength axis are read and transposed into
+    their place in the output, so the full image is never copied.
+    """
+    band_idx = np.arange(dataset.shape[axes[2]])[bands]
+    n_rows = len(range(dataset.shape[axes[0]])[rows])
+    n_columns = len(range(dataset.shape[axes[1]])[columns])
+    out = np.empty((n_rows, n_columns, len(band_idx)), dtype=dtype)
+
+    chunk = dataset.chunks[axes[2]] if dataset.chunks else 1
+    step = max(_HDF5_BLOCK_SIZE // max(n_rows * n_columns, 1) // chunk, 1) * chunk
+
+    selection = [None, None, None]
+    selection[axes[0]] = rows
+    selection[axes[1]] = columns
+    for start in range(0, len(band_idx), step):
+        block = band_idx[start:start + step]
+        if np.all(np.diff(block) == 1):
+            selection[axes[2]] = slice(block[0], block[-1] + 1)
+        else:
+            selection[axes[2]] = list(block)
+        out[:, :, start:start + len(block)] = np.transpose(dataset[tuple(selection)], axes)
+    return out
+
+
 def _spectra_from_image(X, features, x_locs, y_locs):
     """
     Create a spectral format (returned by SpectralFileFormat.read_spectra)
@@ -173,111 +343,198 @@ def _spectra_from_image_2d(X, wn, x_locs, y_locs):
     return wn, X, meta_table
 
 
+_MATLAB_NUMERIC_CLASSES = {"double", "single", "logical",
+                           "int8", "int16", "int32", "int64",
+                           "uint8", "uint16", "uint32", "uint64"}
+
+
+def _matlab73_load(f, dataset, dtype=None):
+    """ Load a variable from a Matlab 7.3 (HDF5) file. Datasets are stored
+    transposed; 2D numeric arrays are read in blocks of rows into dtype. """
+    mclass = dataset.attrs.get("MATLAB_class", b"").decode()
+    if mclass == "char":
+        codes = np.atleast_2d(dataset[()].T)
+        return np.array(["".join(map(chr, row)) for row in codes])
+    elif mclass == "cell":
+        refs = dataset[()].T
+        out = np.empty(refs.shape, dtype=object)
+        for ind in np.ndindex(refs.shape):
+            out[ind] = _matlab73_load(f, f[refs[ind]])
+        return out
+    shape = dataset.shape[::-1]
+    if len(shape) != 2:
+        return dataset[()].T
+    out = np.empty(shape, dtype=dtype or dataset.dtype)
+    step = max(1, _HDF5_BLOCK_SIZE // max(1, shape[1]))
+    for i in range(0, shape[0], step):
+        out[i:i + step] = dataset[:, i:i + step].T
+    return out
+
+
 class MatlabReader(FileFormat):
     EXTENSIONS = ('.mat',)
     DESCRIPTION = "Matlab"
 
-    # Matlab 7.3+ files are not handled by scipy reader
+    # Matlab 7.3+ files are HDF5 files and are read with h5py
 
     def read(self):
-        who = matlab.whosmat(self.filename)
+        try:
+            who = matlab.whosmat(self.filename)
+        except NotImplementedError:  # Matlab 7.3+
+            import h5py
+            with h5py.File(self.filename, "r") as f:
+                variables = {}
+                for name, dataset in f.items():
+                    if not isinstance(dataset, h5py.Dataset) \
+                            or "MATLAB_class" not in dataset.attrs \
+                            or dataset.attrs.get("MATLAB_empty"):
+                        continue
+                    mclass = dataset.attrs["MATLAB_class"].decode()
+                    shape = dataset.shape[::-1]
+                    if mclass == "char":
+                        shape = (shape[0],)  # char matrices become 1D string arrays
+                    kind = "number" if mclass in _MATLAB_NUMERIC_CLASSES \
+                        else "string" if mclass == "char" else None
+                    variables[name] = (shape, kind)
+
+                def load(names, X_name):
+                    return {n: _matlab73_load(f, f[n], np.float64 if n == X_name else None)
+                            for n in names}
+
+                return self._read(variables, load)
         if not who:
             raise IOError("Couldn't load matlab file " + self.filename)
+
+        # loadmat does not return sparse and some other variables as arrays
+        variables = {name: (shape,
+                            "number" if mclass in _MATLAB_NUMERIC_CLASSES
+                            else "string" if mclass == "char" else None)
+                     for name, shape, mclass in who if mclass != "sparse"}
+
+        def load(names, _):
+            ml = matlab.loadmat(self.filename, chars_as_strings=True,
+                                variable_names=list(names))
+            return {a: b for a, b in ml.items() if isinstance(b, np.ndarray)}
+
+        return self._read(variables, load)
+
+    @staticmethod
+    def _read(variables, load):
+        """ Build a table from variables, a dictionary of (shape, kind) of
+        variables, where kind is "number", "string" or None. Only variables
+        that are needed are loaded with load(names, X_name). """
+
+        def num_elements(shape):
+            return reduce(lambda x, y: x * y, shape, 1)
+
+        numeric = {n: shape for n, (shape, kind) in variables.items() if kind == "number"}
+        shapes = {n: shape for n, (shape, _) in variables.items()}
+
+        # X is the biggest numeric array
+        X_name = max((num_elements(shape), n) for n, shape in numeric.items())[1] \
+            if numeric else None
+        X_shape = shapes.pop(X_name) if X_name else None
+
+        # find an array with compatible shapes
+        name_array = None
+        if X_name is not None:
+            for name in sorted(shapes):
+                if shapes[name] in [(X_shape[1],), (1, X_shape[1])]:
+                    name_array = name
+                    break
+            if name_array:
+                shapes.pop(name_array)
+
+        meta_size = None
+        if X_name is None:
+            counts = defaultdict(list)
+            for name, shape in shapes.items():
+                if shape:
+                    counts[shape[0]].append(name)
+            if counts:
+                meta_size = max(counts.keys(), key=lambda x: len(counts[x]))
         else:
-            ml = matlab.loadmat(self.filename, chars_as_strings=True)
-            ml = {a: b for a, b in ml.items() if isinstance(b, np.ndarray)}
-
-            def num_elements(array):
-                return reduce(lambda x, y: x * y, array.shape, 1)
-
-            def find_biggest(arrays):
-                sizes = []
-                for n, c in arrays.items():
-                    sizes.append((num_elements(c), n))
-                return max(sizes)[1]
-
-            def is_string_array(array):
-                return issubclass(array.dtype.type, np.str_)
-
-            def is_number_array(array):
-                return issubclass(array.dtype.type, numbers.Number)
-
-            numeric = {n: a for n, a in ml.items() if is_number_array(a)}
-
-            # X is the biggest numeric array
-            X = ml.pop(find_biggest(numeric)) if numeric else None
-
-            # find an array with compatible shapes
-            attributes = []
-            if X is not None:
-                name_array = None
-                for name in sorted(ml):
-                    con = ml[name]
-                    if con.shape in [(X.shape[1],), (1, X.shape[1])]:
-                        name_array = name
-                        break
-                names = ml.pop(name_array).ravel() if name_array else range(X.shape[1])
-                names = [str(a).rstrip() for a in names]  # remove matlab char padding
-                attributes = [ContinuousVariable.make(a) for a in names]
-
-            meta_names = []
-            metas = []
-
-            meta_size = None
-            if X is None:
-                counts = defaultdict(list)
-                for name, con in ml.items():
-                    counts[len(con)].append(name)
-                if counts:
-                    meta_size = max(counts.keys(), key=lambda x: len(counts[x]))
+            meta_size = X_shape[0]
+
+        # only 1D string arrays and 2D numeric arrays become metas
+        meta_names = []
+        if meta_size:
+            for name, shape in shapes.items():
+                kind = variables[name][1]
+                if shape and shape[0] == meta_size and \
+                        (kind == "string" and len(shape) == 1
+                         or kind == "number" and len(shape) == 2):
+                    meta_names.append(name)
+
+        ml = load([n for n in [X_name, name_array] + meta_names if n], X_name)
+
+        attributes = []
+        X = None
+        if X_name is not None:
+            X = ml[X_name]
+            names = ml[name_array].ravel() if name_array else range(X.shape[1])
+            names = [str(a).rstrip() for a in names]  # remove matlab char padding
+            attributes = [ContinuousVariable.make(a) for a in names]
+
+        metas = []
+        meta_data = []
+        for m in sorted(meta_names):
+            f = ml[m]
+            if variables[m][1] == "string":
+                metas.append(StringVariable.make(m))
+                f = np.array([a.rstrip() for a in f])  # remove matlab char padding
+                f.resize(meta_size, 1)
+                meta_data.append(f)
             else:
-                meta_size = len(X)
-            if meta_size:
-                for name, con in ml.items():
-                    if len(con) == meta_size:
-                        meta_names.append(name)
+                if f.shape[1] == 1:
+                    names = [m]
+                else:
+                    names = [m + "_" + str(i+1) for i in range(f.shape[1])]
+                for n in names:
+                    metas.append(ContinuousVariable.make(n))
+                meta_data.append(f)
 
-            meta_data = []
-            for m in sorted(meta_names):
-                f = ml[m]
-                if is_string_array(f) and len(f.shape) == 1:  # 1D string arrays
-                    metas.append(StringVariable.make(m))
-                    f = np.array([a.rstrip() for a in f])  # remove matlab char padding
-                    f.resize(meta_size, 1)
-                    meta_data.append(f)
-                elif is_number_array(f) and len(f.shape) == 2:
-                    if f.shape[1] == 1:
-                        names = [m]
-                    else:
-                        names = [m + "_" + str(i+1) for i in range(f.shape[1])]
-                    for n in names:
-                        metas.append(ContinuousVariable.make(n))
-                    meta_data.append(f)
-
-            meta_data = np.hstack(tuple(meta_data)) if meta_data else None
-
-            domain = Domain(attributes, metas=metas)
-            if X is None:
-                X = np.zeros((meta_size, 0))
-            return Orange.data.Table.from_numpy(domain, X, Y=None, metas=meta_data)
+        meta_data = np.hstack(tuple(meta_data)) if meta_data else None
+
+        domain = Domain(attributes, metas=metas)
+        if X is None:
+            X = np.zeros((meta_size, 0))
+        return Orange.data.Table.from_numpy(domain, X, Y=None, metas=meta_data)
 
 
 class EnviMapReader(FileFormat, SpectralFileFormat):
     EXTENSIONS = ('.hdr',)
     DESCRIPTION = 'Envi'
 
-    def read_spectra(self):
+    def read_spectra(self, limits=None, window=None, lazy=False):
+        """ Read spectra with wavelengths within `limits` (low, high) from
+        the spatial `window` (row slice, column slice) of the image.
+
+        The file is memory-mapped when possible, so only the selected part
+        is read. With lazy=True the values are returned as a read-only view
+        of the file if the interleave allows it.
+        """
         a = spectral.io.envi.open(self.filename)
-        X = np.array(a.load())
         try:
             lv = a.metadata["wavelength"]
             features = np.array(list(map(float, lv)))
         except KeyError:
             #just start counting from 0 when nothing is known
-            features = np.arange(X.shape[-1])
+            features = np.arange(a.shape[-1])
+
+        rows, columns = window if window is not None else (slice(None), slice(None))
+        bands = _interval_index(features, limits)
 
-        x_locs = np.arange(X.shape[1])
-        y_locs = np.arange(X.shape[0])
+        if a.using_memmap and a.scale_factor == 1:
+            X = a.open_memmap(interleave="bip")[rows, columns, bands]
+            if not lazy:
+                X = np.array(X)
+        else:
+            X = np.array(a.load())[rows, columns, bands]
+
+        features = features[bands]
+        x_locs = np.arange(a.shape[1])[columns]
+        y_locs = np.arange(a.shape[0])[rows]
 
         return _spectra_from_image(X, features, x_locs, y_locs)
 
@@ -287,14 +544,23 @@ class HDF5Reader_HERMES(FileFormat, SpectralFileFormat):
     EXTENSIONS = ('.hdf5',)
     DESCRIPTION = 'HDF5 file @HERMRES/SOLEIL'
 
-    def read_spectra(self):
+    def read_spectra(self, limits=None, window=None, dtype=np.float64):
+        """ Read spectra with energies within `limits` (low, high) from
+        the spatial `window` (row slice, column slice) as `dtype`. Only the
+        matching hyperslab of the file is read.
+        """
         import h5py
-        hdf5_file = h5py.File(self.filename)
-        if hdf5_file['entry1/collection/beamline'].value.astype('str') == 'Hermes':
-            x_locs = np.array(hdf5_file['entry1/Counter0/sample_x'])
-            y_locs = np.array(hdf5_file['entry1/Counter0/sample_y'])
-            energy = np.array(hdf5_file['entry1/Counter0/energy'])
-            intensities = np.array(hdf5_file['entry1/Counter0/data']).T
+        rows, columns = window if window is not None else (slice(None), slice(None))
+        with h5py.File(self.filename, "r") as hdf5_file:
+            if hdf5_file['entry1/collection/beamline'][()].astype('str') == 'Hermes':
+                x_locs = hdf5_file['entry1/Counter0/sample_x'][columns]
+                y_locs = hdf5_file['entry1/Counter0/sample_y'][rows]
+                energy = np.array(hdf5_file['entry1/Counter0/energy'])
+                bands = _interval_index(energy, limits)
+                energy = energy[bands]
+                # data is stored as [ wavelengths, columns, rows ]
+                intensities = _hdf5_read_image(hdf5_file['entry1/Counter0/data'], (2, 1, 0),
+                                               rows, columns, bands, dtype=dtype)
         return _spectra_from_image(intensities, energy, x_locs, y_locs)
 
 
@@ -313,8 +579,11 @@ class HDF5Reader_ROCK(FileFormat, SpectralFileFormat):
 
         return list(map(str, cube_nbrs))
 
-    def read_spectra(self):
-
+    def read_spectra(self, limits=None, window=None, dtype=np.float64):
+        """ Read spectra with energies within `limits` (low, high) from
+        the spatial `window` (row slice, column slice) as `dtype`. Only the
+        matching hyperslab of the file is read.
+        """
         import h5py as h5
 
         if self.sheet:
@@ -322,42 +591,196 @@ class HDF5Reader_ROCK(FileFormat, SpectralFileFormat):
         else:
             cube_nb = 1
 
+        rows, columns = window if window is not None else (slice(None), slice(None))
+
         with h5.File(self.filename, "r") as dataf:
             cube_h5 = dataf["data/cube_{:0>5d}".format(cube_nb)]
-
-            # directly read into float64 so that Orange.data.Table does not
-            # convert to float64 afterwards (if we would not read into float64,
-            # the memory use would be 50% greater)
-            cube_np = np.empty(cube_h5.shape, dtype=np.float64)
-            cube_h5.read_direct(cube_np)
-
             energies = np.array(dataf['context/energies'])
+            bands = _interval_index(energies, limits)
+            energies = energies[bands]
 
-        intensities = np.transpose(cube_np, (1, 2, 0))
-        height, width, _ = np.shape(intensities)
-        x_locs = np.arange(width)
-        y_locs = np.arange(height)
+            # directly read into dtype; with the default float64
+            # Orange.data.Table does not convert to float64 afterwards (if we
+            # would not read into float64, the memory use would be 50% greater)
+            # the cube is stored as [ wavelengths, rows, columns ]
+            intensities = _hdf5_read_image(cube_h5, (1, 2, 0), rows, columns, bands,
+                                           dtype=dtype)
+            height, width = cube_h5.shape[1:]
+
+        x_locs = np.arange(width)[columns]
+        y_locs = np.arange(height)[rows]
 
         return _spectra_from_image(intensities, energies, x_locs, y_locs)
 
 
+class SpectralHDF5Reader(FileFormat, SpectralFileFormat):
+    """ Reader and writer of spectral tables in HDF5 files.
+
+    X is stored as a chunked and compressed dataset with the wavenumber
+    axis, class and meta variables as one dataset each, and table
+    attributes as JSON (values that can not be stored are skipped). Ranges of rows and wavenumbers can be read
+    without reading the whole file.
+    """
+    EXTENSIONS = ('.sh5',)
+    DESCRIPTION = 'Spectra HDF5'
+
+    FORMAT = "orange-spectroscopy spectra"
+    VERSION = 1
+
+    # bytes in a chunk of X; chunks are square-ish blocks of rows and bands
+    CHUNK_SIZE = 2 ** 20
+    COMPRESSION = "gzip"
+
+    def read_spectra(self, limits=None, rows=None):
+        """ Read spectra with wavenumbers within `limits` (low, high)
+        and only `rows` (a slice or increasing indices).
+        """
+        import h5py
+        rows = slice(None) if rows is None else rows
+        with h5py.File(self.filename, "r") as f:
+            if f.attrs.get("format") != self.FORMAT:
+                raise IOError("Not a spectra HDF5 file")
+            xs = f["wavenumbers"][()]
+            bands = _interval_index(xs, limits)
+            X = f["X"][rows][:, bands] if not isinstance(bands, slice) \
+                else f["X"][rows, bands]
+            xs = xs[bands]
+            class_vars = [self._read_variable(d) for d in self._ordered(f["class_vars"])]
+            metas = [self._read_variable(d) for d in self._ordered(f["metas"])]
+            Y = np.column_stack([d[rows] for d in self._ordered(f["class_vars"])]
+                                or [np.zeros((len(X), 0))])
+            M = np.column_stack([self._read_values(d, rows) for d in self._ordered(f["metas"])]
+                                or [np.zeros((len(X), 0), dtype=object)])
+            attributes = json.loads(f.attrs["attributes"]) if "attributes" in f.attrs else {}
+        domain = Domain([], class_vars, metas=metas)
+        meta_data = Table.from_numpy(domain, X=np.zeros((len(X), 0)),
+                                     Y=Y, metas=M, attributes=attributes)
+        return xs, X, meta_data
+
+    def read(self):
+        # the file is already fast to read, so it is not cached
+        xs, X, meta_data = self.read_spectra()
+        import h5py
+        with h5py.File(self.filename, "r") as f:
+            names = json.loads(f["X"].attrs["names"])
+        table = build_spec_table(xs, X, meta_data)
+        if names != [a.name for a in table.domain.attributes]:
+            # attributes are not named after wavenumbers
+            domain = Domain([ContinuousVariable.make(n) for n in names],
+                            table.domain.class_vars, table.domain.metas)
+            table = Table.from_numpy(domain, X=table.X, Y=table.Y, metas=table.metas,
+                                     attributes=table.attributes)
+        return table
+
+    @staticmethod
+    def _ordered(group):
+        return [group[str(i)] for i in range(len(group))]
+
+    @staticmethod
+    def _read_values(dataset, rows):
+        if dataset.attrs["type"] == "string":
+            # variable-length strings are read as bytes otherwise
+            return np.asarray(dataset.asstr()[rows], dtype=object)
+        return np.asarray(dataset[rows], dtype=object)
+
+    @staticmethod
+    def _json_attributes(attributes):
+        serializable = {}
+        for key, value in attributes.items():
+            if not isinstance(key, str):
+                continue
+            try:
+                json.dumps(value)
+            except (TypeError, ValueError):
+                continue
+            serializable[key] = value
+        return serializable
+
+    @staticmethod
+    def _read_variable(dataset):
+        name = dataset.attrs["name"]
+        vartype = dataset.attrs["type"]
+        if vartype == "discrete":
+            return DiscreteVariable.make(name, values=json.loads(dataset.attrs["values"]))
+        elif vartype == "string":
+            return StringVariable.make(name)
+        elif vartype == "time":
+            return TimeVariable.make(name, have_date=dataset.attrs["have_date"],
+                                     have_time=dataset.attrs["have_time"])
+        return ContinuousVariable.make(name)
+
+    @classmethod
+    def write_file(cls, filename, data):
+        import h5py
+        X = data.X
+        n, m = X.shape
+        band_chunk = max(1, min(m, int(np.sqrt(cls.CHUNK_SIZE / X.itemsize))))
+        row_chunk = max(1, min(n, cls.CHUNK_SIZE // X.itemsize // band_chunk))
+        with h5py.File(filename, "w") as f:
+            f.attrs["format"] = cls.FORMAT
+            f.attrs["version"] = cls.VERSION
+            f.create_dataset("wavenumbers", data=getx(data))
+            f.create_dataset("X", data=X,
+                             chunks=(row_chunk, band_chunk) if n and m else None,
+                             compression=cls.COMPRESSION if n and m else None,
+                             shuffle=bool(n and m))
+            f["X"].attrs["names"] = json.dumps([a.name for a in data.domain.attributes])
+            Y = data.Y if data.Y.ndim == 2 else data.Y[:, None]
+            for group, variables, values in (("class_vars", data.domain.class_vars, Y),
+                                             ("metas", data.domain.metas, data.metas)):
+                g = f.create_group(group)
+                for i, var in enumerate(variables):
+                    cls._write_variable(g, str(i), var, values[:, i])
+            attributes = cls._json_attributes(data.attributes)
+            if attributes:
+                f.attrs["attributes"] = json.dumps(attributes)
+
+    @staticmethod
+    def _write_variable(group, key, var, values):
+        import h5py
+        if var.is_string:
+            d = group.create_dataset(key, data=np.array([str(v) for v in values], dtype=object),
+                                     dtype=h5py.special_dtype(vlen=str))
+            d.attrs["type"] = "string"
+        else:
+            d = group.create_dataset(key, data=np.asarray(values, dtype=float))
+            if var.is_discrete:
+                d.attrs["type"] = "discrete"
+                d.attrs["values"] = json.dumps(list(var.values))
+            elif var.is_time:
+                d.attrs["type"] = "time"
+                d.attrs["have_date"] = var.have_date
+                d.attrs["have_time"] = var.have_time
+            else:
+                d.attrs["type"] = "continuous"
+        d.attrs["name"] = var.name
+
+
 class OmnicMapReader(FileFormat, SpectralFileFormat):
     """ Reader for files with two columns of numbers (X and Y)"""
     EXTENSIONS = ('.map',)
     DESCRIPTION = 'Omnic map'
+    CACHEABLE = True
 
-    def read_spectra(self):
-        om = OmnicMap.OmnicMap(self.filename)
-        info = om.info
-        X = om.data
-
+    @staticmethod
+    def _features(omnic_info, n_channels):
         try:
-            lv = info['OmnicInfo']['Last X value']
-            fv = info['OmnicInfo']['First X value']
-            features = np.linspace(fv, lv, num=X.shape[-1])
-        except KeyError:
+            lv = omnic_info['Last X value']
+            fv = omnic_info['First X value']
+            return np.linspace(fv, lv, num=n_channels)
+        except (KeyError, TypeError):  # TypeError if omnic_info is None
             #just start counting from 0 when nothing is known
-            features = np.arange(X.shape[-1])
+            return np.arange(n_channels)
+
+    def read_spectra(self, limits=None):
+        """ Read spectra with wavenumbers within `limits` (low, high);
+        other channels are not decoded. """
+        om = OmnicMap.OmnicMap(
+            self.filename,
+            channels=lambda omnic_info, n: _interval_index(self._features(omnic_info, n), limits))
+        info = om.info
+        X = om.data
+        features = self._features(info['OmnicInfo'], om.nChannels)[om.channels]
 
         try:
             loc_first = info['OmnicInfo']["First map location"]
@@ -366,7 +789,7 @@ class OmnicMapReader(FileFormat, SpectralFileFormat):
                                  max(loc_first[0], loc_last[0]), X.shape[1])
             y_locs = np.linspace(min(loc_first[1], loc_last[1]),
                                  max(loc_first[1], loc_last[1]), X.shape[0])
-        except KeyError:
+        except (KeyError, TypeError):  # TypeError if omnic_info is None
             x_locs = np.arange(X.shape[1])
             y_locs = np.arange(X.shape[0])
 
@@ -378,17 +801,23 @@ class AgilentImageReader(FileFormat, SpectralFileFormat):
     EXTENSIONS = ('.dat',)
     DESCRIPTION = 'Agilent Single Tile Image'
 
-    def read_spectra(self):
-        ai = agilentImage(self.filename)
+    def read_spectra(self, limits=None):
+        """ Read spectra with wavenumbers within `limits` (low, high). The
+        file is memory-mapped, so only the selected bands are read. """
+        ai = agilentImage(self.filename, mmap=True)
         info = ai.info
         X = ai.data
 
         try:
-            features = info['wavenumbers']
+            features = np.asarray(info['wavenumbers'])
         except KeyError:
             #just start counting from 0 when nothing is known
             features = np.arange(X.shape[-1])
 
+        bands = _interval_index(features, limits)
+        features = features[bands]
+        X = X[:, :, bands]
+
         try:
             px_size = info['FPA Pixel Size'] * info['PixelAggregationSize']
         except KeyError:
@@ -406,7 +835,7 @@ class AgilentImageIFGReader(FileFormat, SpectralFileFormat):
     DESCRIPTION = 'Agilent Single Tile Image (IFG)'
 
     def read_spectra(self):
-        ai = agilentImageIFG(self.filename)
+        ai = agilentImageIFG(self.filename, mmap=True)
         info = ai.info
         X = ai.data
 
@@ -449,18 +878,27 @@ class agilentMosaicReader(FileFormat, SpectralFileFormat):
     """ Reader for Agilent FPA mosaic image files"""
     EXTENSIONS = ('.dmt',)
     DESCRIPTION = 'Agilent Mosaic Image'
+    CACHEABLE = True
+    CACHE_VERSION = 1
 
-    def read_spectra(self):
-        am = agilentMosaic(self.filename, dtype=np.float64)
+    def source_files(self):
+        return mosaic_files(self.filename, ".dmd")
+
+    def read_spectra(self, limits=None, dtype=np.float64):
+        """ Read spectra with wavenumbers within `limits` (low, high) as
+        `dtype`. Tiles are memory-mapped, so only the selected bands are read. """
+        am = agilentMosaic(self.filename, dtype=dtype, mmap=True, workers=None)
         info = am.info
+        features = np.asarray(info['wavenumbers'])
+        if limits is not None:
+            # select on rounded values of attribute names as Cut does
+            bands = _interval_index(spectral_axis(spectral_domain(features)).x, limits)
+            features = features[bands]
+            am.select_bands(bands)
+        # the mosaic is assembled straight from the memory-mapped tiles into
+        # one array of the selected bands; the spectra are a view of it
         X = am.data
 
-        try:
-            features = info['wavenumbers']
-        except KeyError:
-            #just start counting from 0 when nothing is known
-            features = np.arange(X.shape[-1])
-
         try:
             px_size = info['FPA Pixel Size'] * info['PixelAggregationSize']
         except KeyError:
@@ -477,9 +915,14 @@ class agilentMosaicIFGReader(FileFormat, SpectralFileFormat):
     EXTENSIONS = ('.dmt',)
     DESCRIPTION = 'Agilent Mosaic Image (IFG)'
     PRIORITY = agilentMosaicReader.PRIORITY + 1
+    CACHEABLE = True
 
-    def read_spectra(self):
-        am = agilentMosaicIFG(self.filename, dtype=np.float64)
+    def source_files(self):
+        return mosaic_files(self.filename, ".drd")
+
+    def read_spectra(self, dtype=np.float64):
+        am = agilentMosaicIFG(self.filename, dtype=dtype, mmap=True,
+                              workers=None)
         info = am.info
         X = am.data
 
@@ -585,7 +1028,7 @@ class SPCReader(FileFormat):
 
     def single_x_reader(self, spc_file):
         domvals = spc_file.x  # first column is attribute name
-        domain = Domain([ContinuousVariable.make("%f" % f) for f in domvals], None)
+        domain = spectral_domain(domvals)
         y_data = [sub.y for sub in spc_file.sub]
         y_data = np.array(y_data)
         table = Orange.data.Table.from_numpy(domain, y_data.astype(float, order='C'))
@@ -593,22 +1036,15 @@ class SPCReader(FileFormat):
 
     def multi_x_reader(self, spc_file):
         # use x-values as domain
-        all_x = []
-        for sub in spc_file.sub:
-            x = sub.x
-            # assume values in x do not repeat
-            all_x = np.union1d(all_x, x)
-        domain = Domain([ContinuousVariable.make("%f" % f) for f in all_x], None)
-
-        instances = []
-        for sub in spc_file.sub:
-            x, y = sub.x, sub.y
-            newinstance = np.ones(len(all_x))*np.nan
-            ss = np.searchsorted(all_x, x)  # find positions to set
-            newinstance[ss] = y
-            instances.append(newinstance)
-
-        y_data = np.array(instances).astype(float, order='C')
+        xs = [sub.x for sub in spc_file.sub]
+        # assume values in x do not repeat
+        all_x, columns = np.unique(np.concatenate(xs), return_inverse=True)
+        domain = spectral_domain(all_x)
+
+        # scatter values of all subfiles into their positions at once
+        rows = np.repeat(np.arange(len(xs)), [len(x) for x in xs])
+        y_data = np.full((len(xs), len(all_x)), np.nan)
+        y_data[rows, columns] = np.concatenate([sub.y for sub in spc_file.sub])
         return Orange.data.Table.from_numpy(domain, y_data)
 
 
@@ -888,99 +1324,67 @@ class NeaReader(FileFormat, SpectralFileFormat):
 
     EXTENSIONS = (".nea", ".txt")
     DESCRIPTION = 'NeaSPEC'
+    CACHEABLE = True
+    CACHE_VERSION = 1
 
     def read_v1(self):
 
-        with open(self.filename, "rt") as f:
+        with open(self.filename, "rb") as f:
             next(f)  # skip header
-            l = next(f)
-            l = l.strip()
-            l = l.split("\t")
-            ncols = len(l)
-
-            f.seek(0)
-            next(f)
-            datacols = np.arange(4, ncols)
-            data = np.loadtxt(f, dtype="float", usecols=datacols)
-
-            f.seek(0)
-            next(f)
-            metacols = np.arange(0, 4)
-            meta = np.loadtxt(f,
-                              dtype={'names': ('row', 'column', 'run', 'channel'),
-                                     'formats': (np.int, np.int, np.int, "S10")},
-                              usecols=metacols)
+            cols = _read_ascii_columns(f, dtype=[int, int, int, "S10", float])
+
+            datacols = np.arange(4, len(cols))
+            data = np.column_stack(cols[4:])
+
+            meta = np.empty(len(cols[0]),
+                            dtype={'names': ('row', 'column', 'run', 'channel'),
+                                   'formats': (int, int, int, "S10")})
+            for name, col in zip(meta.dtype.names, cols[:4]):
+                meta[name] = col
 
             # ASSUMTION: runs start with 0
             runs = np.unique(meta["run"])
 
             # ASSUMPTION: there is one M channel and multiple O?A and O?P channels,
             # both with the same number, both starting with 0
-            channels = np.unique(meta["channel"])
-            maxn = -1
-
-            def channel_type(a):
-                if a.startswith(b"O") and a.endswith(b"A"):
-                    return "OA"
-                elif a.startswith(b"O") and a.endswith(b"P"):
-                    return "OP"
-                else:
-                    return "M"
-
-            for a in channels:
-                if channel_type(a) in ("OA", "OP"):
-                    maxn = max(maxn, int(a[1:-1]))
-            numharmonics = maxn+1
+            channels, chan_ind = np.unique(meta["channel"], return_inverse=True)
+            # 0 for OA, 1 for OP and -1 for M channels
+            chan_type = np.array([0 if a.startswith(b"O") and a.endswith(b"A") else
+                                  1 if a.startswith(b"O") and a.endswith(b"P") else -1
+                                  for a in channels])
+            chan_harmonic = np.array([int(a[1:-1]) if t >= 0 else -1
+                                      for a, t in zip(channels, chan_type)])
+            numharmonics = max(chan_harmonic.max(), -1) + 1
+            chan_type, chan_harmonic = chan_type[chan_ind], chan_harmonic[chan_ind]
 
             rowcols = np.vstack((meta["row"], meta["column"])).T
-            uniquerc = set(map(tuple, rowcols))
-
-            di = {}  # dictionary of indices for each row and column
-
-            min_intp, max_intp = None, None
-
-            for i, (row, col, run, chan) in enumerate(meta):
-                if (row, col) not in di:
-                    di[(row, col)] = \
-                        {"M": np.zeros((len(runs), len(datacols))) * np.nan,
-                         "OA": np.zeros((numharmonics, len(runs), len(datacols))) * np.nan,
-                         "OP": np.zeros((numharmonics, len(runs), len(datacols))) * np.nan}
-                if channel_type(chan) == "M":
-                    di[(row, col)][channel_type(chan)][run] = data[i]
-                    if min_intp is None:  # we need the limits of common X for all
-                        min_intp = np.min(data[i])
-                        max_intp = np.max(data[i])
-                    else:
-                        min_intp = max(min_intp, np.min(data[i]))
-                        max_intp = min(max_intp, np.max(data[i]))
-                elif channel_type(chan) in ("OA", "OP"):
-                    di[(row, col)][channel_type(chan)][int(chan[1:-1]), run] = data[i]
-
-            X = np.linspace(min_intp, max_intp, num=len(datacols))
-
-            final_metas = []
-            final_data = []
-
-            for row, col in uniquerc:
-                cur = di[(row, col)]
-                M, OA, OP = cur["M"], cur["OA"], cur["OP"]
-
-                OAn = np.zeros(OA.shape) * np.nan
-                OPn = np.zeros(OA.shape) * np.nan
-                for run in range(len(M)):
-                    f = interp1d(M[run], OA[:, run])
-                    OAn[:, run] = f(X)
-                    f = interp1d(M[run], OP[:, run])
-                    OPn[:, run] = f(X)
-
-                OAmean = np.mean(OAn, axis=1)
-                OPmean = np.mean(OPn, axis=1)
-                final_data.append(OAmean)
-                final_data.append(OPmean)
-                final_metas += [[row, col, "O%dA" % i] for i in range(numharmonics)]
-                final_metas += [[row, col, "O%dP" % i] for i in range(numharmonics)]
-
-            final_data = np.vstack(final_data)
+            uniquerc, pixel = np.unique(rowcols, axis=0, return_inverse=True)
+            run = meta["run"]
+
+            # scatter lines into (pixels, runs, points) for M and
+            # (pixels, runs, channels, points) for OA and OP channels
+            npoints = len(datacols)
+            M = np.full((len(uniquerc), len(runs), npoints), np.nan)
+            O = np.full((len(uniquerc), len(runs), 2, numharmonics, npoints), np.nan)
+            is_m = chan_type == -1
+            M[pixel[is_m], run[is_m]] = data[is_m]
+            is_o = ~is_m
+            O[pixel[is_o], run[is_o], chan_type[is_o], chan_harmonic[is_o]] = data[is_o]
+            O = O.reshape(len(uniquerc), len(runs), 2 * numharmonics, npoints)
+
+            # we need the limits of common X for all
+            min_intp = np.max(np.min(data[is_m], axis=1))
+            max_intp = np.min(np.max(data[is_m], axis=1))
+            X = np.linspace(min_intp, max_intp, num=npoints)
+
+            # all harmonics of all runs of all pixels are interpolated at once
+            final_data = np.mean(_interp_rows(X, M, O), axis=1)
+            final_data = final_data.reshape(-1, npoints)
+
+            final_metas = [[row, col, "O%d%s" % (i, t)]
+                           for row, col in uniquerc
+                           for t in "AP"
+                           for i in range(numharmonics)]
 
             metas = [Orange.data.ContinuousVariable.make("row"),
                      Orange.data.ContinuousVariable.make("column"),
@@ -995,17 +1399,17 @@ class NeaReader(FileFormat, SpectralFileFormat):
 
         # Find line in which data begins
         count = 0
-        with open(self.filename, "r") as f:
+        with open(self.filename, "rb") as f:
             while f:
                 line = f.readline()
                 count = count + 1
-                if line[0] != '#':
+                if not line.startswith(b'#'):
                     break
 
-            file = np.loadtxt(f)  # Slower part
+            file = np.column_stack(_read_ascii_columns(f))
 
         # Find the Wavenumber column
-        line = line.strip().split('\t')
+        line = line.decode().strip().split('\t')
 
         for i, e in enumerate(line):
             if e == 'Wavenumber':
@@ -1069,6 +1473,31 @@ class NeaReader(FileFormat, SpectralFileFormat):
             return self.read_v2()
 
 
+# number of distinct wavenumber axes whose domains are kept
+_SPECTRAL_DOMAIN_CACHE_SIZE = 64
+
+
+@lru_cache(maxsize=_SPECTRAL_DOMAIN_CACHE_SIZE)
+def _cached_spectral_domain(values, dtype):
+    xs = np.frombuffer(values, dtype=dtype)
+    return Domain([ContinuousVariable.make("%f" % f) for f in xs], None)
+
+
+def spectral_domain(xs):
+    """
+    Return a Domain without class and meta variables whose attributes are
+    named after wavenumbers xs.
+
+    Domains are cached by the contents of xs, so that reading files with the
+    same wavenumbers does not construct variables again, and tables
+    with the same wavenumbers share attributes.
+    """
+    xs = np.ascontiguousarray(xs)
+    if xs.dtype == object:
+        xs = xs.astype(float)
+    return _cached_spectral_domain(xs.tobytes(), xs.dtype.str)
+
+
 def build_spec_table(domvals, data, additional_table=None):
     """Create a an Orange data table from a triplet:
         - 1D numpy array defining wavelengths (size m)
@@ -1076,18 +1505,49 @@ def build_spec_table(domvals, data, additional_table=None):
         - Orange.data.Table with only meta or class attributes (size n)
     """
     data = np.atleast_2d(data)
-    features = [Orange.data.ContinuousVariable.make("%f" % f) for f in domvals]
     if additional_table is None:
-        domain = Orange.data.Domain(features, None)
+        domain = spectral_domain(domvals)
         return Table.from_numpy(domain, X=data)
-    else:
-        domain = Domain(features,
-                        class_vars=additional_table.domain.class_vars,
-                        metas=additional_table.domain.metas)
-        ret_data = Table.from_numpy(domain, X=data, Y=additional_table.Y,
-                                    metas=additional_table.metas,
-                                    attributes=additional_table.attributes)
-        return ret_data
+    features = spectral_domain(domvals).attributes
+    domain = Domain(features,
+                    class_vars=additional_table.domain.class_vars,
+                    metas=additional_table.domain.metas)
+    ret_data = Table.from_numpy(domain, X=data, Y=additional_table.Y,
+                                metas=additional_table.metas,
+                                attributes=additional_table.attributes)
+    return ret_data
+
+
+SpectralAxis = namedtuple("SpectralAxis", ["x", "order", "inverse", "monotonic"])
+
+# spectral axes of domains; equal domains share an entry
+_spectral_axes = WeakKeyDictionary()
+
+
+def spectral_axis(domain):
+    """
+    Return a SpectralAxis of domain attributes: x values (as in getx),
+    the permutation that sorts them (order), its inverse, and whether
+    the order is the identity (monotonic).
+
+    Axes are computed once for each domain. Their arrays are read-only.
+    """
+    axis = _spectral_axes.get(domain)
+    if axis is None:
+        x = np.arange(len(domain.attributes), dtype="f")
+        try:
+            x = np.array([float(a.name) for a in domain.attributes])
+        except (ValueError, TypeError):
+            pass  # names are not numbers
+        order = np.argsort(x)
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        monotonic = bool(np.all(np.diff(order) >= 0))
+        for a in (x, order, inverse):
+            a.flags.writeable = False
+        axis = SpectralAxis(x, order, inverse, monotonic)
+        _spectral_axes[domain] = axis
+    return axis
 
 
 def getx(data):
@@ -1095,12 +1555,7 @@ def getx(data):
     Return x of the data. If all attribute names are numbers,
     return their values. If not, return indices.
     """
-    x = np.arange(len(data.domain.attributes), dtype="f")
-    try:
-        x = np.array([float(a.name) for a in data.domain.attributes])
-    except:
-        pass
-    return x
+    return spectral_axis(data.domain).x.copy()
 
 
 class DatMetaReader(FileFormat):
@@ -1283,6 +1738,14 @@ class NeaReaderGSF(FileFormat, SpectralFileFormat):
 
 class TileFileFormat:
 
+    # number of processes transforming tiles; 1 transforms in the calling thread
+    workers = 1
+    # maximum number of tiles submitted to the process pool at once;
+    # None allows twice the number of workers
+    tiles_in_flight = None
+    # (low, high) interval of wavenumbers to read; None reads all
+    limits = None
+
     def read_tile(self):
         """ Read file in chunks (tiles) to allow preprocessing before combining
         into one large Table.
@@ -1291,22 +1754,101 @@ class TileFileFormat:
         Tables should already have appropriate meta-data (i.e. map_x/map_y)
         """
 
+    def total_rows(self):
+        """ Return the number of rows of all tiles together, or None if it
+        is not known before the tiles are read.
+        """
+        return None
+
+    def set_workers(self, workers, tiles_in_flight=None):
+        """ Preprocess tiles on a pool of `workers` processes, while the next
+        tiles are being read. `tiles_in_flight` bounds the number of tiles
+        held in memory by the pool.
+        """
+        self.workers = workers
+        self.tiles_in_flight = tiles_in_flight
+
+    def set_limits(self, limits):
+        """ Read only wavenumbers within `limits` (low, high), for example
+        those a Cut at the head of the preprocessor keeps. Values are
+        compared as attribute names so that the selection matches Cut.
+        """
+        self.limits = limits
+
+    def _transform_tiles(self, tiles, domain):
+        if self.workers <= 1:
+            for tile_table in tiles:
+                yield _tile_arrays(tile_table.transform(domain))
+            return
+
+        in_flight = self.tiles_in_flight or 2 * self.workers
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 initializer=_init_tile_worker,
+                                 initargs=(domain,)) as executor:
+            futures = deque()
+            for tile_table in tiles:
+                if len(futures) >= in_flight:
+                    yield futures.popleft().result()
+                futures.append(executor.submit(_transform_tile, tile_table))
+            while futures:
+                yield futures.popleft().result()
+
     def read(self):
-        ret_table = None
-        for tile_table in self.read_tile():
-            if ret_table is None:
-                ret_table = self.preprocess(tile_table)
+        n_rows = self.total_rows()
+        tiles = self.read_tile()
+        try:
+            ret_table = self.preprocess(next(tiles))
+        except StopIteration:
+            return None
+
+        domain = ret_table.domain
+        tile_parts = chain([_tile_arrays(ret_table)], self._transform_tiles(tiles, domain))
+
+        buffers = None
+        filled = 0
+        parts = []
+        for tile_part in tile_parts:
+            end = filled + len(tile_part[0])
+            if n_rows is not None and not parts and end <= n_rows:
+                if buffers is None:
+                    # output buffers are allocated once with the final size
+                    buffers = [np.empty((n_rows,) + a.shape[1:], dtype=a.dtype)
+                               for a in tile_part]
+                for buffer, a in zip(buffers, tile_part):
+                    buffer[filled:end] = a
+                filled = end
             else:
-                tile_table_pp = tile_table.transform(ret_table.domain)
-                ret_table.X = np.vstack((ret_table.X, tile_table_pp.X))
-                ret_table._Y = np.vstack((ret_table._Y, tile_table_pp._Y))
-                ret_table.metas = np.vstack((ret_table.metas, tile_table_pp.metas))
-                ret_table.W = np.vstack((ret_table.W, tile_table_pp.W))
-                ret_table.ids = np.hstack((ret_table.ids, tile_table_pp.ids))
+                # rows beyond total_rows() (for example, added by a
+                # preprocessor) are concatenated
+                parts.append(tile_part)
 
+        if buffers is not None and filled == n_rows and not parts:
+            arrays = buffers
+        else:
+            if buffers is not None:
+                parts.insert(0, [buffer[:filled] for buffer in buffers])
+            arrays = [np.concatenate(a) for a in zip(*parts)]
+        ret_table.X, ret_table._Y, ret_table.metas, ret_table.W, ret_table.ids = arrays
         return ret_table
 
 
+def _tile_arrays(table):
+    return table.X, table._Y, table.metas, table.W, table.ids
+
+
+_tile_domain = None
+
+
+def _init_tile_worker(domain):
+    # the domain is sent to each worker process once instead of with every tile
+    global _tile_domain  # pylint: disable=global-statement
+    _tile_domain = domain
+
+
+def _transform_tile(tile_table):
+    return _tile_arrays(tile_table.transform(_tile_domain))
+
+
 class agilentMosaicTileReader(FileFormat, TileFileFormat):
     """ Tile-by-tile reader for Agilent FPA mosaic image files"""
     EXTENSIONS = ('.dmt',)
@@ -1316,6 +1858,7 @@ class agilentMosaicTileReader(FileFormat, TileFileFormat):
     def __init__(self, filename):
         super().__init__(filename)
         self.preprocessor = None
+        self._tiles = None
 
     def set_preprocessor(self, preprocessor):
         self.preprocessor = preprocessor
@@ -1326,16 +1869,29 @@ class agilentMosaicTileReader(FileFormat, TileFileFormat):
         else:
             return table
 
+    def _mosaic_tiles(self):
+        # total_rows() and the following read_tile() share the parsed .dmt
+        if self._tiles is None:
+            self._tiles = agilentMosaicTiles(self.filename, mmap=True)
+        return self._tiles
+
+    def total_rows(self):
+        am = self._mosaic_tiles()
+        return am.tiles.size * am.info['fpasize']**2
 
     def read_tile(self):
-        am = agilentMosaicTiles(self.filename)
+        am = self._mosaic_tiles()
+        self._tiles = None  # a later read checks the file again
         info = am.info
         tiles = am.tiles
         ytiles = am.tiles.shape[0]
 
-        features = info['wavenumbers']
+        features = np.asarray(info['wavenumbers'])
+        # select on rounded values of attribute names as Cut does
+        bands = _interval_index(spectral_axis(spectral_domain(features)).x, self.limits)
+        features = features[bands]
 
-        attrs = [Orange.data.ContinuousVariable.make("%f" % f) for f in features]
+        attrs = spectral_domain(features).attributes
         domain = Orange.data.Domain(attrs, None,
                                     metas=[Orange.data.ContinuousVariable.make("map_x"),
                                            Orange.data.ContinuousVariable.make("map_y")]
@@ -1348,7 +1904,8 @@ class agilentMosaicTileReader(FileFormat, TileFileFormat):
             px_size = 1
 
         for (x, y) in np.ndindex(tiles.shape):
-            tile = tiles[x, y]()
+            # memory-mapped tiles are stored band by band
+            tile = tiles[x, y]()[:, :, bands]
             x_size, y_size = tile.shape[1], tile.shape[0]
             x_locs = np.linspace(x*x_size*px_size, (x+1)*x_size*px_size, num=x_size, endpoint=False)
             y_locs = np.linspace((ytiles-y-1)*y_size*px_size, (ytiles-y)*y_size*px_size, num=y_size, endpoint=False)
@@ -83,8 +83,8 @@ class GaussianFeature(SelectColumn):
 
 class _GaussianCommon(CommonDomainOrderUnknowns):
 
-    def __init__(self, sd, domain):
-        super().__init__(domain)
+    def __init__(self, sd, domain, dtype=np.float64):
+        super().__init__(domain, dtype)
         self.sd = sd
 
     def transformed(self, X, wavenumbers):
@@ -96,11 +96,12 @@ class _GaussianCommon(CommonDomainOrderUnknowns):
 
 class GaussianSmoothing(Preprocess):
 
-    def __init__(self, sd=10.):
+    def __init__(self, sd=10., dtype=np.float64):
         self.sd = sd
+        self.dtype = dtype
 
     def __call__(self, data):
-        common = _GaussianCommon(self.sd, data.domain)
+        common = _GaussianCommon(self.sd, data.domain, self.dtype)
         atts = [a.copy(compute_value=GaussianFeature(i, common))
                 for i, a in enumerate(data.domain.attributes)]
         domain = Orange.data.Domain(atts, data.domain.class_vars,
@@ -135,8 +136,8 @@ class SavitzkyGolayFeature(SelectColumn):
 
 class _SavitzkyGolayCommon(CommonDomainOrderUnknowns):
 
-    def __init__(self, window, polyorder, deriv, domain):
-        super().__init__(domain)
+    def __init__(self, window, polyorder, deriv, domain, dtype=np.float64):
+        super().__init__(domain, dtype)
         self.window = window
         self.polyorder = polyorder
         self.deriv = deriv
@@ -152,14 +153,15 @@ class SavitzkyGolayFiltering(Preprocess):
     Apply a Savitzky-Golay[1] Filter to the data using SciPy Library.
     """
 
-    def __init__(self, window=5, polyorder=2, deriv=0):
+    def __init__(self, window=5, polyorder=2, deriv=0, dtype=np.float64):
         self.window = window
         self.polyorder = polyorder
         self.deriv = deriv
+        self.dtype = dtype
 
     def __call__(self, data):
         common = _SavitzkyGolayCommon(self.window, self.polyorder,
-                                      self.deriv, data.domain)
+                                      self.deriv, data.domain, self.dtype)
         atts = [a.copy(compute_value=SavitzkyGolayFeature(i, common))
                 for i, a in enumerate(data.domain.attributes)]
         domain = Orange.data.Domain(atts, data.domain.class_vars,
@@ -173,8 +175,8 @@ class RubberbandBaselineFeature(SelectColumn):
 
 class _RubberbandBaselineCommon(CommonDomainOrder):
 
-    def __init__(self, peak_dir, sub, domain):
-        super().__init__(domain)
+    def __init__(self, peak_dir, sub, domain, dtype=np.float64):
+        super().__init__(domain, dtype)
         self.peak_dir = peak_dir
         self.sub = sub
 
@@ -213,17 +215,19 @@ class RubberbandBaseline(Preprocess):
     PeakPositive, PeakNegative = 0, 1
     Subtract, View = 0, 1
 
-    def __init__(self, peak_dir=PeakPositive, sub=Subtract):
+    def __init__(self, peak_dir=PeakPositive, sub=Subtract, dtype=np.float64):
         """
         :param peak_dir: PeakPositive or PeakNegative
         :param sub: Subtract (baseline is subtracted) or View
+        :param dtype: np.float64 or np.float32 (computes in single precision)
         """
         self.peak_dir = peak_dir
         self.sub = sub
+        self.dtype = dtype
 
     def __call__(self, data):
         common = _RubberbandBaselineCommon(self.peak_dir, self.sub,
-                                           data.domain)
+                                           data.domain, self.dtype)
         atts = [a.copy(compute_value=RubberbandBaselineFeature(i, common))
                 for i, a in enumerate(data.domain.attributes)]
         domain = Orange.data.Domain(atts, data.domain.class_vars,
@@ -237,8 +241,8 @@ class LinearBaselineFeature(SelectColumn):
 
 class _LinearBaselineCommon(CommonDomainOrderUnknowns):
 
-    def __init__(self, peak_dir, sub, zero_points, domain):
-        super().__init__(domain)
+    def __init__(self, peak_dir, sub, zero_points, domain, dtype=np.float64):
+        super().__init__(domain, dtype)
         self.peak_dir = peak_dir
         self.sub = sub
         self.zero_points = zero_points
@@ -255,18 +259,20 @@ class LinearBaseline(Preprocess):
     PeakPositive, PeakNegative = 0, 1
     Subtract, View = 0, 1
 
-    def __init__(self, peak_dir=PeakPositive, sub=Subtract, zero_points=None):
+    def __init__(self, peak_dir=PeakPositive, sub=Subtract, zero_points=None, dtype=np.float64):
         """
         :param peak_dir: PeakPositive or PeakNegative
         :param sub: Subtract (baseline is subtracted) or View
+        :param dtype: np.float64 or np.float32 (computes in single precision)
         """
         self.peak_dir = peak_dir
         self.sub = sub
         self.zero_points = zero_points
+        self.dtype = dtype
 
     def __call__(self, data):
         common = _LinearBaselineCommon(self.peak_dir, self.sub, self.zero_points,
-                                       data.domain)
+                                       data.domain, self.dtype)
         atts = [a.copy(compute_value=LinearBaselineFeature(i, common))
                 for i, a in enumerate(data.domain.attributes)]
         domain = Orange.data.Domain(atts, data.domain.class_vars,
@@ -728,8 +734,8 @@ class DespikeFeature(SelectColumn):
 
 
 class _DespikeCommon(CommonDomainOrderUnknowns):
-    def __init__(self, threshold, cutoff, dis, domain):
-        super().__init__(domain)
+    def __init__(self, threshold, cutoff, dis, domain, dtype=np.float64):
+        super().__init__(domain, dtype)
         self.threshold = threshold
         # threshold sets up a limit for the modified_z_scores test cutoff for spikes
         self.cutoff = cutoff
@@ -785,14 +791,15 @@ class _DespikeCommon(CommonDomainOrderUnknowns):
 
 class Despike(Preprocess):
 
-    def __init__(self, threshold=7, cutoff=100, dis=5):
+    def __init__(self, threshold=7, cutoff=100, dis=5, dtype=np.float64):
         self.threshold = threshold
         self.cutoff = cutoff
         self.dis = dis
+        self.dtype = dtype
 
     def __call__(self, data):
         common = _DespikeCommon(self.threshold, self.cutoff,
-                                self.dis, data.domain)
+                                self.dis, data.domain, self.dtype)
         atts = [a.copy(compute_value=DespikeFeature(i, common))
                 for i, a in enumerate(data.domain.attributes)]
         domain = Orange.data.Domain(atts, data.domain.class_vars,
@@ -57,6 +57,34 @@ def weighted_wavenumbers(weights, wavenumbers):
         return w
 
 
+def emsc_correct(X, M, M_weighted, n_correct, scaling=True, chunk=10000):
+    """
+    Correct spectra (rows of X) with an EMSC model.
+
+    Model parameters are least-squares solutions for the columns of M_weighted,
+    which is factorized only once for all spectra. The first n_correct
+    columns of M are subtracted from the spectra and, if scaling, the results
+    are divided with the parameter of the following (reference) column.
+    Rows are processed in chunks to limit memory use.
+
+    Return corrected spectra with the model parameters appended.
+    """
+    # the same cutoff as lstsq(..., rcond=-1), so results match per-spectrum lstsq
+    pinv = np.linalg.pinv(M_weighted, rcond=np.finfo(np.float64).eps)
+    N = X.shape[1]
+    newspectra = np.empty((X.shape[0], N + M.shape[1]))
+    for start in range(0, X.shape[0], chunk):
+        rows = slice(start, start + chunk)
+        m = np.dot(X[rows], pinv.T)
+        corrected = X[rows] - np.dot(m[:, :n_correct], M[:, :n_correct].T)
+        if scaling:
+            corrected /= m[:, n_correct:n_correct+1]
+        corrected[np.isinf(corrected)] = np.nan  # fix values caused by zero weights
+        newspectra[rows, :N] = corrected
+        newspectra[rows, N:] = m  # append the model parameters
+    return newspectra
+
+
 class EMSCFeature(SelectColumn):
     pass
 
@@ -77,7 +105,6 @@ class _EMSC(CommonDomainOrderUnknowns):
 
     def transformed(self, X, wavenumbers):
         # wavenumber have to be input as sorted
-        # about 85% of time in __call__ function is spent is lstsq
         # compute average spectrum from the reference
         ref_X = np.atleast_2d(spectra_mean(self.reference.X))
 
@@ -105,26 +132,11 @@ class _EMSC(CommonDomainOrderUnknowns):
         for y in range(0, n_badspec):
             M.append(badspectra_X[y])
         M.append(ref_X)  # always add reference spectrum to the model
-        n_add_model = len(M)
         M = np.vstack(M).T  # M is for the correction, for par. estimation M_weighted is used
 
         M_weighted = M*wei_X.T
 
-        newspectra = np.zeros((X.shape[0], X.shape[1] + n_add_model))
-        for i, rawspectrum in enumerate(X):
-            rawspectrumW = (rawspectrum*wei_X)[0]
-            m = np.linalg.lstsq(M_weighted, rawspectrum, rcond=-1)[0]
-            corrected = rawspectrum
-
-            for x in range(0, self.order+1+n_badspec):
-                corrected = (corrected - (m[x] * M[:, x]))
-            if self.scaling:
-                corrected = corrected/m[self.order+1+n_badspec]
-            corrected[np.isinf(corrected)] = np.nan  # fix values caused by zero weights
-            corrected = np.hstack((corrected, m))  # append the model parameters
-            newspectra[i] = corrected
-
-        return newspectra
+        return emsc_correct(X, M, M_weighted, self.order+1+n_badspec, self.scaling)
 
 
 class EMSC(Preprocess):
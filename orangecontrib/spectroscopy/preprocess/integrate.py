@@ -12,7 +12,7 @@ except ImportError:
 
 from AnyQt.QtCore import Qt
 
-from orangecontrib.spectroscopy.data import getx
+from orangecontrib.spectroscopy.data import spectral_axis
 from orangecontrib.spectroscopy.preprocess.utils import nan_extend_edges_and_interpolate, CommonDomain, \
     edge_baseline
 
@@ -226,9 +226,8 @@ class IntegrateFeatureAtPeak(IntegrateFeature):
 class _IntegrateCommon(CommonDomain):
 
     def transformed(self, data):
-        x = getx(data)
-        x_sorter = np.argsort(x)
-        return data, x, x_sorter
+        axis = spectral_axis(data.domain)
+        return data, axis.x, axis.order
 
 
 class Integrate(Preprocess):
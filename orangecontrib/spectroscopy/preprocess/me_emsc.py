@@ -1,3 +1,6 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
 import numpy as np
 from scipy.signal import hilbert
 from sklearn.decomposition import TruncatedSVD
@@ -13,7 +16,7 @@ except ImportError:
 from orangecontrib.spectroscopy.data import getx, spectra_mean
 from orangecontrib.spectroscopy.preprocess.utils import SelectColumn, CommonDomainOrderUnknowns, \
     interp1d_with_unknowns_numpy, nan_extend_edges_and_interpolate
-from orangecontrib.spectroscopy.preprocess.emsc import weighted_wavenumbers
+from orangecontrib.spectroscopy.preprocess.emsc import weighted_wavenumbers, emsc_correct
 
 
 def interpolate_to_data(other_xs, other_data, wavenumbers):
@@ -46,19 +49,48 @@ def calculate_complex_n(ref_X,wavenumbers):
     return nprs, nkks
 
 
-def calculate_Qext_curves(nprs, nkks, alpha0, gamma, wavenumbers):
-    def mie_hulst_extinction(rho, tanbeta):
-        beta = np.arctan(tanbeta)
-        cosbeta = np.cos(beta)
-        return (2 - 4 * np.e ** (-rho * tanbeta) * (cosbeta / rho) * np.sin(rho - beta) -
-                4 * np.e ** (-rho * tanbeta) * (cosbeta / rho) ** 2 * np.cos(rho - 2 * beta) +
-                4 * (cosbeta / rho) ** 2 * np.cos(2 * beta))
-
-    rho = np.array(
-        [alpha0val * (1 + gammaval * nkks) * (wavenumbers * 100) for alpha0val in alpha0 for gammaval in gamma])
-    tanbeta = [nprs / (1 / gammaval + nkks) for _ in alpha0 for gammaval in gamma]
-    Qext = np.array([mie_hulst_extinction(rhoval, tanbetaval) for rhoval, tanbetaval in zip(rho, tanbeta)])
-    return Qext
+def calculate_Qext_curves(nprs, nkks, alpha0, gamma, wavenumbers, dtype=np.float64):
+    """
+    Return Mie extinction curves (van de Hulst approximation) for all
+    combinations of alpha0 and gamma as rows of a 2D array; alpha0 changes
+    slowest. The whole grid is computed at once in the given dtype
+    (float32 is faster and halves memory at a loss of precision).
+    """
+    nprs, nkks = np.asarray(nprs, dtype=dtype), np.asarray(nkks, dtype=dtype)
+    wavenumbers = np.asarray(wavenumbers, dtype=dtype)
+    alpha0 = np.asarray(alpha0, dtype=dtype).reshape(-1, 1, 1)
+    gamma = np.asarray(gamma, dtype=dtype).reshape(-1, 1)
+
+    # beta does not depend on alpha0
+    tanbeta = nprs / (1 / gamma + nkks)
+    beta = np.arctan(tanbeta)
+    cosbeta = np.cos(beta)
+
+    rho = alpha0 * (1 + gamma * nkks)
+    rho *= wavenumbers * 100
+
+    # Qext = 2 - 4 e^(-rho tanbeta) cosbeta/rho (sin(rho - beta) + cosbeta/rho cos(rho - 2 beta))
+    #        + 4 (cosbeta/rho)^2 cos(2 beta)
+    # transcendental functions are not computed in-place, which is much slower for float32
+    q = cosbeta / rho
+    d = np.subtract(rho, beta)
+    t = np.sin(d)
+    np.subtract(rho, 2 * beta, out=d)
+    u = np.cos(d)
+    u *= q
+    t += u
+    np.multiply(rho, tanbeta, out=d)
+    np.negative(d, out=d)
+    np.exp(d, out=u)
+    t *= u
+    t *= q
+    Qext = rho  # rho is not needed anymore
+    np.multiply(q, q, out=Qext)
+    Qext *= np.cos(2 * beta)
+    Qext -= t
+    Qext *= 4
+    Qext += 2
+    return Qext.reshape(-1, Qext.shape[-1])
 
 
 def orthogonalize_Qext(Qext, reference):
@@ -91,6 +123,242 @@ def cal_ncomp(reference, wavenumbers,  explainedVarLim, alpha0, gamma):
     return numComp
 
 
+def make_basic_emsc_mod(ref_X, wavenumbers):
+    N = wavenumbers.shape[0]
+    m0 = - 2.0 / (wavenumbers[0] - wavenumbers[N - 1])
+    c_coeff = 0.5 * (wavenumbers[0] + wavenumbers[N - 1])
+    M_basic = []
+    for x in range(0, 3):
+        M_basic.append((m0 * (wavenumbers - c_coeff)) ** x)
+    M_basic.append(ref_X)  # always add reference spectrum to the model
+    M_basic = np.vstack(M_basic).T
+    return M_basic
+
+
+def make_emsc_model(badspectra, referenceSpec):
+    ncomp = badspectra.shape[0]
+    M = np.ones([len(referenceSpec), ncomp+2])
+    M[:, 1:ncomp+1] = badspectra.T
+    M[:, ncomp+1] = referenceSpec
+    return M
+
+
+def cal_emsc(M, X):
+    correctedspectra = emsc_correct(X, M, M, M.shape[1] - 1)
+    params = correctedspectra[:, -M.shape[1]:]
+    res = X - np.dot(params, M.T)  # Have to check if this is correct FIXME
+    return correctedspectra, res
+
+
+# number of distinct model setups (reference, wavenumbers, weights and
+# Mie parameters) whose results are kept
+_MODEL_CACHE_SIZE = 32
+
+
+def _key(a):
+    return np.ascontiguousarray(a, dtype=np.float64).tobytes()
+
+
+def _from_key(b):
+    return np.frombuffer(b, dtype=np.float64)
+
+
+def _reference_ncomp(ref_X, reference_xs, explainedVarLim, alpha0, gamma):
+    ref_X = np.atleast_2d(ref_X)
+    wavenumbers_ref = np.array(sorted(reference_xs))
+    ref_X = interpolate_to_data(reference_xs, ref_X, wavenumbers_ref)
+    ref_X = ref_X[0]
+    return cal_ncomp(ref_X, wavenumbers_ref, explainedVarLim, alpha0, gamma)
+
+
+@lru_cache(maxsize=_MODEL_CACHE_SIZE)
+def _cached_reference_ncomp(ref_X, reference_xs, explainedVarLim, alpha0, gamma):
+    return _reference_ncomp(_from_key(ref_X), _from_key(reference_xs), explainedVarLim,
+                            _from_key(alpha0), _from_key(gamma))
+
+
+def reference_ncomp(ref_X, reference_xs, explainedVarLim, alpha0, gamma):
+    """
+    Return the number of Mie components that explain explainedVarLim
+    percent of variance for the mean reference spectrum ref_X.
+
+    Results are cached by the contents of the arguments.
+    """
+    return _cached_reference_ncomp(_key(ref_X), _key(reference_xs), explainedVarLim,
+                                   _key(alpha0), _key(gamma))
+
+
+def _model_setup(ref_X, reference_xs, wavenumbers, wei_X, alpha0, gamma, ncomp, positiveRef):
+    ref_X = interpolate_to_data(reference_xs, np.atleast_2d(ref_X), wavenumbers)
+    ref_X = ref_X[0]
+
+    ref_X = ref_X*wei_X
+    ref_X = ref_X[0]
+
+    nonzeroReference = ref_X
+    nonzeroReference[nonzeroReference < 0] = 0
+
+    if positiveRef:
+        ref_X = nonzeroReference
+
+    resonant = True  # Possibility for using the 2008 version
+
+    if resonant:  # if this should be any point, we need to terminate after 1 iteartion for the non-resonant one
+        nprs, nkks = calculate_complex_n(ref_X, wavenumbers)
+    else:
+        npr = np.zeros(len(wavenumbers))
+        nprs = npr / (wavenumbers * 100)
+        nkks = np.zeros(len(wavenumbers))
+
+    # For the first iteration, make basic EMSC model
+    M_basic = make_basic_emsc_mod(ref_X, wavenumbers)
+
+    # Calculate scattering curves for ME-EMSC
+    Qext = calculate_Qext_curves(nprs, nkks, alpha0, gamma, wavenumbers)
+    Qext = orthogonalize_Qext(Qext, ref_X)
+    badspectra = compress_Mie_curves(Qext, ncomp)
+
+    # Establish ME-EMSC model
+    M = make_emsc_model(badspectra, ref_X)
+    return M_basic, M
+
+
+@lru_cache(maxsize=_MODEL_CACHE_SIZE)
+def _cached_model_setup(ref_X, reference_xs, wavenumbers, wei_X, alpha0, gamma, ncomp, positiveRef):
+    M_basic, M = _model_setup(_from_key(ref_X), _from_key(reference_xs), _from_key(wavenumbers),
+                              _from_key(wei_X).reshape(1, -1), _from_key(alpha0), _from_key(gamma),
+                              ncomp, positiveRef)
+    # cached arrays are shared
+    M_basic.flags.writeable = False
+    M.flags.writeable = False
+    return M_basic, M
+
+
+def model_setup(ref_X, reference_xs, wavenumbers, wei_X, alpha0, gamma, ncomp, positiveRef):
+    """
+    Return the basic EMSC model and the ME-EMSC model of the first
+    iteration for the mean reference spectrum ref_X (at reference_xs)
+    and weights wei_X at wavenumbers.
+
+    Results are cached by the contents of the arguments, so that chunks of
+    data and repeated transformations do not recompute Mie curves and their
+    decomposition. The returned arrays are read-only.
+    """
+    return _cached_model_setup(_key(ref_X), _key(reference_xs), _key(wavenumbers), _key(wei_X),
+                               _key(alpha0), _key(gamma), ncomp, positiveRef)
+
+
+def rmse(res):
+    return np.round(np.sqrt((1/res.shape[-1])*np.sum(res**2, axis=-1)), 4)
+
+
+def iteration_step(spectrum, reference, wavenumbers, wei_X, alpha0, gamma, ncomp, positiveRef):
+    """One ME-EMSC iteration for a spectrum (a 2D row) given its reference,
+    the previous correction already scaled with basic EMSC."""
+    # some BLAS implementation can raise an exception in basic EMSC (MKL)
+    # while some other only return an array of NaN (OpenBLAS), therefore
+    # raise an exception manually
+    if np.all(np.isnan(reference)):
+        raise np.linalg.LinAlgError()
+
+    # Apply weights
+    reference = reference*wei_X
+    reference = reference[0]
+
+    # set negative parts to zero
+    nonzeroReference = reference.copy()
+    nonzeroReference[nonzeroReference < 0] = 0
+
+    if positiveRef:
+        reference = nonzeroReference
+
+    # calculate Qext-curves
+    nprs, nkks = calculate_complex_n(nonzeroReference, wavenumbers)
+    Qext = calculate_Qext_curves(nprs, nkks, alpha0, gamma, wavenumbers)
+    Qext = orthogonalize_Qext(Qext, reference)
+
+    badspectra = compress_Mie_curves(Qext, ncomp)
+
+    # build ME-EMSC model
+    M = make_emsc_model(badspectra, reference)
+
+    # calculate parameters and corrected spectra
+    return cal_emsc(M, spectrum)
+
+
+def iterate(spectra, correctedFirsIteration, residualsFirstIteration, wavenumbers, M_basic, wei_X,
+            alpha0, gamma, ncomp, maxNiter, fixedNiter, positiveRef):
+    """
+    Iterate ME-EMSC for a batch of spectra, starting from their corrections
+    in the first iteration. All spectra that have not yet converged advance
+    together, so that their references are scaled with basic EMSC at once.
+
+    Return corrected spectra with model parameters, RMSE and the number of
+    iterations; spectra that could not be corrected are NaN.
+    """
+    newspectra = np.full(correctedFirsIteration.shape, np.nan)
+    numberOfIterations = np.full(spectra.shape[0], np.nan)
+    RMSEall = np.full([spectra.shape[0]], np.nan)
+    corrSpec = correctedFirsIteration.copy()
+    RMSE = [[r] for r in rmse(residualsFirstIteration)]
+    active = np.arange(spectra.shape[0])
+    for iterationNumber in range(2, maxNiter+1):
+        # scale with basic EMSC
+        references = emsc_correct(corrSpec[active, :-ncomp-2], M_basic, M_basic, 3)
+        references = references[:, :-M_basic.shape[1]]
+        unconverged = []
+        for i, reference in zip(active, references):
+            try:
+                newSpec, res = iteration_step(spectra[i:i+1], reference, wavenumbers, wei_X,
+                                              alpha0, gamma, ncomp, positiveRef)
+            except np.linalg.LinAlgError:
+                continue
+            corrSpec[i] = newSpec[0]
+            RMSE[i].append(rmse(res)[0])
+            # Stop criterion
+            if iterationNumber == maxNiter:
+                converged = True
+            elif fixedNiter and iterationNumber < fixedNiter:
+                converged = False
+            elif iterationNumber == fixedNiter:
+                converged = True
+            elif iterationNumber > 2 and not fixedNiter:
+                rmses = RMSE[i]
+                converged = (rmses[-1] == rmses[-2] and rmses[-1] == rmses[-3]) \
+                    or rmses[-1] > rmses[-2]
+            else:
+                converged = False
+            if converged:
+                newspectra[i] = corrSpec[i]
+                numberOfIterations[i] = iterationNumber
+                RMSEall[i] = RMSE[i][-1]
+            else:
+                unconverged.append(i)
+        active = np.array(unconverged, dtype=int)
+        if not len(active):
+            break
+    return newspectra, RMSEall, numberOfIterations
+
+
+def iterate_parallel(spectra, correctedFirsIteration, residualsFirstIteration, *args,
+                     workers=1, chunks_per_worker=4):
+    """
+    Run iterate on chunks of spectra in a pool of `workers` processes.
+    Spectra are independent; several chunks per worker balance the load
+    when spectra converge after a different number of iterations.
+    """
+    n = spectra.shape[0]
+    if workers <= 1 or n < 2:
+        return iterate(spectra, correctedFirsIteration, residualsFirstIteration, *args)
+    chunks = np.array_split(np.arange(n), min(n, workers * chunks_per_worker))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(iterate, spectra[c], correctedFirsIteration[c],
+                                   residualsFirstIteration[c], *args)
+                   for c in chunks]
+        results = [f.result() for f in futures]
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
 class ME_EMSCFeature(SelectColumn):
     pass
 
@@ -101,7 +369,8 @@ class ME_EMSCModel(SelectColumn):
 
 class _ME_EMSC(CommonDomainOrderUnknowns):
 
-    def __init__(self, reference, weights, ncomp, alpha0, gamma, maxNiter, fixedNiter, positiveRef, domain):
+    def __init__(self, reference, weights, ncomp, alpha0, gamma, maxNiter, fixedNiter, positiveRef, domain,
+                 workers=1):
         super().__init__(domain)
         self.reference = reference
         self.weights = weights  # !!! THIS SHOULD BE A NP ARRAY (or similar) with inflection points
@@ -111,167 +380,14 @@ class _ME_EMSC(CommonDomainOrderUnknowns):
         self.maxNiter = maxNiter
         self.fixedNiter = fixedNiter
         self.positiveRef = positiveRef
+        self.workers = workers
 
     def transformed(self, X, wavenumbers):
         # wavenumber have to be input as sorted
         # compute average spectrum from the reference
-
-        def make_basic_emsc_mod(ref_X):
-            N = wavenumbers.shape[0]
-            m0 = - 2.0 / (wavenumbers[0] - wavenumbers[N - 1])
-            c_coeff = 0.5 * (wavenumbers[0] + wavenumbers[N - 1])
-            M_basic = []
-            for x in range(0, 3):
-                M_basic.append((m0 * (wavenumbers - c_coeff)) ** x)
-            M_basic.append(ref_X)  # always add reference spectrum to the model
-            M_basic = np.vstack(M_basic).T
-            return M_basic
-
-        def cal_emsc_basic(M_basic, spectrum):
-            m = np.linalg.lstsq(M_basic, spectrum, rcond=-1)[0]
-            corrected = spectrum
-            for x in range(0, 3):
-                corrected = (corrected - (m[x] * M_basic[:, x]))
-            corrected = corrected / m[3]
-            scaled_spectrum = corrected
-            return scaled_spectrum
-
-        def make_emsc_model(badspectra, referenceSpec):
-            M = np.ones([len(wavenumbers), self.ncomp+2])
-            M[:, 1:self.ncomp+1] = np.array([spectrum for spectrum in badspectra.T])
-            M[:, self.ncomp+1] = referenceSpec
-            return M
-
-        def cal_emsc(M, X):
-            correctedspectra = np.zeros((X.shape[0], X.shape[1] + M.shape[1]))
-            for i, rawspectrum in enumerate(X):
-                m = np.linalg.lstsq(M, rawspectrum, rcond=-1)[0]
-                corrected = rawspectrum
-                for x in range(0, 1 + self.ncomp):
-                    corrected = (corrected - (m[x] * M[:, x]))
-                corrected = corrected / m[1 + self.ncomp]
-                corrected[np.isinf(corrected)] = np.nan  # fix values caused by zero weights
-                corrected = np.hstack((corrected, m))  # append the model parameters
-                correctedspectra[i] = corrected
-
-            params = correctedspectra[:, -(self.ncomp+2):]
-            res = X - np.dot(params, M.T)  # Have to check if this is correct FIXME
-            return correctedspectra, res
-
-        def iteration_step(spectrum, reference, wavenumbers, M_basic, alpha0, gamma):
-            # scale with basic EMSC:
-            reference = cal_emsc_basic(M_basic, reference)
-            # some BLAS implementation can raise an exception in the upper call (MKL)
-            # while some other only return an array of NaN (OpenBLAS), therefore
-            # raise an exception manually
-            if np.all(np.isnan(reference)):
-                raise np.linalg.LinAlgError()
-
-            # Apply weights
-            reference = reference*wei_X
-            reference = reference[0]
-
-            # set negative parts to zero
-            nonzeroReference = reference.copy()
-            nonzeroReference[nonzeroReference < 0] = 0
-
-            if self.positiveRef:
-                reference = nonzeroReference
-
-            # calculate Qext-curves
-            nprs, nkks = calculate_complex_n(nonzeroReference, wavenumbers)
-            Qext = calculate_Qext_curves(nprs, nkks, alpha0, gamma, wavenumbers)
-            Qext = orthogonalize_Qext(Qext, reference)
-
-            badspectra = compress_Mie_curves(Qext, self.ncomp)
-
-            # build ME-EMSC model
-            M = make_emsc_model(badspectra, reference)
-
-            # calculate parameters and corrected spectra
-            newspectrum, res = cal_emsc(M, spectrum)
-
-            return newspectrum, res
-
-        def iterate(spectra, correctedFirsIteration, residualsFirstIteration, wavenumbers, M_basic, alpha0, gamma):
-            newspectra = np.full(correctedFirsIteration.shape, np.nan)
-            numberOfIterations = np.full(spectra.shape[0], np.nan)
-            residuals = np.full(spectra.shape, np.nan)
-            RMSEall = np.full([spectra.shape[0]], np.nan)
-            for i in range(correctedFirsIteration.shape[0]):
-                corrSpec = correctedFirsIteration[i]
-                rawSpec = spectra[i,:]
-                rawSpec = rawSpec.reshape(1,-1)
-                RMSE = [round(np.sqrt((1/len(residualsFirstIteration[i,:]))*np.sum(residualsFirstIteration[i,:]**2)),4)]
-                for iterationNumber in range(2, self.maxNiter+1):
-                    try:
-                        newSpec, res = iteration_step(rawSpec, corrSpec[:-self.ncomp-2], wavenumbers, M_basic, alpha0, gamma)
-                    except np.linalg.LinAlgError:
-                        newspectra[i, :] = np.full([rawSpec.shape[1] + self.ncomp + 2], np.nan)
-                        residuals[i, :] = np.full(rawSpec.shape, np.nan)
-                        RMSEall[i] = np.nan
-                        break
-                    corrSpec = newSpec[0,:]
-                    rmse = round(np.sqrt((1/len(res[0,:]))*np.sum(res**2)),4)
-                    RMSE.append(rmse)
-                    # Stop criterion
-                    if iterationNumber == self.maxNiter:
-                        newspectra[i, :] = corrSpec
-                        numberOfIterations[i] = iterationNumber
-                        residuals[i, :] = res
-                        RMSEall[i] = RMSE[-1]
-                        break
-                    elif self.fixedNiter and iterationNumber < self.fixedNiter:
-                        continue
-                    elif iterationNumber == self.maxNiter or iterationNumber == self.fixedNiter:
-                        newspectra[i, :] = corrSpec
-                        numberOfIterations[i] = iterationNumber
-                        residuals[i, :] = res
-                        RMSEall[i] = RMSE[-1]
-                        break
-                    elif iterationNumber > 2 and self.fixedNiter == False:
-                        if (rmse == RMSE[-2] and rmse == RMSE[-3]) or rmse > RMSE[-2]:
-                            newspectra[i, :] = corrSpec
-                            numberOfIterations[i] = iterationNumber
-                            residuals[i, :] = res
-                            RMSEall[i] = RMSE[-1]
-                            break
-            return newspectra, RMSEall, numberOfIterations
-
-        ref_X = np.atleast_2d(spectra_mean(self.reference.X))
-        ref_X = interpolate_to_data(getx(self.reference), ref_X, wavenumbers)
-        ref_X = ref_X[0]
-
         wei_X = weighted_wavenumbers(self.weights, wavenumbers)
-
-        ref_X = ref_X*wei_X
-        ref_X = ref_X[0]
-
-        nonzeroReference = ref_X
-        nonzeroReference[nonzeroReference < 0] = 0
-
-        if self.positiveRef:
-            ref_X = nonzeroReference
-
-        resonant = True  # Possibility for using the 2008 version
-
-        if resonant:  # if this should be any point, we need to terminate after 1 iteartion for the non-resonant one
-            nprs, nkks = calculate_complex_n(ref_X, wavenumbers)
-        else:
-            npr = np.zeros(len(wavenumbers))
-            nprs = npr / (wavenumbers * 100)
-            nkks = np.zeros(len(wavenumbers))
-
-        # For the first iteration, make basic EMSC model
-        M_basic = make_basic_emsc_mod(ref_X)  # Consider to make the M_basic in the init since this one does not change.
-
-        # Calculate scattering curves for ME-EMSC
-        Qext = calculate_Qext_curves(nprs, nkks, self.alpha0, self.gamma, wavenumbers)
-        Qext = orthogonalize_Qext(Qext, ref_X)
-        badspectra = compress_Mie_curves(Qext, self.ncomp)
-
-        # Establish ME-EMSC model
-        M = make_emsc_model(badspectra, ref_X)
+        M_basic, M = model_setup(spectra_mean(self.reference.X), getx(self.reference), wavenumbers,
+                                 wei_X, self.alpha0, self.gamma, self.ncomp, self.positiveRef)
 
         # Correcting all spectra at once for the first iteration
         newspectra, res = cal_emsc(M, X)
@@ -284,7 +400,9 @@ class _ME_EMSC(CommonDomainOrderUnknowns):
             return newspectra
 
         # Iterate
-        newspectra, RMSEall, numberOfIterations = iterate(X, newspectra, res, wavenumbers, M_basic, self.alpha0, self.gamma)
+        newspectra, RMSEall, numberOfIterations = iterate_parallel(
+            X, newspectra, res, wavenumbers, M_basic, wei_X, self.alpha0, self.gamma,
+            self.ncomp, self.maxNiter, self.fixedNiter, self.positiveRef, workers=self.workers)
         newspectra = np.hstack((newspectra, numberOfIterations.reshape(-1, 1),RMSEall.reshape(-1, 1)))
         return newspectra
 
@@ -296,7 +414,8 @@ class MissingReferenceException(Exception):
 class ME_EMSC(Preprocess):
 
     def __init__(self, reference=None, weights=None, ncomp=False, n0=np.linspace(1.1, 1.4, 10), a=np.linspace(2, 7.1, 10), h=0.25,
-                 max_iter=30, fixed_iter=False, positive_reference=True, output_model=False, ranges=None):
+                 max_iter=30, fixed_iter=False, positive_reference=True, output_model=False, ranges=None,
+                 workers=1):
         # the first non-kwarg can not be a data table (Preprocess limitations)
         # ranges could be a list like this [[800, 1000], [1300, 1500]]
         if reference is None:
@@ -305,6 +424,8 @@ class ME_EMSC(Preprocess):
         self.weights = weights
         self.ncomp = ncomp
         self.output_model = output_model
+        # spectra are iterated in a pool of processes if workers > 1
+        self.workers = workers
         explainedVariance = 99.96
 
         self.maxNiter = max_iter
@@ -319,18 +440,16 @@ class ME_EMSC(Preprocess):
         self.gamma = self.h * np.log(10) / (4 * np.pi * 0.5 * np.pi * (self.n0 - 1) * self.a * 1e-6)
 
         if not self.ncomp:
-            ref_X = np.atleast_2d(spectra_mean(self.reference.X))
-            wavenumbers_ref = np.array(sorted(getx(self.reference)))
-            ref_X = interpolate_to_data(getx(self.reference), ref_X, wavenumbers_ref)
-            ref_X = ref_X[0]
-            self.ncomp = cal_ncomp(ref_X, wavenumbers_ref, explainedVariance, self.alpha0, self.gamma)
+            self.ncomp = reference_ncomp(spectra_mean(self.reference.X), getx(self.reference),
+                                         explainedVariance, self.alpha0, self.gamma)
         else:
             self.explainedVariance = False
 
     def __call__(self, data):
         # creates function for transforming data
         common = _ME_EMSC(reference=self.reference, weights=self.weights, ncomp=self.ncomp, alpha0=self.alpha0,
-                          gamma=self.gamma, maxNiter=self.maxNiter, fixedNiter=self.fixedNiter, positiveRef=self.positiveRef, domain=data.domain)
+                          gamma=self.gamma, maxNiter=self.maxNiter, fixedNiter=self.fixedNiter, positiveRef=self.positiveRef, domain=data.domain,
+                          workers=self.workers)
         # takes care of domain column-wise, by above transformation function
         atts = [a.copy(compute_value=ME_EMSCFeature(i, common))
                 for i, a in enumerate(data.domain.attributes)]
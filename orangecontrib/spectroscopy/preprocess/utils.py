@@ -2,7 +2,8 @@ import numpy as np
 from Orange.data.util import SharedComputeValue
 from scipy.interpolate import interp1d
 
-from orangecontrib.spectroscopy.data import getx
+from orangecontrib.spectroscopy.data import getx, spectral_axis
+from orangecontrib.spectroscopy.utils import as_spectra_dtype, check_spectra_dtype
 
 
 def is_increasing(a):
@@ -77,12 +78,23 @@ class CommonDomainRef(CommonDomain):
 
 class CommonDomainOrder(CommonDomain):
     """CommonDomain + it also handles wavenumber order.
+
+    Spectra are passed to transformed as dtype (np.float64 or np.float32,
+    see check_spectra_dtype).
     """
+
+    dtype = np.dtype(np.float64)
+
+    def __init__(self, domain, dtype=np.float64):
+        super().__init__(domain)
+        self.dtype = check_spectra_dtype(dtype)
+
     def __call__(self, data):
         data = self.transform_domain(data)
 
         # order X by wavenumbers
         xs, xsind, mon, X = transform_to_sorted_features(data)
+        X = self._as_dtype(X)
         xc = X.shape[1]
 
         # do the transformation
@@ -91,9 +103,13 @@ class CommonDomainOrder(CommonDomain):
         # restore order
         return self._restore_order(X, mon, xsind, xc)
 
+    def _as_dtype(self, X):
+        return as_spectra_dtype(X, self.dtype)
+
     def _restore_order(self, X, mon, xsind, xc):
         # restore order and leave additional columns as they are
-        restored = transform_back_to_features(xsind, mon, X[:, :xc])
+        restored = transform_back_to_features(xsind, mon, X[:, :xc],
+                                              spectral_axis(self.domain).inverse)
         return np.hstack((restored, X[:, xc:]))
 
     def transformed(self, X, wavenumbers):
@@ -109,6 +125,7 @@ class CommonDomainOrderUnknowns(CommonDomainOrder):
 
         # order X by wavenumbers
         xs, xsind, mon, X = transform_to_sorted_features(data)
+        X = self._as_dtype(X)
         xc = X.shape[1]
 
         # interpolates unknowns
@@ -152,8 +169,9 @@ def nan_extend_edges_and_interpolate(xs, X):
 
 
 def transform_to_sorted_features(data):
-    xs = getx(data)
-    return transform_to_sorted_wavenumbers(xs, data.X)
+    axis = spectral_axis(data.domain)
+    X = data.X if axis.monotonic else data.X[:, axis.order]
+    return axis.x, axis.order, axis.monotonic, X
 
 
 def transform_to_sorted_wavenumbers(xs, X):
@@ -163,8 +181,10 @@ def transform_to_sorted_wavenumbers(xs, X):
     return xs, xsind, mon, X
 
 
-def transform_back_to_features(xsind, mon, X):
-    return X if mon else X[:, np.argsort(xsind)]
+def transform_back_to_features(xsind, mon, X, inverse=None):
+    if mon:
+        return X
+    return X[:, np.argsort(xsind) if inverse is None else inverse]
 
 
 def fill_edges_1d(l):
@@ -178,8 +198,22 @@ def fill_edges_1d(l):
 
 def fill_edges(mat):
     """Replace (inplace!) NaN at sides with the closest value"""
-    for l in mat:
-        fill_edges_1d(l)
+    if not mat.shape[1]:
+        return
+    rows = np.flatnonzero(np.isnan(mat[:, 0]) | np.isnan(mat[:, -1]))
+    known = ~np.isnan(mat[rows])
+    has_known = known.any(axis=1)
+    rows, known = rows[has_known], known[has_known]
+    if not len(rows):
+        return
+    first = np.argmax(known, axis=1)
+    last = known.shape[1] - 1 - np.argmax(known[:, ::-1], axis=1)
+    # rows with the same edges are filled at once
+    edges, inverse = np.unique(np.column_stack((first, last)), axis=0, return_inverse=True)
+    for (fi, li), group in zip(edges, _group_rows(inverse)):
+        group = rows[group]
+        mat[group, :fi] = mat[group, fi][:, None]
+        mat[group, li + 1:] = mat[group, li][:, None]
 
 
 def remove_whole_nan_ys(x, ys):
@@ -191,35 +225,103 @@ def remove_whole_nan_ys(x, ys):
     return x, ys
 
 
+# number of values interpolated at once; bounds temporary memory
+# and keeps it in the processor cache
+_INTERPOLATION_CHUNK = 2 ** 16
+
+# above this many interpolated points per row, np.interp on each row
+# is as fast as interpolating groups of rows at once
+_MAX_GROUP_INTERPOLATION_POINTS = 1000
+
+
+def _group_rows(inverse):
+    """Return a list of arrays of row indices for each group label in inverse
+    (labels are consecutive integers, as returned by np.unique)."""
+    order = np.argsort(inverse, kind="stable")
+    return np.split(order, np.cumsum(np.bincount(inverse))[:-1])
+
+
+def _nan_pattern_groups(nans):
+    """
+    Group rows of a boolean matrix of unknowns by identical patterns.
+
+    Return a list of (pattern, rows) pairs. In practice spectra have
+    one or a few patterns, so that each group can be handled at once.
+    """
+    if not len(nans):
+        return []
+    if not nans.shape[1] or not nans.any():
+        return [(nans[0], np.arange(len(nans)))]
+    packed = np.ascontiguousarray(np.packbits(nans, axis=1))
+    packed = packed.view(np.dtype((np.void, packed.shape[1])))[:, 0]
+    _, first, inverse = np.unique(packed, return_index=True, return_inverse=True)
+    return list(zip(nans[first], _group_rows(inverse)))
+
+
+def _known_groups(x, ys):
+    """
+    Yield (xt, columns, rows) for groups of rows of ys with the same
+    unknown values, where xt are sorted x of known values and columns
+    their indices in ys. Rows without known values are skipped.
+    """
+    sorti = np.argsort(x)
+    x = x[sorti]
+    for nan, rows in _nan_pattern_groups(np.isnan(ys)):
+        known = ~nan[sorti]
+        if known.any():
+            yield x[known], sorti[known], rows
+
+
+def _chunks(rows, width):
+    size = max(1, _INTERPOLATION_CHUNK // max(1, width))
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
 def interp1d_with_unknowns_numpy(x, ys, points, kind="linear"):
     if kind != "linear":
         raise NotImplementedError
-    out = np.zeros((len(ys), len(points)))*np.nan
-    sorti = np.argsort(x)
-    x = x[sorti]
-    for i, y in enumerate(ys):
-        y = y[sorti]
-        nan = np.isnan(y)
-        xt = x[~nan]
-        yt = y[~nan]
-        # do not interpolate unknowns at the edges
-        if len(xt):  # check if all values are removed
-            out[i] = np.interp(points, xt, yt, left=np.nan, right=np.nan)
+    ys = np.asarray(ys)
+    points = np.asarray(points)
+    # keep single precision of ys
+    dtype = np.result_type(ys.dtype, np.float32)
+    out = np.full((len(ys), len(points)), np.nan, dtype=dtype)
+    for xt, columns, rows in _known_groups(x, ys):
+        # the same computation as np.interp with precomputed indices:
+        # unknowns at the edges are not interpolated and points at known
+        # values (often all of them) take these values
+        inside = np.flatnonzero((points >= xt[0]) & (points <= xt[-1]))
+        j = np.searchsorted(xt, points[inside], side="right") - 1
+        dx = points[inside] - xt[j]
+        exact = dx == 0
+        at, at_j = inside[exact], j[exact]
+        between, j, dx = inside[~exact], j[~exact], dx[~exact]
+        if len(rows) == 1 or len(between) > _MAX_GROUP_INTERPOLATION_POINTS:
+            for i in rows:
+                out[i] = np.interp(points, xt, ys[i, columns], left=np.nan, right=np.nan)
+            continue
+        dxt = xt[j + 1] - xt[j]
+        for chunk in _chunks(rows, len(inside)):
+            out[np.ix_(chunk, at)] = ys[np.ix_(chunk, columns[at_j])]
+            if len(between):
+                y0 = ys[np.ix_(chunk, columns[j])].astype(np.float64, copy=False)
+                slope = ys[np.ix_(chunk, columns[j + 1])].astype(np.float64, copy=False)
+                slope -= y0
+                slope /= dxt
+                slope *= dx
+                slope += y0
+                out[np.ix_(chunk, between)] = slope
     return out
 
 
 def interp1d_with_unknowns_scipy(x, ys, points, kind="linear"):
+    ys = np.asarray(ys)
     out = np.zeros((len(ys), len(points)))*np.nan
-    sorti = np.argsort(x)
-    x = x[sorti]
-    for i, y in enumerate(ys):
-        y = y[sorti]
-        nan = np.isnan(y)
-        xt = x[~nan]
-        yt = y[~nan]
-        if len(xt):  # check if all values are removed
-            out[i] = interp1d(xt, yt, fill_value=np.nan, assume_sorted=True,
-                              bounds_error=False, kind=kind, copy=False)(points)
+    for xt, columns, rows in _known_groups(x, ys):
+        for chunk in _chunks(rows, len(points)):
+            yt = ys[np.ix_(chunk, columns)]
+            out[chunk] = interp1d(xt, yt, fill_value=np.nan, assume_sorted=True,
+                                  bounds_error=False, kind=kind, copy=False, axis=1)(points)
     return out
 
 
@@ -50,13 +50,17 @@ class OmnicMap(DataObject.DataObject):
     This class  info member contains all the parsed information.
     This class data member contains the map itself as a 3D array.
     '''
-    def __init__(self, filename):
+    def __init__(self, filename, channels=None):
         '''
         Parameters:
         -----------
         filename : str
             Name of the .map file.
             It is expected to work with OMNIC versions 7.x and 8.x
+        channels : callable, optional
+            Function of the parsed OMNIC information (or None) and the
+            number of channels that returns an index (slice or array) of
+            channels to read. All channels are read by default.
         '''
         DataObject.DataObject.__init__(self)
         if sys.platform == 'win32' or 1: #modified, "added or 1"
@@ -138,23 +142,20 @@ class OmnicMap(DataObject.DataObject):
         #arrange as an EDF Stack
         self.info = {}
         self.__nFiles = int(self.nSpectra / self.nRows)
-        self.data = numpy.zeros((self.__nFiles, self.nRows, self.nChannels),
-                                 dtype=numpy.float32)
-
         self.__nImagesPerFile = 1
         offset = firstByte - 16 + 100  # starting position of the data
         delta = 100 + self.nChannels * 4
-        fmt = "%df" % self.nChannels
-        for i in range(self.__nFiles):
-            for j in range(self.nRows):
-                # this approach is inneficient when compared to a direct
-                # data readout, but it allows to deal with nan at the source
-                tmpData = numpy.zeros((self.nChannels,), dtype=numpy.float32)
-                tmpData[:] = struct.unpack(fmt,\
-                                data[offset:(offset + delta - 100)])
-                finiteData = numpy.isfinite(tmpData)
-                self.data[i, j, finiteData] = tmpData[finiteData]
-                offset = int(offset + delta)
+        #modified: read all spectra at once through a strided view of the
+        #records (100 byte header + nChannels floats) instead of unpacking
+        #them one by one; non-finite values are still set to zero
+        records = numpy.ndarray((self.__nFiles, self.nRows, self.nChannels),
+                                dtype=numpy.float32, buffer=data, offset=offset,
+                                strides=(self.nRows * delta, delta, 4))
+        #modified: only selected channels are copied
+        self.channels = slice(None) if channels is None \
+            else channels(omnicInfo, self.nChannels)
+        self.data = numpy.array(records[:, :, self.channels])
+        self.data[~numpy.isfinite(self.data)] = 0
         shape = self.data.shape
         for i in range(len(shape)):
             key = 'Dim_%d' % (i + 1,)
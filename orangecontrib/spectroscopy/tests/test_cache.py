@@ -0,0 +1,182 @@
+import glob
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+import Orange
+from Orange.data import FileFormat, dataset_dirs
+
+from orangecontrib.spectroscopy.data import AsciiColReader, NeaReader, SPAReader, \
+    agilentMosaicReader
+from orangecontrib.spectroscopy.utils.cache import SpectraCache
+
+
+def reader_copy(reader_cls, fn, directory):
+    """Return a reader of a copy of a data set file in directory."""
+    absolute_filename = FileFormat.locate(fn, dataset_dirs)
+    copy = os.path.join(directory, os.path.basename(absolute_filename))
+    shutil.copy(absolute_filename, copy)
+    return reader_cls(copy)
+
+
+class TestSpectraCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = SpectraCache(os.path.join(self.dir, "cache"), min_size=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_reuse(self):
+        reader = reader_copy(AsciiColReader, "peach_juice.dpt", self.dir)
+        xs, X, metas = self.cache.read_spectra(reader)
+        with patch.object(AsciiColReader, "read_spectra") as read_spectra:
+            xs2, X2, metas2 = self.cache.read_spectra(AsciiColReader(reader.filename))
+            read_spectra.assert_not_called()
+        np.testing.assert_equal(xs, xs2)
+        np.testing.assert_equal(X, X2)
+        self.assertIsInstance(X2, np.memmap)
+        self.assertIsNone(metas2)
+        X2[0, 0] = 42  # copy-on-write does not change the cache
+        _, X3, _ = self.cache.read_spectra(reader)
+        np.testing.assert_equal(X, X3)
+
+    def test_metas_compress(self):
+        self.cache.compress = True
+        reader = reader_copy(NeaReader, "spectra20_small.nea", self.dir)
+        xs, X, metas = self.cache.read_spectra(reader)
+        with patch.object(NeaReader, "read_spectra") as read_spectra:
+            xs2, X2, metas2 = self.cache.read_spectra(reader)
+            read_spectra.assert_not_called()
+        np.testing.assert_equal(X, X2)
+        self.assertEqual(metas.domain, metas2.domain)
+        np.testing.assert_equal(metas.metas, metas2.metas)
+
+    def test_modified(self):
+        reader = reader_copy(AsciiColReader, "peach_juice.dpt", self.dir)
+        self.cache.read_spectra(reader)
+        with open(reader.filename, "ab") as f:
+            f.write(b"1 2\n")
+        xs, _, _ = self.cache.read_spectra(reader)
+        self.assertEqual(xs[-1], 1)
+        self.assertEqual(len(self.cache.entries()), 2)
+
+    def test_not_cached(self):
+        reader = reader_copy(AsciiColReader, "peach_juice.dpt", self.dir)
+        self.cache.min_size = os.path.getsize(reader.filename) + 1
+        self.cache.read_spectra(reader)
+        self.cache.min_size = 0
+        self.cache.enabled = False
+        self.cache.read_spectra(reader)
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_evict(self):
+        r1 = reader_copy(AsciiColReader, "peach_juice.dpt", self.dir)
+        r2 = reader_copy(AsciiColReader, "IFG_single.dpt", self.dir)
+        self.cache.read_spectra(r1)
+        self.cache.read_spectra(r2)
+        p1, p2 = [os.path.join(self.cache.directory, self.cache.key(r)) for r in [r1, r2]]
+        os.utime(p1, (0, 0))  # used long ago
+        sizes = {path: size for _, size, path in self.cache.entries()}
+        self.cache.max_size = sizes[p2]
+        self.cache.evict()
+        self.assertEqual([path for _, _, path in self.cache.entries()], [p2])
+        self.cache.clear()
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_corrupted(self):
+        reader = reader_copy(AsciiColReader, "peach_juice.dpt", self.dir)
+        xs, _, _ = self.cache.read_spectra(reader)
+        os.remove(os.path.join(self.cache.directory, self.cache.key(reader), "X.npy"))
+        xs2, _, _ = self.cache.read_spectra(reader)
+        np.testing.assert_equal(xs, xs2)
+
+    def test_dtype(self):
+        reader = reader_copy(AsciiColReader, "peach_juice.dpt", self.dir)
+        _, X, _ = self.cache.read_spectra(reader)
+        self.assertEqual(X.dtype, np.float64)
+        _, X32, _ = self.cache.read_spectra(reader, dtype=np.float32)
+        self.assertEqual(X32.dtype, np.float32)
+        np.testing.assert_allclose(X, X32, rtol=1e-6)
+        # cached separately
+        self.assertEqual(len(self.cache.entries()), 2)
+        # outputs of readers are converted
+        self.cache.enabled = False
+        with patch.object(AsciiColReader, "read_spectra",
+                          return_value=(np.arange(2.), np.ones((1, 2)), None)):
+            _, X, _ = self.cache.read_spectra(reader, dtype=np.float32)
+        self.assertEqual(X.dtype, np.float32)
+        # readers that support dtype read into it
+        with patch.object(AsciiColReader, "read_spectra", autospec=True,
+                          return_value=(np.arange(2.), np.ones((1, 2), dtype="f"), None)) \
+                as read_spectra:
+            _, X, _ = self.cache.read_spectra(reader, dtype=np.float32)
+        read_spectra.assert_called_once_with(reader, dtype=np.float32)
+        with self.assertRaises(ValueError):
+            self.cache.read_spectra(reader, dtype=np.int32)
+
+    def test_not_cacheable(self):
+        reader = reader_copy(SPAReader, "sample1.spa", self.dir)
+        self.assertIsNone(self.cache.key(reader))
+        self.cache.read_spectra(reader)
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_source_files(self):
+        dmt = FileFormat.locate("agilent/5_mosaic_agg1024.dmt", dataset_dirs)
+        for fn in glob.glob(os.path.join(os.path.dirname(dmt), "5_?osaic_agg1024*")):
+            shutil.copy(fn, self.dir)
+        reader = agilentMosaicReader(os.path.join(self.dir, os.path.basename(dmt)))
+        self.assertEqual(len(reader.source_files()), 3)
+        key = self.cache.key(reader)
+        self.assertIsNotNone(key)
+        tile = reader.source_files()[-1]
+        os.utime(tile, ns=(0, 0))
+        self.assertNotEqual(self.cache.key(reader), key)
+
+    def test_package_version(self):
+        reader = reader_copy(AsciiColReader, "peach_juice.dpt", self.dir)
+        key = self.cache.key(reader)
+        with patch("orangecontrib.spectroscopy.utils.cache._package_version",
+                   return_value="1000.0"):
+            self.assertNotEqual(self.cache.key(reader), key)
+
+    def test_attributes_not_stored(self):
+        reader = reader_copy(NeaReader, "spectra20_small.nea", self.dir)
+        xs, X, metas = reader.read_spectra()
+        metas.attributes = {"object": object()}
+        with patch.object(NeaReader, "read_spectra", return_value=(xs, X, metas)):
+            self.cache.read_spectra(reader)
+        self.assertEqual(self.cache.entries(), [])
+        metas.attributes = {"numbers": [1, 2]}
+        with patch.object(NeaReader, "read_spectra", return_value=(xs, X, metas)):
+            self.cache.read_spectra(reader)
+        _, _, metas2 = self.cache.read_spectra(reader)
+        self.assertEqual(metas2.attributes, {"numbers": [1, 2]})
+
+    def test_abandoned(self):
+        os.makedirs(self.cache.directory)
+        old = tempfile.mkdtemp(dir=self.cache.directory, prefix=".tmp")
+        recent = tempfile.mkdtemp(dir=self.cache.directory, prefix=".tmp")
+        long_ago = time.time() - 2 * self.cache.TMP_MAX_AGE
+        os.utime(old, (long_ago, long_ago))
+        self.cache.evict()
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(recent))
+
+    def test_table(self):
+        reader = reader_copy(AsciiColReader, "peach_juice.dpt", self.dir)
+        with patch("orangecontrib.spectroscopy.data.spectra_cache", self.cache):
+            d1 = reader.read()
+            d2 = Orange.data.Table(reader.filename)
+        np.testing.assert_equal(d1.X, d2.X)
+        self.assertEqual(len(self.cache.entries()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -27,6 +27,15 @@ class TestMeEMSCEditor(PreprocessorEditorTest):
         p = self.get_preprocessor()
         self.assertIsInstance(p, ME_EMSC)
 
+    def test_workers(self):
+        self.send_signal(self.widget.Inputs.reference, SMALL_COLLAGEN[:1])
+        self.editor.setParameters({"workers": 2})
+        self.editor.edited.emit()
+        self.widget.unconditional_commit()
+        self.wait_until_finished()
+        p = self.get_preprocessor()
+        self.assertEqual(p.workers, 2)
+
     def test_migrate_smoothing(self):
         name = "orangecontrib.spectroscopy.preprocess.me_emsc.me_emsc"
         settings = {"storedsettings": {"preprocessors": [(name, {"ranges": [[0, 1, 2]]})]}}
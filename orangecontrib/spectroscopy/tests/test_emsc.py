@@ -5,7 +5,7 @@ import Orange
 from Orange.data import Table
 
 from orangecontrib.spectroscopy.preprocess.emsc import EMSC, MissingReferenceException, \
-    SelectionFunction, SmoothedSelectionFunction
+    SelectionFunction, SmoothedSelectionFunction, emsc_correct
 from orangecontrib.spectroscopy.preprocess.npfunc import Sum
 from orangecontrib.spectroscopy.tests.util import spectra_table
 
@@ -138,6 +138,19 @@ class TestEMSC(unittest.TestCase):
             fdata.metas,
             [[1.375, 1.375, 3.0, 6.0, 2.0]])
 
+    def test_emsc_correct(self):
+        rng = np.random.RandomState(0)
+        X = rng.rand(25, 30)
+        M = np.hstack((np.ones((30, 1)), rng.rand(30, 2)))
+        M_weighted = M * rng.rand(30, 1)
+        corrected = emsc_correct(X, M, M_weighted, 2, chunk=7)
+        for i, spectrum in enumerate(X):
+            m = np.linalg.lstsq(M_weighted, spectrum, rcond=-1)[0]
+            expected = (spectrum - m[0] * M[:, 0] - m[1] * M[:, 1]) / m[2]
+            np.testing.assert_almost_equal(corrected[i], np.hstack((expected, m)))
+        unscaled = emsc_correct(X, M, M_weighted, 2, scaling=False)
+        np.testing.assert_almost_equal(unscaled[:, :30] / corrected[:, -1:], corrected[:, :30])
+
 
 class TestSelectionFuctions(unittest.TestCase):
 
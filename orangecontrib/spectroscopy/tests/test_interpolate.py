@@ -5,6 +5,7 @@ import Orange
 from orangecontrib.spectroscopy.preprocess import Interpolate, \
     interp1d_with_unknowns_numpy, interp1d_with_unknowns_scipy, \
     interp1d_wo_unknowns_scipy, InterpolateToDomain, NotAllContinuousException
+from orangecontrib.spectroscopy.preprocess.utils import fill_edges, fill_edges_1d
 from orangecontrib.spectroscopy.data import getx
 
 
@@ -111,6 +112,42 @@ class TestInterpolate(unittest.TestCase):
         # parts without unknown should be the same
         np.testing.assert_almost_equal(data.X[2:], save_X[2:])
 
+    def test_unknown_patterns(self):
+        # rows are interpolated in groups with the same unknowns
+        rng = np.random.RandomState(0)
+        x = rng.permutation(np.arange(20.))
+        ys = rng.rand(30, 20)
+        ys[:10, :3] = np.nan
+        ys[10:20, [x.argmax(), 5]] = np.nan
+        ys[20, :] = np.nan
+        ys[21, 1:] = np.nan
+        ys[22, 7] = np.nan
+        points = np.hstack((np.linspace(-1, 20, 50), x[:5]))
+        sorti = np.argsort(x)
+        for dtype in [np.float64, np.float32]:
+            y = ys.astype(dtype)
+            interpolated = interp1d_with_unknowns_numpy(x, y, points)
+            self.assertEqual(interpolated.dtype, dtype)
+            for yrow, irow in zip(y, interpolated):
+                known = ~np.isnan(yrow[sorti])
+                expected = np.interp(points, x[sorti][known], yrow[sorti][known],
+                                     left=np.nan, right=np.nan) \
+                    if known.any() else np.nan
+                np.testing.assert_equal(irow, np.asarray(expected, dtype=dtype))
+        y = np.delete(ys, 21, axis=0)  # scipy needs two known values
+        interpolated = interp1d_with_unknowns_scipy(x, y, points, kind="nearest")
+        for yrow, irow in zip(y, interpolated):
+            known = ~np.isnan(yrow)
+            expected = interp1d_wo_unknowns_scipy(x[known], yrow[known], points, kind="nearest") \
+                if known.any() else np.nan
+            np.testing.assert_equal(irow, expected)
+        filled = ys.copy()
+        fill_edges(filled)
+        expected = ys.copy()
+        for row in expected:
+            fill_edges_1d(row)
+        np.testing.assert_equal(filled, expected)
+
 
 class TestInterpolateToDomain(unittest.TestCase):
 
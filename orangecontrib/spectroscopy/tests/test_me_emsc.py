@@ -1,11 +1,14 @@
 import unittest
+from unittest.mock import patch
 
 import numpy as np
 
 import Orange
 from Orange.data import FileFormat, dataset_dirs
 
-from orangecontrib.spectroscopy.preprocess.me_emsc import ME_EMSC
+from orangecontrib.spectroscopy.preprocess import me_emsc
+from orangecontrib.spectroscopy.preprocess.me_emsc import ME_EMSC, calculate_complex_n, \
+    calculate_Qext_curves
 from orangecontrib.spectroscopy.preprocess.emsc import SelectionFunction, SmoothedSelectionFunction
 from orangecontrib.spectroscopy.preprocess.npfunc import Sum
 
@@ -208,6 +211,68 @@ class TestME_EMSC(unittest.TestCase):
         # it was crashing before
         ME_EMSC(reference=reference)(self.spectra)
 
+    def test_batch(self):
+        # spectra in a batch converge independently
+        spectra = self.spectra.copy()
+        spectra.X = np.vstack((self.Spectra[0], self.Spectra[0] * 1.3 + 0.1))
+        f = ME_EMSC(reference=self.reference, ncomp=False, max_iter=45, output_model=True)
+        batch = f(spectra)
+        for i in range(len(spectra)):
+            single = f(spectra[i:i+1])
+            np.testing.assert_almost_equal(batch.X[i], single.X[0])
+            np.testing.assert_almost_equal(batch.metas[i], single.metas[0])
+        f.workers = 2
+        parallel = f(spectra)
+        np.testing.assert_almost_equal(parallel.X, batch.X)
+        np.testing.assert_equal(parallel.metas[:, -2:], batch.metas[:, -2:])
+
+    def test_model_cache(self):
+        me_emsc._cached_reference_ncomp.cache_clear()
+        me_emsc._cached_model_setup.cache_clear()
+        with patch.object(me_emsc, "cal_ncomp", wraps=me_emsc.cal_ncomp) as cal_ncomp, \
+                patch.object(me_emsc, "compress_Mie_curves",
+                             wraps=me_emsc.compress_Mie_curves) as compress:
+            f1 = ME_EMSC(reference=self.reference, fixed_iter=1)
+            f2 = ME_EMSC(reference=self.reference, fixed_iter=1)
+            self.assertEqual(cal_ncomp.call_count, 1)
+            d1 = f1(self.spectra)
+            d2 = f2(self.spectra)
+            self.assertEqual(compress.call_count, 1)
+            np.testing.assert_equal(d1.X, d2.X)
+            # a different reference, weights or parameters are computed again
+            reference = self.reference.copy()
+            reference.X = reference.X * 2
+            ME_EMSC(reference=reference, fixed_iter=1)
+            self.assertEqual(cal_ncomp.call_count, 2)
+            ME_EMSC(reference=self.reference, ncomp=f1.ncomp, fixed_iter=1,
+                    weights=SelectionFunction(1000, 2000, 1))(self.spectra)
+            ME_EMSC(reference=self.reference, ncomp=f1.ncomp, fixed_iter=1,
+                    h=0.3)(self.spectra)
+            self.assertEqual(compress.call_count, 3)
+
+    def test_qext_curves(self):
+        def mie_hulst_extinction(rho, tanbeta):
+            beta = np.arctan(tanbeta)
+            cosbeta = np.cos(beta)
+            return (2 - 4 * np.e ** (-rho * tanbeta) * (cosbeta / rho) * np.sin(rho - beta) -
+                    4 * np.e ** (-rho * tanbeta) * (cosbeta / rho) ** 2 * np.cos(rho - 2 * beta) +
+                    4 * (cosbeta / rho) ** 2 * np.cos(2 * beta))
+
+        wavenumbers = self.wnM
+        nprs, nkks = calculate_complex_n(self.Matrigel[0], wavenumbers)
+        n0, a = np.linspace(1.1, 1.4, 3), np.linspace(2, 7.1, 4)
+        alpha0 = (4 * np.pi * a * (n0[:, None] - 1)).ravel() * 1e-6
+        gamma = np.linspace(1e4, 1e5, 5)
+        expected = np.array([mie_hulst_extinction(al * (1 + g * nkks) * (wavenumbers * 100),
+                                                  nprs / (1 / g + nkks))
+                             for al in alpha0 for g in gamma])
+        Qext = calculate_Qext_curves(nprs, nkks, alpha0, gamma, wavenumbers)
+        self.assertEqual(Qext.shape, (len(alpha0) * len(gamma), len(wavenumbers)))
+        np.testing.assert_allclose(Qext, expected, rtol=1e-12, atol=1e-12)
+        Qext32 = calculate_Qext_curves(nprs, nkks, alpha0, gamma, wavenumbers, dtype=np.float32)
+        self.assertEqual(Qext32.dtype, np.float32)
+        np.testing.assert_allclose(Qext32, expected, atol=1e-4)
+
 
 class TestInflectionPointWeighting(unittest.TestCase):
 
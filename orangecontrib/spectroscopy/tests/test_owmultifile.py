@@ -1,6 +1,7 @@
 import os
 import shutil
 import tempfile
+import threading
 import unittest
 from unittest.mock import patch, Mock
 
@@ -9,27 +10,50 @@ import numpy as np
 from AnyQt.QtCore import Qt
 
 from Orange.widgets.tests.base import WidgetTest
-from Orange.data import FileFormat, dataset_dirs, Table
+from Orange.data import FileFormat, dataset_dirs, Table, Domain
 from Orange.widgets.utils.domaineditor import DomainEditor
 from Orange.widgets.utils.filedialogs import format_filter
 from Orange.data.io import TabReader
 
 from orangecontrib.spectroscopy.data import SPAReader
-from orangecontrib.spectroscopy.widgets.owmultifile import OWMultifile, numpy_union_keep_order
+from orangecontrib.spectroscopy.widgets.owmultifile import OWMultifile, concatenate_data, \
+    domain_union_for_spectra, read_files, InterruptException
 
 
 class TestOWFilesAuxiliary(unittest.TestCase):
 
-    def test_numpy_union(self):
-        A = np.array([2, 1, 3])
-        B = np.array([1, 3])
-        np.testing.assert_equal(numpy_union_keep_order(A, B), [2, 1, 3])
-        B = np.array([])
-        np.testing.assert_equal(numpy_union_keep_order(A, B), [2, 1, 3])
-        B = np.array([5, 4, 6, 3])
-        np.testing.assert_equal(numpy_union_keep_order(A, B), [2, 1, 3, 5, 4, 6])
-        A = np.array([])
-        np.testing.assert_equal(numpy_union_keep_order(A, B), [5, 4, 6, 3])
+    def test_wavenumber_union(self):
+        empty = Table.from_domain(Domain([]), n_rows=0)
+        spectra = [(np.array([2., 1., 3.]), None, empty),
+                   (np.array([1., 3.]), None, empty),
+                   (np.array([5., 4., 6., 3.]), None, empty)]
+        _, xs = domain_union_for_spectra(spectra)
+        np.testing.assert_equal(xs, [2, 1, 3, 5, 4, 6])
+        # extends a union of preceding tables
+        _, xs = domain_union_for_spectra(spectra[2:], (Domain([]), np.array([4., 7.])))
+        np.testing.assert_equal(xs, [4, 7, 5, 6, 3])
+
+    def test_concatenate_mixed(self):
+        iris = Table("iris")[:3]
+        empty = Table.from_domain(Domain([]), n_rows=2)
+        spectra = [(np.array([3., 1.]), np.array([[1., 2.], [3., 4.]]), empty),
+                   (np.array([2., 3.]), np.array([[5., 6.]]), empty[:1])]
+        data = concatenate_data([spectra[0], iris, spectra[1]], ["a", "b", "c"], "l")
+        self.assertEqual([a.name for a in data.domain.attributes[:3]],
+                         ["3.000000", "1.000000", "2.000000"])
+        np.testing.assert_equal(data.X[:, :3], [[1, 2, np.nan],
+                                                [3, 4, np.nan],
+                                                [np.nan] * 3,
+                                                [np.nan] * 3,
+                                                [np.nan] * 3,
+                                                [6, np.nan, 5]])
+        np.testing.assert_equal(data.X[2:5, 3:], iris.X)
+        np.testing.assert_equal(data.X[[0, 1, 5], 3:], np.nan)
+        np.testing.assert_equal(data.Y[2:5], iris.Y)
+        np.testing.assert_equal(data.Y[[0, 1, 5]], np.nan)
+        self.assertEqual(list(data.get_column_view("Filename")[0]),
+                         ["a", "a", "b", "b", "b", "c"])
+        self.assertEqual(set(data.get_column_view("Label")[0]), {"l"})
 
 
 class TestOWMultifile(WidgetTest):
@@ -55,6 +79,11 @@ class TestOWMultifile(WidgetTest):
         # pretend that files were chosen in the open dialog
         with patch("AnyQt.QtWidgets.QFileDialog.getOpenFileNames", patchfn):
             self.widget.browse_files()
+        self.wait_until_finished()
+
+    def get_output(self, output, widget=None):
+        self.wait_until_finished(widget=widget)
+        return super().get_output(output, widget=widget)
 
     def test_load_files(self):
         self.load_files("iris", "titanic")
@@ -201,6 +230,82 @@ class TestOWMultifile(WidgetTest):
             # clear cache so the new classes are thrown out
             FileFormat._ext_to_attr_if_attr2.cache_clear()
 
+    def test_read_only_new_files(self):
+
+        class CountTabReader(TabReader):
+            read_count = 0
+
+            def read(self):
+                type(self).read_count += 1
+                return super().read()
+
+        tempdir = tempfile.mkdtemp()
+        try:
+            fns = []
+            for name in ["iris.tab", "titanic.tab", "housing.tab"]:
+                fns.append(os.path.join(tempdir, name))
+                shutil.copy(FileFormat.locate(name, dataset_dirs), fns[-1])
+            lengths = [len(Table(fn)) for fn in fns]
+            with patch.object(FileFormat, "registry", {"TabReader": CountTabReader}):
+                FileFormat._ext_to_attr_if_attr2.cache_clear()
+                self.load_files(*fns[:2])
+                self.assertEqual(CountTabReader.read_count, 2)
+                self.load_files(fns[2])
+                self.assertEqual(CountTabReader.read_count, 3)
+                self.assertEqual(len(self.get_output(self.widget.Outputs.data)),
+                                 sum(lengths))
+                self.widget.label = "new"
+                self.widget.set_label()
+                self.assertEqual(CountTabReader.read_count, 3)
+                os.utime(fns[1], ns=(0, 0))  # changed files are read again
+                self.widget.lb.item(0).setSelected(True)
+                self.widget.remove_item()
+                self.wait_until_finished()
+                self.assertEqual(CountTabReader.read_count, 4)
+                out = self.get_output(self.widget.Outputs.data)
+                self.assertEqual(len(out), lengths[1] + lengths[2])
+                self.assertEqual(set(out.get_column_view("Label")[0]), {"new"})
+                self.widget.load_data()  # reload reads everything
+                self.wait_until_finished()
+                self.assertEqual(CountTabReader.read_count, 6)
+                FileFormat._ext_to_attr_if_attr2.cache_clear()
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_watch(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            iris = os.path.join(tempdir, "iris.tab")
+            shutil.copy(FileFormat.locate("iris.tab", dataset_dirs), iris)
+            shutil.copy(FileFormat.locate("housing.tab", dataset_dirs), tempdir)
+            self.load_files(iris)
+            self.widget.controls.watch.click()
+            self.assertEqual(self.widget._watcher.directories(), [tempdir])
+            shutil.copy(FileFormat.locate("titanic.tab", dataset_dirs), tempdir)
+            with open(os.path.join(tempdir, "notes.txt"), "w") as f:
+                f.write("not data")
+            self.widget._add_new_files()
+            # only new files with extensions of listed files are added
+            self.assertEqual([rp.abspath for rp in self.widget.recent_paths],
+                             [iris, os.path.join(tempdir, "titanic.tab")])
+            out = self.get_output(self.widget.Outputs.data)
+            self.assertEqual(len(out), len(Table("iris")) + len(Table("titanic")))
+            self.widget.controls.watch.click()
+            self.assertEqual(self.widget._watcher.directories(), [])
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_watch_reader_error(self):
+        self.load_files("iris")
+        self.widget._dir_contents = {}
+        with patch("orangecontrib.spectroscopy.widgets.owmultifile._get_reader",
+                   side_effect=Exception()):
+            self.widget._add_new_files()
+            self.assertTrue(self.widget.Error.missing_reader.is_shown())
+            self.assertIsNone(self.get_output(self.widget.Outputs.data))
+            self.assertEqual("Reader not found.", self.widget.lb.item(0).toolTip())
+            self.assertEqual(Qt.red, self.widget.lb.item(0).foreground())
+
     def test_report_on_empty(self):
         self.widget.send_report()
 
@@ -243,11 +348,52 @@ class TestOWMultifile(WidgetTest):
         with patch("Orange.data.io.TabReader.read",
                    side_effect=Exception("test")):
             self.widget.load_data()
+            self.wait_until_finished()
             self.assertTrue(self.widget.Error.read_error.is_shown())
             self.assertIsNone(self.get_output(self.widget.Outputs.data))
             self.assertEqual("Read error:\ntest", self.widget.lb.item(0).toolTip())
             self.assertEqual(Qt.red, self.widget.lb.item(0).foreground())
 
+    def test_cancel(self):
+        self.load_files("iris", "titanic")
+        self.assertIsNotNone(self.get_output(self.widget.Outputs.data))
+        event = threading.Event()
+
+        def blocked_read(reader, _):
+            event.wait(10)
+            return reader.read()
+
+        with patch("orangecontrib.spectroscopy.widgets.owmultifile._read_file",
+                   blocked_read):
+            self.widget.load_data()
+            self.assertEqual("Loading...", self.widget.lb.item(1).toolTip())
+            self.widget.cancel_loading()
+            event.set()
+        self.assertTrue(self.widget.Warning.cancelled.is_shown())
+        self.assertIsNone(self.get_output(self.widget.Outputs.data))
+        self.assertEqual("", self.widget.lb.item(1).toolTip())
+        self.widget.load_data()
+        self.assertFalse(self.widget.Warning.cancelled.is_shown())
+        self.assertIsNotNone(self.get_output(self.widget.Outputs.data))
+
+    def test_read_files_cancel_submits_no_more(self):
+        readers = [Mock() for _ in range(10)]
+        state = Mock()
+        state.is_interruption_requested.return_value = False
+        read = []
+
+        def read_file(reader, _):
+            read.append(reader)
+            # cancelled while the first file is read
+            state.is_interruption_requested.return_value = True
+            return reader
+
+        with patch("orangecontrib.spectroscopy.widgets.owmultifile._read_file",
+                   read_file):
+            with self.assertRaises(InterruptException):
+                read_files(readers, None, 2, state)
+        self.assertLessEqual(len(read), 2)
+
     def test_sheet_setting(self):
         self.load_files("rock.txt")
         self.widget.sheet_combo.setCurrentIndex(2)
@@ -15,6 +15,7 @@ from orangecontrib.spectroscopy.preprocess import Absorbance, Transmittance, \
     WrongReferenceException, NormalizeReference, XASnormalization, ExtractEXAFS, PreprocessException, \
     NormalizePhaseReference, Despike
 from orangecontrib.spectroscopy.preprocess.me_emsc import ME_EMSC
+from orangecontrib.spectroscopy.preprocess.utils import CommonDomainOrderUnknowns
 from orangecontrib.spectroscopy.tests.util import smaller_data
 
 
@@ -457,6 +458,40 @@ class TestCommon(unittest.TestCase):
             self.assertFalse(anyinfs, msg="Preprocessor " + str(proc))
 
 
+class _DtypeCommon(CommonDomainOrderUnknowns):
+
+    def transformed(self, X, wavenumbers):
+        self.seen_dtype = X.dtype
+        return X
+
+
+class TestSpectraDtype(unittest.TestCase):
+
+    def test_float32(self):
+        data = SMALL_COLLAGEN.copy()
+        data.X[0, 0] = np.nan
+        common = _DtypeCommon(data.domain)
+        common(data)
+        self.assertEqual(common.seen_dtype, np.float64)
+        common = _DtypeCommon(data.domain, dtype=np.float32)
+        common(data)
+        self.assertEqual(common.seen_dtype, np.float32)
+        procs = [SavitzkyGolayFiltering, GaussianSmoothing, LinearBaseline,
+                 RubberbandBaseline, Despike]
+        for proc in procs:
+            expected = proc()(data).X
+            np.testing.assert_allclose(proc(dtype=np.float32)(data).X, expected,
+                                       rtol=1e-4, atol=1e-5,
+                                       err_msg="Preprocessor " + str(proc))
+
+    def test_invalid(self):
+        data = SMALL_COLLAGEN
+        with self.assertRaises(ValueError):
+            _DtypeCommon(data.domain, dtype=np.int32)
+        with self.assertRaises(ValueError):
+            GaussianSmoothing(dtype=np.int32)(data)
+
+
 class TestPCADenoising(unittest.TestCase):
 
     def test_no_samples(self):
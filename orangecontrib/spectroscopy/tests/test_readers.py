@@ -1,3 +1,6 @@
+import os
+import struct
+import tempfile
 import unittest
 from unittest.mock import patch
 from io import BytesIO
@@ -5,14 +8,20 @@ from PIL import Image
 
 import numpy as np
 import Orange
+import orangecontrib.spectroscopy.data
 from Orange.data import dataset_dirs
 from Orange.data.io import FileFormat
 from Orange.tests import named_file
 from Orange.widgets.data.owfile import OWFile
-from orangecontrib.spectroscopy.data import getx, build_spec_table, SelectColumnReader, NeaReader
+from orangecontrib.spectroscopy.data import getx, build_spec_table, SelectColumnReader, NeaReader, \
+    spectral_domain, spectral_axis
 from orangecontrib.spectroscopy.preprocess import features_with_interpolation
-from orangecontrib.spectroscopy.data import SPAReader, agilentMosaicIFGReader
-from orangecontrib.spectroscopy.data import NeaReaderGSF
+from orangecontrib.spectroscopy.data import SPAReader, agilentMosaicIFGReader, agilentMosaicReader, \
+    AgilentImageReader, OmnicMapReader
+from orangecontrib.spectroscopy.data import NeaReaderGSF, EnviMapReader, \
+    HDF5Reader_HERMES, HDF5Reader_ROCK, SpectralHDF5Reader, AsciiColReader, _read_ascii_columns, _interp_rows
+from orangecontrib.spectroscopy.agilent import agilentImage, agilentMosaic
+from orangecontrib.spectroscopy.pymca5 import OmnicMap
 
 try:
     import opusFC
@@ -71,6 +80,44 @@ class TestDat(unittest.TestCase):
             d2 = Orange.data.Table(fn)
             np.testing.assert_equal(d1.X, d2.X)
 
+    def test_read_subset(self):
+        with named_file("", suffix=".dat") as fn:
+            Orange.data.Table("collagen.csv")[:5].save(fn)
+            d1 = Orange.data.Table(fn)
+            xs, X, _ = AsciiColReader(fn).read_spectra(spectra=[1, 3], dtype=np.float32)
+            np.testing.assert_equal(xs, getx(d1))
+            self.assertEqual(X.dtype, np.float32)
+            np.testing.assert_equal(X, d1.X[[1, 3]].astype(np.float32))
+
+    def test_read_columns_chunks(self):
+        text = b"# comment\n1 2 a\n  # indented comment\n3 4.5 bc\n\n5 -inf d\n"
+        for chunk_size in [1, 10, None]:
+            a, b, c = _read_ascii_columns(BytesIO(text), dtype=[int, float, "S2"],
+                                          chunk_size=chunk_size)
+            np.testing.assert_equal(a, [1, 3, 5])
+            np.testing.assert_equal(b, [2, 4.5, -np.inf])
+            np.testing.assert_equal(c, [b"a", b"bc", b"d"])
+            b, = _read_ascii_columns(BytesIO(text), usecols=[1], dtype=np.float32,
+                                     chunk_size=chunk_size)
+            self.assertEqual(b.dtype, np.float32)
+            np.testing.assert_equal(b, [2, 4.5, -np.inf])
+        self.assertEqual(_read_ascii_columns(BytesIO(b"# only comments\n")), [])
+        with self.assertRaises(ValueError):
+            _read_ascii_columns(BytesIO(b"1 2\n3\n"))
+
+    def test_read_columns_ragged(self):
+        # the total number of values is a multiple of the number of columns
+        for chunk_size in [1, None]:
+            with self.assertRaises(ValueError):
+                _read_ascii_columns(BytesIO(b"1 2\n3\n4 5 6\n"), chunk_size=chunk_size)
+
+    def test_read_columns_inline_comment(self):
+        text = b"1 2 # first\n3 4#second 5\n"
+        for chunk_size in [1, None]:
+            a, b = _read_ascii_columns(BytesIO(text), chunk_size=chunk_size)
+            np.testing.assert_equal(a, [1, 3])
+            np.testing.assert_equal(b, [2, 4])
+
 
 try:
     no_visible_image = FileFormat.locate("opus/no_visible_images.0",
@@ -131,6 +178,102 @@ class TestHermesHDF5Reader(unittest.TestCase):
         self.assertEqual(d[1]["map_x"], 2.1)
         self.assertEqual(d[1]["map_y"], 11.1)
 
+    def test_read_subset(self):
+        reader = initialize_reader(HDF5Reader_HERMES, "Hermes_HDF5/small_OK.hdf5")
+        xs, X, meta = reader.read_spectra()
+        xs_s, X_s, meta_s = reader.read_spectra(limits=(100, 101), window=(slice(1, 2), slice(None)))
+        np.testing.assert_equal(xs_s, xs[:1])
+        np.testing.assert_equal(X_s, X[2:, :1])
+        np.testing.assert_equal(meta_s.metas, meta.metas[2:])
+
+
+class TestRockHDF5Reader(unittest.TestCase):
+
+    def setUp(self):
+        import h5py
+        self.cube = np.arange(5 * 3 * 4, dtype=np.float32).reshape((5, 3, 4))
+        self.energies = np.arange(7000., 7050., 10)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "rock.h5")
+        with h5py.File(self.filename, "w") as f:
+            f.create_dataset("data/cube_00001", data=self.cube, chunks=(2, 3, 4))
+            f.create_dataset("context/energies", data=self.energies)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_read(self):
+        d = HDF5Reader_ROCK(self.filename).read()
+        np.testing.assert_equal(getx(d), self.energies)
+        np.testing.assert_equal(d.X, np.transpose(self.cube, (1, 2, 0)).reshape(12, 5))
+        np.testing.assert_equal(d.metas[:5], [[0, 0], [1, 0], [2, 0], [3, 0], [0, 1]])
+
+    def test_read_subset(self):
+        reader = HDF5Reader_ROCK(self.filename)
+        with patch("orangecontrib.spectroscopy.data._HDF5_BLOCK_SIZE", 1):
+            xs, X, meta = reader.read_spectra(limits=(7005, 7035),
+                                              window=(slice(1, 3), slice(2, 4)))
+        np.testing.assert_equal(xs, self.energies[1:4])
+        image = np.transpose(self.cube, (1, 2, 0))
+        np.testing.assert_equal(X, image[1:3, 2:4, 1:4].reshape(4, 3))
+        np.testing.assert_equal(meta.metas, [[2, 1], [3, 1], [2, 2], [3, 2]])
+
+
+class TestSpectralHDF5(unittest.TestCase):
+
+    def test_roundtrip(self):
+        d1 = Orange.data.Table("collagen.csv")
+        # values that are not JSON serializable are not stored
+        d1.attributes = {"visible": [1, 2], "domain": d1.domain, 3: "int key"}
+        with named_file("", suffix=".sh5") as fn:
+            d1.save(fn)
+            d2 = Orange.data.Table(fn)
+        self.assertEqual(d1.domain, d2.domain)
+        np.testing.assert_equal(d1.X, d2.X)
+        np.testing.assert_equal(d1.Y, d2.Y)
+        self.assertEqual(d2.attributes, {"visible": [1, 2]})
+
+    def test_metas(self):
+        d1 = Orange.data.Table("iris")[::10]
+        domain = Orange.data.Domain(d1.domain.attributes, None,
+                                    metas=[Orange.data.StringVariable("name"),
+                                           Orange.data.ContinuousVariable("map_x"),
+                                           d1.domain.class_var])
+        metas = np.array([["a%d" % i, i, v] for i, v in enumerate(d1.Y)], dtype=object)
+        d1 = Orange.data.Table.from_numpy(domain, X=d1.X, metas=metas)
+        with named_file("", suffix=".sh5") as fn:
+            d1.save(fn)
+            d2 = Orange.data.Table(fn)
+        self.assertEqual(d1.domain, d2.domain)
+        np.testing.assert_equal(d1.X, d2.X)
+        np.testing.assert_equal(d1.metas, d2.metas)
+
+    def test_read_subset(self):
+        d1 = Orange.data.Table("collagen.csv")
+        with named_file("", suffix=".sh5") as fn:
+            d1.save(fn)
+            xs, X, meta = SpectralHDF5Reader(fn).read_spectra(limits=(1000, 1100),
+                                                              rows=slice(3, 8))
+        ind = np.flatnonzero((getx(d1) >= 1000) & (getx(d1) <= 1100))
+        np.testing.assert_equal(xs, getx(d1)[ind])
+        np.testing.assert_equal(X, d1.X[3:8, ind])
+        np.testing.assert_equal(meta.Y, d1.Y[3:8])
+
+
+def write_omnic_map(filename, spectra, positions):
+    """
+    Write a minimal Omnic map without the information block: records of a
+    100 byte header, which starts 16 bytes before its "Spectrum" title,
+    followed by float32 values.
+    """
+    with open(filename, "wb") as f:
+        f.write(b"\0" * 400)
+        for i, (spectrum, (x, y)) in enumerate(zip(spectra, positions)):
+            title = "Spectrum {} of {}, X = {:.1f}, Y = {:.1f}".format(
+                i + 1, len(spectra), x, y).encode()
+            f.write(b"\0" * 16 + title.ljust(84, b"\0"))
+            f.write(np.asarray(spectrum, dtype=np.float32).tobytes())
+
 
 class TestOmnicMapReader(unittest.TestCase):
 
@@ -143,6 +286,49 @@ class TestOmnicMapReader(unittest.TestCase):
         self.assertEqual(d[0]["map_x"], 0)
         self.assertEqual(d[1]["map_y"], 0)
 
+    def test_synthetic(self):
+        # 2 rows of 3 spectra with 4 channels
+        values = np.arange(24, dtype=np.float32).reshape(6, 4)
+        values[1, 2] = np.nan
+        values[4, 0] = np.inf
+        values[5, 3] = -np.inf
+        positions = [(x, y) for y in range(2) for x in range(3)]
+        expected = values.copy()
+        expected[~np.isfinite(expected)] = 0  # non-finite values are zeroed
+        with named_file("", suffix=".map") as fn:
+            write_omnic_map(fn, values, positions)
+            om = OmnicMap.OmnicMap(fn)
+            self.assertIsNone(om.info["OmnicInfo"])
+            self.assertEqual(om.data.shape, (2, 3, 4))
+            np.testing.assert_equal(om.data, expected.reshape(2, 3, 4))
+            # channels are copied in the order of the returned index
+            calls = []
+
+            def channels(info, n):
+                calls.append((info, n))
+                return np.array([3, 0])
+
+            om = OmnicMap.OmnicMap(fn, channels=channels)
+            self.assertEqual(calls, [(None, 4)])
+            np.testing.assert_equal(om.data, expected.reshape(2, 3, 4)[:, :, [3, 0]])
+            om = OmnicMap.OmnicMap(fn, channels=lambda info, n: slice(1, 3))
+            np.testing.assert_equal(om.data, expected.reshape(2, 3, 4)[:, :, 1:3])
+
+            xs, X, meta = OmnicMapReader(fn).read_spectra()
+            np.testing.assert_equal(xs, np.arange(4))
+            np.testing.assert_equal(X, expected)
+            np.testing.assert_equal(meta.metas, positions)
+
+    def test_read_limits(self):
+        reader = initialize_reader(OmnicMapReader, "small_Omnic.map")
+        xs, X, meta = reader.read_spectra()
+        xs_s, X_s, meta_s = reader.read_spectra(limits=(1700, 1650))
+        ind = np.flatnonzero((xs >= 1650) & (xs <= 1700))
+        self.assertTrue(0 < len(ind) < len(xs))
+        np.testing.assert_equal(xs_s, xs[ind])
+        np.testing.assert_equal(X_s, X[:, ind])
+        np.testing.assert_equal(meta_s.metas, meta.metas)
+
 
 class TestAsciiMapReader(unittest.TestCase):
 
@@ -245,6 +431,78 @@ class TestAgilentReader(unittest.TestCase):
         np.testing.assert_equal(d2_a.X, d2_e.X)
         np.testing.assert_allclose(getx(d2_a), getx(d2_e))
 
+    def test_image_mmap(self):
+        fn = FileFormat.locate("agilent/4_noimage_agg256.dat", dataset_dirs)
+        ai = agilentImage(fn)
+        ai_mmap = agilentImage(fn, mmap=True)
+        self.assertIsInstance(ai_mmap.data, np.memmap)
+        np.testing.assert_equal(ai_mmap.data, ai.data)
+
+    def test_mosaic_mmap(self):
+        fn = FileFormat.locate("agilent/5_mosaic_agg1024.dmt", dataset_dirs)
+        am = agilentMosaic(fn)
+        am_mmap = agilentMosaic(fn, mmap=True)
+        # tiles are mapped and the mosaic is only assembled on access
+        self.assertIsNone(am_mmap._data)
+        self.assertIsInstance(am_mmap.tiles[0, 0](), np.memmap)
+        np.testing.assert_equal(am_mmap.data, am.data)
+        self.assertIsNotNone(am_mmap._data)
+
+    def test_read_limits(self):
+        for reader_cls, fn in [(AgilentImageReader, "agilent/4_noimage_agg256.dat"),
+                               (agilentMosaicReader, "agilent/5_mosaic_agg1024.dmt")]:
+            reader = initialize_reader(reader_cls, fn)
+            xs, X, meta = reader.read_spectra()
+            xs_s, X_s, meta_s = reader.read_spectra(limits=(2030, 2070))
+            np.testing.assert_equal(xs_s, xs[3:6])
+            np.testing.assert_equal(X_s, X[:, 3:6])
+            np.testing.assert_equal(meta_s.metas, meta.metas)
+
+    def test_mosaic_limits_rounded(self):
+        reader = initialize_reader(agilentMosaicReader, "agilent/5_mosaic_agg1024.dmt")
+        xs, X, _ = reader.read_spectra()
+        # limits are compared to attribute names, as in Cut and the tile reader
+        names = spectral_axis(spectral_domain(xs)).x
+        xs_s, X_s, _ = reader.read_spectra(limits=(names[3], names[4]))
+        np.testing.assert_equal(xs_s, xs[3:5])
+        np.testing.assert_equal(X_s, X[:, 3:5])
+
+    def test_mosaic_bands(self):
+        fn = FileFormat.locate("agilent/5_mosaic_agg1024.dmt", dataset_dirs)
+        am = agilentMosaic(fn)
+        am_bands = agilentMosaic(fn, mmap=True, bands=[1, 4])
+        np.testing.assert_equal(am_bands.data, am.data[:, :, [1, 4]])
+        np.testing.assert_equal(am_bands.wavenumbers,
+                                np.asarray(am.wavenumbers)[[1, 4]])
+
+    def test_mosaic_single_allocation(self):
+        reader = initialize_reader(agilentMosaicReader, "agilent/5_mosaic_agg1024.dmt")
+        for limits in [None, (2030, 2070)]:
+            _, X, _ = reader.read_spectra(limits=limits)
+            base = X
+            while base.base is not None:
+                base = base.base
+            # no other copy of the mosaic is made
+            self.assertEqual(base.nbytes, X.nbytes)
+
+    def test_mosaic_select_bands(self):
+        fn = FileFormat.locate("agilent/5_mosaic_agg1024.dmt", dataset_dirs)
+        am = agilentMosaic(fn)
+        for mmap in [True, False]:
+            am_bands = agilentMosaic(fn, mmap=mmap, bands=slice(1, 7))
+            am_bands.select_bands([0, 3, 4])
+            np.testing.assert_equal(am_bands.data, am.data[:, :, [1, 4, 5]])
+            np.testing.assert_equal(am_bands.wavenumbers,
+                                    np.asarray(am.wavenumbers)[[1, 4, 5]])
+
+    def test_mosaic_workers(self):
+        fn = FileFormat.locate("agilent/5_mosaic_agg1024.dmt", dataset_dirs)
+        am = agilentMosaic(fn)
+        progress = []
+        am_par = agilentMosaic(fn, workers=4, callback=progress.append)
+        np.testing.assert_equal(am_par.data, am.data)
+        self.assertEqual(progress, [0.5, 1.])
+
     def test_image_ifg_read(self):
         d = Orange.data.Table("agilent/4_noimage_agg256.seq")
         self.assertEqual(len(d), 64)
@@ -285,6 +543,29 @@ class TestAgilentReader(unittest.TestCase):
         self.assertEqual(d.metas[0, 3], 4)
 
 
+class TestEnviReader(unittest.TestCase):
+
+    def test_read_subset(self):
+        reader = initialize_reader(EnviMapReader, "agilent/4_noimage_agg256.hdr")
+        xs, X, meta = reader.read_spectra()
+        self.assertEqual(X.shape, (64, 9))
+        window = (slice(2, 5), slice(1, 3))
+        xs_s, X_s, meta_s = reader.read_spectra(limits=(2030, 2070), window=window)
+        np.testing.assert_equal(xs_s, xs[3:6])
+        image = X.reshape(8, 8, 9)
+        np.testing.assert_equal(X_s, image[2:5, 1:3, 3:6].reshape(-1, 3))
+        np.testing.assert_equal(meta_s.metas[:, 0], [1, 2] * 3)
+        np.testing.assert_equal(meta_s.metas[:, 1], [2, 2, 3, 3, 4, 4])
+
+    def test_lazy(self):
+        reader = initialize_reader(EnviMapReader, "agilent/4_noimage_agg256.hdr")
+        _, X, _ = reader.read_spectra()
+        _, X_lazy, _ = reader.read_spectra(lazy=True)
+        self.assertFalse(X_lazy.flags.writeable)
+        self.assertTrue(X.flags.writeable)
+        np.testing.assert_equal(X_lazy, X)
+
+
 class TestGSF(unittest.TestCase):
 
     def test_open_line(self):
@@ -329,6 +610,17 @@ class TestNea(unittest.TestCase):
         self.assertEqual("O0A", data.metas[6][2])
         np.testing.assert_almost_equal(data.X[6, 0], 38.0)
 
+    def test_interp_rows(self):
+        rng = np.random.RandomState(0)
+        xp = rng.rand(3, 2, 10)
+        fp = rng.rand(3, 2, 4, 10)
+        x = np.linspace(np.max(np.min(xp, axis=-1)), np.min(np.max(xp, axis=-1)), 7)
+        res = _interp_rows(x, xp, fp)
+        self.assertEqual(res.shape, (3, 2, 4, 7))
+        for i in np.ndindex(3, 2, 4):
+            order = np.argsort(xp[i[:2]])
+            np.testing.assert_allclose(res[i], np.interp(x, xp[i[:2]][order], fp[i][order]))
+
 
 class TestNeaGSF(unittest.TestCase):
 
@@ -360,13 +652,87 @@ class TestSpa(unittest.TestCase):
         self.assertEqual(points, 1738)
 
 
+def write_spc(filename, ys, exps, multi_exp=True, first=1000., last=1004.):
+    """
+    Write a new format SPC file with evenly spaced x values and subfiles ys.
+    Subfiles with exponent 128 are stored as floats, others as scaled
+    32-bit integers.
+    """
+    nsub, npts = np.shape(ys)
+    flags = 0x04 if multi_exp else 0  # TMULTI: exponents in subheaders
+    header = struct.pack("<cccciddicccci9s9sh32s130s30siicchf48sfifc187s",
+                         bytes([flags]), b"K", b"\0", bytes([exps[0]]), npts, first, last,
+                         nsub, b"\1", b"\0", b"\0", b"\0", 0, b"", b"", 0, b"", b"", b"",
+                         0, 0, b"\0", b"\0", 0, 0., b"", 0., 0, 0., b"\0", b"")
+    with open(filename, "wb") as f:
+        f.write(header)
+        for y, exp in zip(ys, exps):
+            f.write(struct.pack("<cchfffiif4s", b"\0", bytes([exp]), 0, 0., 0., 0., 0, 0, 0., b""))
+            if exp == 128:
+                f.write(np.asarray(y, dtype="<f4").tobytes())
+            else:
+                f.write(np.round(np.asarray(y) * 2.0 ** (32 - exp)).astype("<i4").tobytes())
+
+
+def write_spc_old(filename, ys, exp, first=1000., last=1004.):
+    """
+    Write an old format SPC file with subfiles ys stored as scaled 32-bit
+    integers with swapped byte pairs.
+    """
+    _, npts = np.shape(ys)
+    header = struct.pack("<cchfffcchcccc8shh28s130s30s",
+                         b"\0", b"M", exp, npts, first, last, b"\1", b"\0", 0,
+                         b"\0", b"\0", b"\0", b"\0", b"", 0, 0, b"", b"", b"")
+    with open(filename, "wb") as f:
+        f.write(header)
+        for y in ys:
+            f.write(struct.pack("<cchfffiif4s", b"\0", b"\0", 0, 0., 0., 0., 0, 0, 0., b""))
+            raw = np.round(np.asarray(y) * 2.0 ** (32 - exp)).astype(">i4").view(np.uint8)
+            f.write(raw.reshape(-1, 4)[:, [1, 0, 3, 2]].tobytes())
+
+
 class TestSpc(unittest.TestCase):
 
+    YS = [[1.5, -2.25, 3, 0.5, -0.75],
+          [10, 20, -30, 40, 50.5],
+          [0.125, 1, 2, 3, 4]]
+
     def test_multiple_x(self):
         data = Orange.data.Table("m_xyxy.spc")
         self.assertEqual(len(data), 512)
         self.assertAlmostEqual(float(data.domain[0].name), 8401.800003)
         self.assertAlmostEqual(float(data.domain[len(data.domain)-1].name), 137768.800049)
+        x = getx(data)
+        # subfiles have different x values and are scattered to their columns
+        for row, n, xs, ys in [(0, 8, [16943.6000061, 16939.6000061, 16931.19999695],
+                                [6823, 3188, 2498]),
+                               (511, 4, [8443.40000153, 8431.80000305], [2635, 11019])]:
+            self.assertEqual(np.sum(~np.isnan(data.X[row])), n)
+            columns = [np.argmin(np.abs(x - v)) for v in xs]
+            np.testing.assert_allclose(x[columns], xs)
+            np.testing.assert_equal(data.X[row, columns], ys)
+
+    def test_subfiles(self):
+        with named_file("", suffix=".spc") as fn:
+            # integer subfiles with different exponents and a float subfile
+            write_spc(fn, self.YS, [16, 128, 20])
+            data = Orange.data.Table(fn)
+            np.testing.assert_equal(getx(data), [1000, 1001, 1002, 1003, 1004])
+            np.testing.assert_equal(data.X, self.YS)
+            # subfiles decoded together match subfiles decoded one by one
+            with patch("orangecontrib.spectroscopy.utils.spc.spc.File._decode_subfiles_y",
+                       return_value=None):
+                np.testing.assert_equal(Orange.data.Table(fn).X, self.YS)
+            # the global exponent
+            write_spc(fn, self.YS, [16, 16, 16], multi_exp=False)
+            np.testing.assert_equal(Orange.data.Table(fn).X, self.YS)
+
+    def test_old_format(self):
+        with named_file("", suffix=".spc") as fn:
+            write_spc_old(fn, self.YS, 16)
+            data = Orange.data.Table(fn)
+            np.testing.assert_equal(getx(data), [1000, 1001, 1002, 1003, 1004])
+            np.testing.assert_equal(data.X, self.YS)
 
 
 class TestMatlab(unittest.TestCase):
@@ -451,6 +817,58 @@ class TestMatlab(unittest.TestCase):
                 Orange.data.Table("matlab/simple.mat")
 
 
+def write_matlab73(filename, variables):
+    """
+    Write a Matlab 7.3 (HDF5) file as Matlab does: after a 512 byte header,
+    with transposed arrays and characters as uint16. Equivalent to
+    save -v7.3 filename
+    """
+    import h5py
+    with h5py.File(filename, "w", userblock_size=512) as f:
+        for name, value in variables.items():
+            value = np.asarray(value)
+            if value.dtype.kind == "U":
+                rows = [[ord(c) for c in v] for v in np.atleast_1d(value)]
+                d = f.create_dataset(name, data=np.array(rows, dtype=np.uint16).T)
+                d.attrs["MATLAB_class"] = np.bytes_("char")
+            else:
+                d = f.create_dataset(name, data=np.atleast_2d(value).T)
+                d.attrs["MATLAB_class"] = np.bytes_("double")
+    with open(filename, "r+b") as f:
+        f.write(b"MATLAB 7.3 MAT-file".ljust(116) + b"\0" * 8 + b"\0\x02IM")
+
+
+class TestMatlab73(unittest.TestCase):
+
+    def test_read(self):
+        with named_file("", suffix=".mat") as fn:
+            write_matlab73(fn, {"A": np.arange(12.).reshape(3, 4),
+                                "W": np.array([[0, 0.5, 1, 1.5]]),
+                                "M": np.array(["first", "2nd  ", "third"]),
+                                "N": np.array([[8], [9], [10]])})
+            data = Orange.data.Table(fn)
+        np.testing.assert_equal(data.X, np.arange(12.).reshape(3, 4))
+        self.assertEqual(["0.0", "0.5", "1.0", "1.5"],
+                         [a.name for a in data.domain.attributes])
+        self.assertEqual(["M", "N"], [a.name for a in data.domain.metas])
+        self.assertEqual(["first", "2nd", "third"], list(data.metas[:, 0]))
+        extracted = data.transform(Orange.data.Domain([data.domain.metas[1]]))
+        np.testing.assert_equal([[8], [9], [10]], extracted.X)
+
+    def test_load_needed(self):
+        with named_file("", suffix=".mat") as fn:
+            write_matlab73(fn, {"A": np.ones((3, 4)),
+                                "B": np.ones((2, 2)),
+                                "W": np.array(["aa", "bb", "cc", "dd"])})
+            loaded = []
+            load = orangecontrib.spectroscopy.data._matlab73_load
+            with patch("orangecontrib.spectroscopy.data._matlab73_load",
+                       lambda f, d, dtype=None: loaded.append(d.name) or load(f, d, dtype)):
+                data = Orange.data.Table(fn)
+        self.assertEqual(sorted(loaded), ["/A", "/W"])
+        self.assertEqual(["aa", "bb", "cc", "dd"], [a.name for a in data.domain.attributes])
+
+
 class TestDataUtil(unittest.TestCase):
 
     def test_build_spec_table_not_copy(self):
@@ -465,6 +883,37 @@ class TestDataUtil(unittest.TestCase):
         data = build_spec_table(xs, X)
         self.assertTrue(np.may_share_memory(data.X, X))
 
+    def test_spectral_domain_cache(self):
+        xs = np.array([3., 1.5, 2.])
+        domain = spectral_domain(xs)
+        self.assertEqual([a.name for a in domain.attributes],
+                         ["3.000000", "1.500000", "2.000000"])
+        self.assertIs(spectral_domain(xs.copy()), domain)
+        self.assertIs(spectral_domain(list(xs)), domain)
+        self.assertIsNot(spectral_domain(xs[:2]), domain)
+        self.assertEqual(spectral_domain(xs.astype(np.float32)), domain)
+        d1 = build_spec_table(xs, np.ones((2, 3)))
+        d2 = build_spec_table(xs, np.ones((2, 3)), d1[:, :0])
+        self.assertIs(d1.domain, domain)
+        self.assertEqual(d2.domain.attributes, domain.attributes)
+
+    def test_spectral_axis(self):
+        data = build_spec_table(np.array([3., 1.5, 2.]), np.ones((2, 3)))
+        axis = spectral_axis(data.domain)
+        np.testing.assert_equal(axis.x, [3., 1.5, 2.])
+        np.testing.assert_equal(axis.order, [1, 2, 0])
+        np.testing.assert_equal(axis.inverse, [2, 0, 1])
+        self.assertFalse(axis.monotonic)
+        self.assertFalse(axis.x.flags.writeable)
+        self.assertIs(spectral_axis(data.domain), axis)
+        x = getx(data)
+        x[0] = 0  # getx returns a copy
+        np.testing.assert_equal(getx(data), [3., 1.5, 2.])
+        self.assertFalse(spectral_axis(data[:, :2].domain).monotonic)
+        self.assertTrue(spectral_axis(data[:, 1:].domain).monotonic)
+        named = Orange.data.Domain([Orange.data.ContinuousVariable("a")])
+        np.testing.assert_equal(spectral_axis(named).x, [0])
+
 
 class TestSelectColumn(unittest.TestCase):
 
@@ -1,5 +1,8 @@
 import os.path
 import unittest
+from unittest.mock import patch
+
+import numpy as np
 
 import Orange
 from Orange.data.io import FileFormat
@@ -7,6 +10,9 @@ from Orange.preprocess.preprocess import PreprocessorList
 from Orange.widgets.tests.base import WidgetTest
 
 from orangecontrib.spectroscopy import get_sample_datasets_dir
+from orangecontrib.spectroscopy.agilent import agilentMosaicTiles
+from orangecontrib.spectroscopy.data import getx
+from orangecontrib.spectroscopy.preprocess import Cut, LinearBaseline
 from orangecontrib.spectroscopy.tests.test_preprocess import PREPROCESSORS_INDEPENDENT_SAMPLES
 from orangecontrib.spectroscopy.widgets.owpreprocess import OWPreprocess, PREPROCESSORS, \
     create_preprocessor
@@ -32,6 +38,47 @@ class TestTileReaders(unittest.TestCase):
         reader = OWTilefile.get_tile_reader(path)
         reader.read()
 
+    def test_tile_reader_preallocated(self):
+        path = os.path.join(get_sample_datasets_dir(), AGILENT_TILE)
+        reader = OWTilefile.get_tile_reader(path)
+        self.assertEqual(reader.total_rows(), 32)
+        t = reader.read()
+        # unknown number of rows falls back to concatenation of tiles
+        with patch.object(type(reader), "total_rows", lambda self: None):
+            t_concat = reader.read()
+        self.assertEqual(len(t), 32)
+        np.testing.assert_equal(t.X, t_concat.X)
+        np.testing.assert_equal(t.metas, t_concat.metas)
+        self.assertEqual(len(np.unique(t.ids)), 32)
+        # wrong numbers of rows are concatenated too
+        for n_rows in [20, 40]:
+            with patch.object(type(reader), "total_rows", lambda self, n=n_rows: n):
+                t_wrong = reader.read()
+            np.testing.assert_equal(t_wrong.X, t.X)
+            np.testing.assert_equal(t_wrong.metas, t.metas)
+
+    def test_tile_reader_parses_once(self):
+        path = os.path.join(get_sample_datasets_dir(), AGILENT_TILE)
+        reader = OWTilefile.get_tile_reader(path)
+        with patch("orangecontrib.spectroscopy.data.agilentMosaicTiles",
+                   wraps=agilentMosaicTiles) as tiles:
+            reader.read()
+            self.assertEqual(tiles.call_count, 1)
+            reader.read()
+            self.assertEqual(tiles.call_count, 2)
+
+    def test_tile_reader_limits(self):
+        path = os.path.join(get_sample_datasets_dir(), AGILENT_TILE)
+        reader = OWTilefile.get_tile_reader(path)
+        t = reader.read()
+        reader.set_limits((2030, 2070))
+        t_limits = reader.read()
+        x = getx(t)
+        ind = (x >= 2030) & (x <= 2070)
+        np.testing.assert_equal(getx(t_limits), x[ind])
+        np.testing.assert_equal(t_limits.X, t.X[:, ind])
+        np.testing.assert_equal(t_limits.metas, t.metas)
+
 
 class TestTilePreprocessors(unittest.TestCase):
 
@@ -52,6 +99,18 @@ class TestTilePreprocessors(unittest.TestCase):
         t = reader.read()
         assert len(t.domain.attributes) == 3
 
+    def test_preprocessor_list_workers(self):
+        path = os.path.join(get_sample_datasets_dir(), AGILENT_TILE)
+        reader = OWTilefile.get_tile_reader(path)
+        pp = PreprocessorList(PREPROCESSORS_INDEPENDENT_SAMPLES[0:7])
+        reader.set_preprocessor(pp)
+        t = reader.read()
+        reader.set_workers(2, tiles_in_flight=1)
+        t_par = reader.read()
+        self.assertEqual(len(t.domain.attributes), len(t_par.domain.attributes))
+        np.testing.assert_equal(t.X, t_par.X)
+        np.testing.assert_equal(t.metas, t_par.metas)
+
 
 class TestTileReaderWidget(WidgetTest):
 
@@ -66,6 +125,42 @@ class TestTileReaderWidget(WidgetTest):
         self.wait_until_stop_blocking()
         self.assertNotEqual(self.get_output("Data"), None)
 
+    def test_load_workers(self):
+        path = os.path.join(get_sample_datasets_dir(), AGILENT_TILE)
+        self.widget.add_path(path)
+        self.widget.source = self.widget.LOCAL_FILE
+        self.widget.workers = 2
+        self.widget.load_data()
+        self.wait_until_stop_blocking()
+        self.assertEqual(self.widget.reader.workers, 2)
+        self.assertEqual(len(self.get_output("Data")), 32)
+
+    def test_head_cut_limits(self):
+        limits = OWTilefile._head_cut_limits
+        self.assertEqual(limits(Cut(lowlim=2000, highlim=2100)), (2000, 2100))
+        self.assertEqual(limits(PreprocessorList([PreprocessorList([Cut(highlim=2100)]),
+                                                  LinearBaseline()])),
+                         (-np.inf, 2100))
+        self.assertIsNone(limits(PreprocessorList([LinearBaseline(), Cut(lowlim=2000)])))
+        self.assertIsNone(limits(Cut(lowlim=2000, inverse=True)))
+        self.assertIsNone(limits(None))
+
+    def test_load_cut(self):
+        path = os.path.join(get_sample_datasets_dir(), AGILENT_TILE)
+        self.widget.add_path(path)
+        self.widget.source = self.widget.LOCAL_FILE
+        pp = PreprocessorList([Cut(lowlim=2030, highlim=2070), LinearBaseline()])
+        self.send_signal("Preprocessor", pp)
+        self.widget.load_data()
+        self.wait_until_stop_blocking()
+        self.assertEqual(self.widget.reader.limits, (2030, 2070))
+        out = self.get_output("Data")
+        reader = OWTilefile.get_tile_reader(path)
+        reader.set_preprocessor(pp)
+        expected = reader.read()  # all wavenumbers
+        np.testing.assert_equal(getx(out), getx(expected))
+        np.testing.assert_equal(out.X, expected.X)
+
     def test_preproc_load(self):
         """ Test that loading a preprocessor signal in the widget works """
         # OWPreprocess test setup from test_owpreprocess.test_allpreproc_indv
@@ -3,6 +3,30 @@ import numpy as np
 from Orange.data import Domain, Table
 
 
+def check_spectra_dtype(dtype):
+    """Return dtype as a np.dtype if spectra can have it: np.float64 (the
+    default everywhere) or np.float32.
+
+    With np.float32, readers (read_spectra) return single precision spectra
+    and preprocessors compute in single precision, which halves the memory
+    of those arrays. Orange tables store X as float64, so it does not
+    reduce the memory of tables.
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError("Spectra can be either float32 or float64.")
+    return dtype
+
+
+def as_spectra_dtype(X, dtype):
+    """Return floating point X converted to dtype if it has a greater
+    precision; other arrays are returned unchanged."""
+    dtype = np.dtype(dtype)
+    if X.dtype.kind == "f" and X.dtype.itemsize > dtype.itemsize:
+        return X.astype(dtype)
+    return X
+
+
 def apply_columns_numpy(array, function, selector=None, chunk_size=10 ** 7, callback=None):
     """Split the array by columns, applies selection and then the function.
     Returns output equivalent to function(array[selector])
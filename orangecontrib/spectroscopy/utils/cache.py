@@ -0,0 +1,211 @@
+from functools import lru_cache
+import hashlib
+import inspect
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from Orange.misc.environ import cache_dir
+
+from orangecontrib.spectroscopy.utils import check_spectra_dtype, as_spectra_dtype
+
+
+@lru_cache(maxsize=None)
+def _package_version():
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution("Orange-Spectroscopy").version
+    except Exception:  # pylint: disable=broad-except
+        return None  # not installed, for example, when run from sources
+
+
+class SpectraCache:
+    """
+    A disk cache of read_spectra outputs of SpectralFileFormat readers.
+
+    Only readers with CACHEABLE set are cached. Entries are keyed by the
+    package version, the reader class and its CACHE_VERSION, its selected
+    sheet, the requested dtype, and the paths, sizes and modification times
+    of the reader's source_files(), so that changed files are read again.
+
+    Wavenumbers and values are stored as .npy files which are memory-mapped
+    (copy-on-write) when loaded, or, with compress=True, as a compressed .npz
+    file which is loaded whole. Metas are stored in the spectra HDF5 format;
+    outputs with table attributes that it can not store are not cached.
+    When the cache exceeds max_size bytes the least recently used entries
+    are removed. Files smaller than min_size bytes are not cached because
+    they are fast to read anyway.
+    """
+
+    # increase when the layout of entries changes
+    FORMAT_VERSION = 2
+    # seconds after which unfinished entries are considered abandoned
+    TMP_MAX_AGE = 3600
+
+    def __init__(self, directory, max_size=2 ** 31, min_size=2 ** 20, compress=False):
+        self.directory = directory
+        self.max_size = max_size
+        self.min_size = min_size
+        self.compress = compress
+        self.enabled = True
+
+    def key(self, reader, dtype=np.float64):
+        """Return the key of the reader's file or None if it is not cacheable."""
+        cls = type(reader)
+        if not getattr(cls, "CACHEABLE", False):
+            return None
+        try:
+            files = []
+            for fn in reader.source_files():
+                fn = os.path.abspath(fn)
+                stat = os.stat(fn)
+                files.append((fn, stat.st_size, stat.st_mtime_ns))
+        except (OSError, TypeError):
+            return None
+        if sum(size for _, size, _ in files) < self.min_size:
+            return None
+        desc = [self.FORMAT_VERSION, _package_version(), cls.__module__, cls.__qualname__,
+                cls.CACHE_VERSION, getattr(reader, "sheet", None),
+                np.dtype(dtype).str, files]
+        return hashlib.sha1(repr(desc).encode("utf-8")).hexdigest()
+
+    def read_spectra(self, reader, dtype=np.float64):
+        """Return reader.read_spectra() from the cache or read and store it.
+        Readers that accept dtype read values as dtype (see
+        check_spectra_dtype); outputs of others are converted if it is
+        less precise."""
+        dtype = check_spectra_dtype(dtype)
+        key = self.key(reader, dtype) if self.enabled else None
+        if key is None:
+            return self._read(reader, dtype)
+        spectra = self.load(key)
+        if spectra is None:
+            spectra = self._read(reader, dtype)
+            self.save(key, spectra)
+        return spectra
+
+    @staticmethod
+    def _read(reader, dtype):
+        if "dtype" in inspect.signature(reader.read_spectra).parameters:
+            # read directly into dtype instead of converting a copy
+            xs, X, metas = reader.read_spectra(dtype=dtype)
+        else:
+            xs, X, metas = reader.read_spectra()
+        return xs, as_spectra_dtype(np.asarray(X), dtype), metas
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        """Return a cached (xs, values, metas) triplet or None."""
+        path = self._path(key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            if os.path.exists(os.path.join(path, "spectra.npz")):
+                with np.load(os.path.join(path, "spectra.npz")) as f:
+                    xs, X = f["xs"], f["X"]
+            else:
+                xs = np.load(os.path.join(path, "xs.npy"))
+                X = np.load(os.path.join(path, "X.npy"), mmap_mode="c")
+            metas = None
+            metas_fn = os.path.join(path, "metas.sh5")
+            if os.path.exists(metas_fn):
+                _, _, metas = self._metas_reader(metas_fn).read_spectra()
+            os.utime(path)  # mark as recently used
+        except Exception:  # pylint: disable=broad-except
+            # a corrupted or partially removed entry is read again
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        return xs, X, metas
+
+    def save(self, key, spectra):
+        """Store an (xs, values, metas) triplet and evict old entries."""
+        xs, X, metas = spectra
+        if metas is not None and \
+                self._metas_reader._json_attributes(metas.attributes) != metas.attributes:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = tempfile.mkdtemp(dir=self.directory, prefix=".tmp")
+        except OSError:
+            return
+        try:
+            if self.compress:
+                np.savez_compressed(os.path.join(tmp, "spectra.npz"),
+                                    xs=np.asarray(xs), X=np.asarray(X))
+            else:
+                np.save(os.path.join(tmp, "xs.npy"), np.asarray(xs))
+                np.save(os.path.join(tmp, "X.npy"), np.asarray(X))
+            if metas is not None:
+                self._metas_reader.write_file(os.path.join(tmp, "metas.sh5"), metas)
+            # renaming makes complete entries appear at once
+            os.rename(tmp, self._path(key))
+        except Exception:  # pylint: disable=broad-except
+            # the cache is an optimization: failing to write it is not an error
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict()
+
+    def entries(self):
+        """Return a list of (last use time, size, path) of cache entries."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(path, fn))
+                           for fn in os.listdir(path))
+                entries.append((os.stat(path).st_mtime, size, path))
+            except OSError:
+                pass  # removed by another process
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_size
+        and unfinished entries abandoned by interrupted saves."""
+        self._remove_abandoned()
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def _remove_abandoned(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        # entries of concurrent saves are recent
+        oldest = time.time() - self.TMP_MAX_AGE
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if name.startswith(".tmp") and os.stat(path).st_mtime < oldest:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass  # removed by another process
+
+    @property
+    def _metas_reader(self):
+        # imported here because readers use the cache
+        from orangecontrib.spectroscopy.data import SpectralHDF5Reader
+        return SpectralHDF5Reader
+
+    def clear(self):
+        """Remove all cache entries."""
+        for _, _, path in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+spectra_cache = SpectraCache(os.path.join(cache_dir(), "spectroscopy", "spectra"))
@@ -166,10 +166,8 @@ class File:
                     # if global x data is given
                     x_dat_pos = self.head_siz
                     x_dat_end = self.head_siz + (4 * self.fnpts)
-                    self.x = np.array(
-                        [struct.unpack_from(
-                            'f', content[x_dat_pos:x_dat_end], 4 * i)[0]
-                            for i in range(0, self.fnpts)])
+                    self.x = np.frombuffer(content, dtype=np.float32, count=self.fnpts,
+                                           offset=x_dat_pos).astype(np.float64)
                     sub_pos = x_dat_end
                 else:
                     # otherwise generate them
@@ -178,6 +176,10 @@ class File:
             # make a list of subfiles
             self.sub = []
 
+            # subfiles decode their data with np.frombuffer at offsets into
+            # the shared file contents, a memoryview avoids copying them
+            content_view = memoryview(content)
+
             # if subfile directory is given
             if self.dat_fmt == '-xy' and self.fnpts > 0:
                 self.directory = True
@@ -186,15 +188,18 @@ class File:
                     ssfposn, ssfsize, ssftime = struct.unpack(
                         '<iif'.encode('utf8'), content[self.fnpts + (i * 12):self.fnpts + ((i + 1) * 12)])
                     # add sufile, load defaults for npts and exp
-                    self.sub.append(subFile(content[ssfposn:ssfposn + ssfsize], 0, 0, True, self.tsprec, self.tmulti))
+                    self.sub.append(subFile(content_view[ssfposn:ssfposn + ssfsize], 0, 0, True, self.tsprec, self.tmulti))
 
             else:
+                ys = None
+                if not self.txyxys:
+                    ys = self._decode_subfiles_y(content, sub_pos)
                 # don't have directory, for each subfile
                 for i in range(self.fnsub):
                     # figure out its size
                     if self.txyxys:
                         # use points in subfile
-                        subhead_lst = read_subheader(content[sub_pos:(sub_pos + 32)])
+                        subhead_lst = read_subheader(content_view[sub_pos:(sub_pos + 32)])
                         pts = subhead_lst[6]
                         # 4 bytes each for x and y, and 32 for subheader
                         dat_siz = (8 * pts) + 32
@@ -205,8 +210,9 @@ class File:
 
                     sub_end = sub_pos + dat_siz
                     # read into object, add to list
-                    self.sub.append(subFile(content[sub_pos:sub_end],
-                                            self.fnpts, self.fexp, self.txyxys, self.tsprec, self.tmulti))
+                    self.sub.append(subFile(content_view[sub_pos:sub_end],
+                                            self.fnpts, self.fexp, self.txyxys, self.tsprec, self.tmulti,
+                                            y=None if ys is None else ys[i]))
                     # update positions
                     sub_pos = sub_end
 
@@ -395,6 +401,43 @@ class File:
     # Process other data
     # ------------------------------------------------------------------------
 
+    def _decode_subfiles_y(self, content, sub_pos):
+        """
+        Decode y values of all subfiles of the new format without x values
+        with one strided view over the subfile block; they all have the
+        same size. Return a (subfiles x points) array, or None if the file
+        is too short (subfiles are then decoded one by one).
+        """
+        pts = self.fnpts
+        nsub = self.fnsub
+        # same subfile size as when reading them one by one
+        stride = self.subhead_siz + 4 * pts
+        if nsub <= 0 or sub_pos + nsub * stride > len(content):
+            return None
+
+        if self.tmulti:
+            # subexp is the second byte of each subheader
+            exps = np.ndarray((nsub,), dtype=np.uint8, buffer=content,
+                              offset=sub_pos + 1, strides=(stride,)).astype(int)
+        else:
+            exps = np.full(nsub, self.fexp)
+        # out of range exponents are zeroed as in subFile
+        exps[~((-128 < exps) & (exps <= 128))] = 0
+
+        y_pos = sub_pos + self.subhead_siz
+        floats = exps == 128
+        if np.all(floats):
+            return np.ndarray((nsub, pts), dtype='<f4', buffer=content, offset=y_pos,
+                              strides=(stride, 4)).astype(np.float64)
+        size, bits = (2, 16) if self.tsprec else (4, 32)
+        ints = np.ndarray((nsub, pts), dtype='<i%d' % size, buffer=content, offset=y_pos,
+                          strides=(stride, size))
+        y = ints * (2.0 ** (exps - bits))[:, None]
+        if np.any(floats):
+            y[floats] = np.ndarray((nsub, pts), dtype='<f4', buffer=content, offset=y_pos,
+                                   strides=(stride, 4))[floats]
+        return y
+
     def set_labels(self):
         """
         Set the x, y, z axis labels using various information in file content
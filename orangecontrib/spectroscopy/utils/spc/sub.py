@@ -6,7 +6,6 @@ author: Rohan Isaac
 
 from __future__ import division, absolute_import, unicode_literals, print_function
 
-import struct
 import numpy as np
 
 from .global_fun import read_subheader
@@ -25,7 +24,7 @@ class subFile:
 
     """
 
-    def __init__(self, data, fnpts, fexp, txyxy, tsprec, tmulti):
+    def __init__(self, data, fnpts, fexp, txyxy, tsprec, tmulti, y=None):
 
         # extract subheader info
         self.subflgs, \
@@ -65,42 +64,37 @@ class subFile:
         # if x_data present
         # --------------------------
         if txyxy:
-            x_str = '<' + 'i' * pts
             x_dat_pos = y_dat_pos
             x_dat_end = x_dat_pos + (4 * pts)
 
-            x_raw = np.array(struct.unpack(x_str.encode('utf8'), data[x_dat_pos:x_dat_end]))
-            self.x = (2**(exp - 32)) * x_raw
+            x_raw = np.frombuffer(data, dtype='<i4', count=pts, offset=x_dat_pos)
+            self.x = (2.0**(exp - 32)) * x_raw
 
             y_dat_pos = x_dat_end
 
         # --------------------------
         # extract y_data
         # --------------------------
-        y_dat_str = '<'
-        if exp == 128:
+        if y is not None:
+            # already decoded together with other subfiles
+            self.y = y
+        elif exp == 128:
             # Floating y-values
-            y_dat_str += 'f' * pts
-            y_dat_end = y_dat_pos + (4 * pts)
-            y_raw = np.array(struct.unpack(y_dat_str.encode('utf8'), data[y_dat_pos:y_dat_end]))
-            self.y = y_raw
+            y_raw = np.frombuffer(data, dtype='<f4', count=pts, offset=y_dat_pos)
+            self.y = y_raw.astype(np.float64)
         else:
             # integer format
             # lydata = len(data) - y_dat_pos
             if tsprec:
                 # 16 bit
-                y_dat_str += 'h' * pts  # short
-                y_dat_end = y_dat_pos + (2 * pts)
-                y_raw = np.array(struct.unpack(y_dat_str.encode('utf8'), data[y_dat_pos:y_dat_end]))
-                self.y = (2**(exp - 16)) * y_raw
+                y_raw = np.frombuffer(data, dtype='<i2', count=pts, offset=y_dat_pos)
+                self.y = (2.0**(exp - 16)) * y_raw
             else:
                 # 32 bit, using size of subheader to figure out data type
                 # actually there is flag for this, use it instead
                 # self.tsprec
-                y_dat_str += 'i' * pts
-                y_dat_end = y_dat_pos + (4 * pts)
-                y_raw = np.array(struct.unpack(y_dat_str.encode('utf8'), data[y_dat_pos:y_dat_end]))
-                self.y = (2**(exp - 32)) * y_raw
+                y_raw = np.frombuffer(data, dtype='<i4', count=pts, offset=y_dat_pos)
+                self.y = (2.0**(exp - 32)) * y_raw
 
 
 class subFileOld:
@@ -151,12 +145,11 @@ class subFileOld:
         # --------------------------
 
         if txyxy:
-            x_str = 'i' * pts
             x_dat_pos = y_dat_pos
             x_dat_end = x_dat_pos + (4 * pts)
 
-            x_raw = np.array(struct.unpack(x_str.encode('utf8'), data[x_dat_pos:x_dat_end]))
-            self.x = (2**(exp - 32)) * x_raw
+            x_raw = np.frombuffer(data, dtype=np.intc, count=pts, offset=x_dat_pos)
+            self.x = (2.0**(exp - 32)) * x_raw
 
             y_dat_pos = x_dat_end
 
@@ -165,26 +158,19 @@ class subFileOld:
         # --------------------------
 
         # assuming can't have 2 byte y-values, !! fix maybe
-        y_dat_end = y_dat_pos + (4 * pts)
         if yfloat:
             # floats are pretty straigtfoward
-            y_dat_str = '<' + 'f' * pts
-            y_raw = struct.unpack(y_dat_str.encode('utf8'), data[y_dat_pos:y_dat_end])
-            self.y = y_raw
+            y_raw = np.frombuffer(data, dtype='<f4', count=pts, offset=y_dat_pos)
+            self.y = y_raw.astype(np.float64)
         else:
             # for old format, extract the entire array out as 1 bit unsigned
             # integers, swap 1st and 2nd byte, as well as 3rd and 4th byte to get
             # the final integer then scale by the exponent
-            y_dat_str = '>' + 'B' * 4 * pts
-            y_raw = struct.unpack(y_dat_str.encode('utf8'), data[y_dat_pos:y_dat_end])
-
-            y_int = []
-            for i in range(0, len(y_raw), 4):
-                y_int.append((
-                    y_raw[i + 1] * (256**3) + y_raw[i] * (256**2) +
-                    y_raw[i + 3] * (256) + y_raw[i + 2]))
-            # fix negative values by casting to np.int32 (signed int)
-            y_int = np.int32(y_int) / (2**(32 - exp))
+            y_raw = np.frombuffer(data, dtype=np.uint8, count=4 * pts, offset=y_dat_pos)
+            y_raw = y_raw.reshape((pts, 4))[:, [1, 0, 3, 2]]
+
+            # reordered bytes are a big-endian signed integer
+            y_int = np.ascontiguousarray(y_raw).view('>i4').ravel() / (2**(32 - exp))
 
             self.y = y_int
 
@@ -1,26 +1,29 @@
 import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from functools import reduce
-from itertools import chain, repeat
 from collections import Counter
 from typing import List
 
 import numpy as np
+import scipy.sparse as sp
 
-from AnyQt.QtCore import Qt
+from AnyQt.QtCore import Qt, QFileSystemWatcher, QTimer
 from AnyQt.QtWidgets import QSizePolicy as Policy, QGridLayout, QLabel, QFileDialog,\
     QStyle, QListWidget
 
-from Orange.data import Domain, Table, ContinuousVariable, StringVariable
+from Orange.data import Domain, Table, StringVariable
 from Orange.data.io import FileFormat, class_from_qualified_name
 from Orange.widgets import widget, gui
 from Orange.widgets.settings import Setting, ContextSetting, PerfectDomainContextHandler,\
     SettingProvider
+from Orange.widgets.utils.concurrent import TaskState, ConcurrentWidgetMixin
 from Orange.widgets.utils.domaineditor import DomainEditor
 from Orange.widgets.utils.filedialogs import RecentPathsWidgetMixin, RecentPath,\
     open_filename_dialog
 from Orange.widgets.utils.signals import Output
 
-from orangecontrib.spectroscopy.data import SpectralFileFormat
+from orangecontrib.spectroscopy.data import SpectralFileFormat, spectral_domain
+from orangecontrib.spectroscopy.utils.cache import spectra_cache
 
 
 def unique(seq):
@@ -40,31 +43,23 @@ def domain_union(A, B):
     return union
 
 
-def numpy_union_keep_order(A, B):
-    """ Union of A and B. Elements not in A are
-    added in the same order as in B."""
-    # sorted list of elements missing in A
-    to_add = np.setdiff1d(B, A)
-
-    # find indices of new elements in the sorted array
-    orig_sind = np.argsort(B)
-    indices = np.searchsorted(B, to_add, sorter=orig_sind)
-
-    # take the missing elements in the correct order
-    to_add = B[sorted(orig_sind[indices])]
-
-    return np.concatenate((A, to_add))
-
-
-def domain_union_for_spectra(tables):
+def domain_union_for_spectra(tables, union=None):
     """
     Works with tables of spectra-specific 3-tuples
+
+    A (domain, xs) union of preceding tables, if given, is extended
+    with the union of tables.
     """
+    if union is None:
+        union = Domain(attributes=[]), np.array([])
     domains = [t.domain if isinstance(t, Table) else t[2].domain for t in tables]
-    domain = reduce(domain_union, domains, Domain(attributes=[]))
+    domain = reduce(domain_union, domains, union[0])
 
+    # union of wavenumbers in the order of their first appearance
     xss = [t[0] for t in tables if not isinstance(t, Table)]
-    xs = reduce(numpy_union_keep_order, xss, np.array([]))
+    xs = np.concatenate([union[1]] + xss)
+    _, first = np.unique(xs, return_index=True)
+    xs = xs[np.sort(first)]
 
     xsset = set("%f" % f for f in xs)  # future attribute names
     attributes_name_set = set(a.name for a in domain.attributes)
@@ -76,42 +71,144 @@ def domain_union_for_spectra(tables):
     return domain, xs
 
 
-def concatenate_data(tables, filenames, label):
-    domain, xs = domain_union_for_spectra(tables)
-    ntables = [(table if isinstance(table, Table) else table[2]).transform(domain)
-               for table in tables]
-    data = type(ntables[0]).concatenate(ntables, axis=0)
+def _table_columns(table):
+    """Yield (dense 2d array, variables) for parts of table."""
+    Y = table.Y.reshape(-1, 1) if table.Y.ndim == 1 else table.Y
+    for arr, variables in ((table.X, table.domain.attributes),
+                           (Y, table.domain.class_vars),
+                           (table.metas, table.domain.metas)):
+        if variables:
+            yield (arr.toarray() if sp.issparse(arr) else arr), variables
+
+
+def concatenate_data(tables, filenames, label, union=None):
+    """
+    Concatenate tables and spectral triplets into a table with the union
+    of their domains and wavenumbers, and add file name and label metas.
+    The union, if already known, can be passed as a (domain, xs) pair.
+
+    Output arrays are allocated once and filled with index maps from the
+    domain of each input to the output domain.
+    """
+    domain, xs = domain_union_for_spectra(tables) if union is None else union
     source_var = StringVariable.make("Filename")
     label_var = StringVariable.make("Label")
-
-    # add other variables
-    xs_atts = tuple([ContinuousVariable.make("%f" % f) for f in xs])
+    xs_atts = spectral_domain(xs).attributes
     domain = Domain(xs_atts + domain.attributes, domain.class_vars,
                     domain.metas + (source_var, label_var))
-    data = data.transform(domain)
 
-    # fill in spectral data
+    additional = [t if isinstance(t, Table) else t[2] for t in tables]
+    lengths = [len(t) for t in additional]
+    offsets = np.cumsum([0] + lengths)
+
+    X = np.full((offsets[-1], len(domain.attributes)), np.nan)
+    Y = np.full((offsets[-1], len(domain.class_vars)), np.nan)
+    metas = np.empty((offsets[-1], len(domain.metas)), dtype=object)
+    for i, var in enumerate(domain.metas):
+        metas[:, i] = var.Unknown
+    metas[:, -2] = np.repeat(np.array(filenames, dtype=object), lengths)
+    metas[:, -1] = label
+
+    # output array and column for every variable of the output domain
+    location = {}
+    for arr, variables in ((X, domain.attributes), (Y, domain.class_vars),
+                           (metas, domain.metas[:-2])):
+        for i, var in enumerate(variables):
+            location.setdefault(var, (arr, i))
+
     xs_sind = np.argsort(xs)
     xs_sorted = xs[xs_sind]
-    pos = 0
-    for table in tables:
-        t = table if isinstance(table, Table) else table[2]
+    for table, t, start, end in zip(tables, additional, offsets, offsets[1:]):
         if not isinstance(table, Table):
             indices = xs_sind[np.searchsorted(xs_sorted, table[0])]
-            data.X[pos:pos+len(t), indices] = table[1]
-        pos += len(t)
-
-    data[:, source_var] = np.array(list(
-        chain(*(repeat(fn, len(table))
-                for fn, table in zip(filenames, ntables)))
-    )).reshape(-1, 1)
-    data[:, label_var] = np.array(list(
-        chain(*(repeat(label, len(table))
-                for fn, table in zip(filenames, ntables)))
-    )).reshape(-1, 1)
+            X[start:end, indices] = table[1]
+        for arr, variables in _table_columns(t):
+            maps = {}
+            for i, var in enumerate(variables):
+                out, j = location[var]
+                src, dst = maps.setdefault(id(out), (out, [], []))[1:]
+                src.append(i)
+                dst.append(j)
+            for out, src, dst in maps.values():
+                out[start:end, dst] = arr[:, src]
+
+    data = Table.from_numpy(domain, X, Y, metas)
+    names = [t.name for t in additional if t.name != "untitled"]
+    if names:
+        data.name = names[0]
+    for t in reversed(additional):
+        data.attributes.update(getattr(t, "attributes", {}))
     return data
 
 
+class InterruptException(Exception):
+    pass
+
+
+def _file_key(reader, sheet):
+    """Return a key of the reader's data that changes when its file changes."""
+    filename = os.path.abspath(reader.filename)
+    try:
+        stat = os.stat(filename)
+        size, mtime = stat.st_size, stat.st_mtime_ns
+    except OSError:
+        size = mtime = None
+    return filename, type(reader).qualified_name(), sheet, size, mtime
+
+
+def _read_file(reader, sheet):
+    """Read a file as a spectral triplet (if supported) or as a Table."""
+    if sheet in reader.sheets:
+        reader.select_sheet(sheet)
+    if isinstance(reader, SpectralFileFormat):
+        xs, vals, additional = spectra_cache.read_spectra(reader)
+        if additional is None:
+            additional = Table.from_domain(Domain(attributes=[]), n_rows=len(vals))
+        return xs, vals, additional
+    return reader.read()
+
+
+def read_files(readers, sheet, workers, state: TaskState):
+    """
+    Read files with readers concurrently in a pool of workers threads
+    (None for the ThreadPoolExecutor default).
+    Results are reported in order as partial results (index, data, error
+    message). Return a list of read data or None for files with errors.
+    """
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) + 4)
+    results = [None] * len(readers)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = []
+    try:
+        for i in range(len(readers)):
+            # only as many reads as there are workers are submitted ahead,
+            # so that after cancelling at most those finish in the background
+            while len(futures) < min(len(readers), i + workers):
+                if state.is_interruption_requested():
+                    raise InterruptException
+                futures.append(executor.submit(_read_file, readers[len(futures)], sheet))
+            future = futures[i]
+            while True:
+                if state.is_interruption_requested():
+                    raise InterruptException
+                try:
+                    results[i] = future.result(timeout=0.1)
+                    error = None
+                except FutureTimeoutError:
+                    continue
+                except Exception as ex:  # pylint: disable=broad-except
+                    error = str(ex)
+                break
+            state.set_partial_result((i, results[i], error))
+            state.set_progress_value((i + 1) / len(readers) * 100)
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+    return results
+
+
 class RelocatablePathsWidgetMixin(RecentPathsWidgetMixin):
     """
     Do not rearrangee the file list as the RecentPathsWidgetMixin does.
@@ -129,7 +226,7 @@ class RelocatablePathsWidgetMixin(RecentPathsWidgetMixin):
         return NotImplementedError
 
 
-class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin):
+class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin, ConcurrentWidgetMixin):
     name = "Multifile"
     id = "orangecontrib.spectroscopy.widgets.files"
     icon = "icons/multifile.svg"
@@ -157,6 +254,7 @@ class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin):
 
     sheet = Setting(None, schema_only=True)
     label = Setting("", schema_only=True)
+    watch = Setting(False, schema_only=True)
     recent_paths = Setting([], schema_only=True)
     variables = ContextSetting([], schema_only=True)
 
@@ -165,15 +263,31 @@ class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin):
         missing_reader = widget.Msg("Missing reader(s).")
         read_error = widget.Msg("Read error(s).")
 
+    class Warning(widget.OWWidget.Warning):
+        cancelled = widget.Msg("Loading was cancelled.")
+
     domain_editor = SettingProvider(DomainEditor)
 
     def __init__(self):
         widget.OWWidget.__init__(self)
         RelocatablePathsWidgetMixin.__init__(self)
+        ConcurrentWidgetMixin.__init__(self)
         self.domain = None
         self.data = None
         self.loaded_file = ""
         self.sheets = []
+        self._loading = []  # list widget indices of files being read
+        self._keys = []  # keys of files in self._loading
+        self._reading = []  # positions in self._loading of files not in cache
+        self._file_cache = {}  # file key -> read data
+        self._union = None  # (keys, domain, xs) of the last output
+
+        # new files in directories of listed files are added in watch mode
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._directory_changed)
+        self._watch_timer = QTimer(self, singleShot=True, interval=1000)
+        self._watch_timer.timeout.connect(self._add_new_files)
+        self._dir_contents = {}
 
         self.lb = gui.listBox(self.controlArea, self, "file_idx",
                               selectionMode=QListWidget.MultiSelection)
@@ -204,6 +318,11 @@ class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin):
         reload_button.setSizePolicy(Policy.Fixed, Policy.Fixed)
         layout.addWidget(reload_button, 0, 7)
 
+        self.cancel_button = gui.button(
+            None, self, "Cancel", callback=self.cancel_loading, autoDefault=False)
+        self.cancel_button.setEnabled(False)
+        layout.addWidget(self.cancel_button, 0, 8)
+
         self.sheet_box = gui.hBox(None, addToLayout=False, margin=0)
         self.sheet_index = 0
         self.sheet_combo = gui.comboBox(None, self, "sheet_index",
@@ -228,6 +347,11 @@ class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin):
                      label="Label", orientation=Qt.Horizontal)
         layout.addWidget(label_box, 0, 6)
 
+        watch_box = gui.checkBox(
+            None, self, "watch", "Watch", callback=self._update_watcher,
+            tooltip="Add files that appear in directories of listed files.")
+        layout.addWidget(watch_box, 0, 4)
+
         layout.setColumnStretch(3, 2)
 
         box = gui.widgetBox(self.controlArea, "Columns (Double click to edit)")
@@ -255,7 +379,7 @@ class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin):
         self.load_data()
 
     def set_label(self):
-        self.load_data()
+        self.update_data()
 
     def _select_active_sheet(self):
         if self.sheet:
@@ -295,7 +419,7 @@ class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin):
 
     def select_sheet(self):
         self.sheet = self.sheets[self.sheet_combo.currentIndex()][0]
-        self.load_data()
+        self.update_data()
 
     def remove_item(self):
         ri = [i.row() for i in self.lb.selectedIndexes()]
@@ -303,14 +427,14 @@ class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin):
             self.recent_paths.pop(i)
             self.lb.takeItem(i)
         self._update_sheet_combo()
-        self.load_data()
+        self.update_data()
 
     def clear(self):
         self.lb.clear()
         while self.recent_paths:
             self.recent_paths.pop()
         self._update_sheet_combo()
-        self.load_data()
+        self.update_data()
 
     def browse_files(self, in_demos=False):
         start_file = self.last_path() or os.path.expanduser("~/")
@@ -331,23 +455,29 @@ class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin):
             self.lb.addItem(f)
 
         self._update_sheet_combo()
-        self.load_data()
+        self.update_data()
 
     def load_data(self):
+        """Read all files again."""
+        self._file_cache.clear()
+        self._union = None
+        self.update_data()
+
+    def update_data(self):
+        """Read new or changed files and output all files."""
+        self.cancel()
         self.closeContext()
 
         self.Error.file_not_found.clear()
         self.Error.missing_reader.clear()
         self.Error.read_error.clear()
+        self.Warning.cancelled.clear()
 
-        data_list = []
-        fnok_list = []
-
-        def show_error(li, msg):
-            li.setForeground(Qt.red)
-            li.setToolTip(msg)
+        readers = []
+        self._loading = []
+        self._keys = []
+        self._reading = []
 
-        empty_domain = Domain(attributes=[])
         for i, rp in enumerate(self.recent_paths):
             fn = rp.abspath
 
@@ -358,7 +488,7 @@ class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin):
             li.setForeground(self.default_foreground)
 
             if not os.path.exists(fn):
-                show_error(li, "File not found.")
+                self._show_error(li, "File not found.")
                 self.Error.file_not_found()
                 continue
 
@@ -366,38 +496,170 @@ class OWMultifile(widget.OWWidget, RelocatablePathsWidgetMixin):
                 reader = _get_reader(rp)
                 assert reader is not None
             except Exception:  # pylint: disable=broad-except
-                show_error(li, "Reader not found.")
+                self._show_error(li, "Reader not found.")
                 self.Error.missing_reader()
                 continue
 
-            try:
-                if self.sheet in reader.sheets:
-                    reader.select_sheet(self.sheet)
-                if isinstance(reader, SpectralFileFormat):
-                    xs, vals, additional = reader.read_spectra()
-                    if additional is None:
-                        additional = Table.from_domain(empty_domain, n_rows=len(vals))
-                    data_list.append((xs, vals, additional))
-                else:
-                    data_list.append(reader.read())
-                fnok_list.append(fn)
-            except Exception as ex:  # pylint: disable=broad-except
-                show_error(li, "Read error:\n" + str(ex))
-                self.Error.read_error()
-
-        if not data_list \
+            key = _file_key(reader, self.sheet)
+            if key not in self._file_cache:
+                li.setForeground(Qt.gray)
+                li.setToolTip("Loading...")
+                readers.append(reader)
+                self._reading.append(len(self._loading))
+            self._loading.append(i)
+            self._keys.append(key)
+
+        self._update_watcher()
+
+        if not self._loading \
                 or self.Error.file_not_found.is_shown() \
-                or self.Error.missing_reader.is_shown() \
-                or self.Error.read_error.is_shown():
-            self.data = None
+                or self.Error.missing_reader.is_shown():
+            self._set_data(None)
+            return
+
+        if readers:
+            self.cancel_button.setEnabled(True)
+            self.start(read_files, readers, self.sheet, None)
+        else:
+            self._concatenate()
+
+    @staticmethod
+    def _show_error(li, msg):
+        li.setForeground(Qt.red)
+        li.setToolTip(msg)
+
+    def on_partial_result(self, result):
+        i, data, error = result
+        pos = self._reading[i]
+        li = self.lb.item(self._loading[pos])
+        if error is None:
+            # cached at once so that files read before cancelling are kept
+            self._file_cache[self._keys[pos]] = data
+            li.setForeground(self.default_foreground)
+            li.setToolTip("")
+        else:
+            self._show_error(li, "Read error:\n" + error)
+            self.Error.read_error()
+
+    def on_done(self, _):
+        self.cancel_button.setEnabled(False)
+        if self.Error.read_error.is_shown():
+            self._set_data(None)
+            return
+        self._concatenate()
+
+    def _concatenate(self):
+        # forget files that were removed or changed
+        keys = set(self._keys)
+        for key in list(self._file_cache):
+            if key not in keys:
+                del self._file_cache[key]
+
+        tables = [self._file_cache[key] for key in self._keys]
+        # when files were only appended, extend the union of the last output
+        if self._union is not None and self._keys[:len(self._union[0])] == self._union[0]:
+            n = len(self._union[0])
+            union = domain_union_for_spectra(tables[n:], self._union[1:])
+        else:
+            union = domain_union_for_spectra(tables)
+        self._union = (self._keys, ) + union
+
+        fnok_list = [self.recent_paths[i].abspath for i in self._loading]
+        self._set_data(concatenate_data(tables, fnok_list, self.label, union))
+
+    def _update_watcher(self):
+        directories = set()
+        if self.watch:
+            directories = set(os.path.dirname(rp.abspath) for rp in self.recent_paths)
+            directories = set(d for d in directories if os.path.isdir(d))
+        watched = set(self._watcher.directories())
+        if watched - directories:
+            self._watcher.removePaths(list(watched - directories))
+        if directories - watched:
+            self._watcher.addPaths(list(directories - watched))
+        for d in directories - watched:
+            self._dir_contents[d] = set(os.listdir(d))
+        for d in watched - directories:
+            del self._dir_contents[d]
+
+    def _directory_changed(self, _):
+        # wait for changes to settle; files could still be written
+        self._watch_timer.start()
+
+    def _add_new_files(self):
+        """Add files that appeared in watched directories since the last
+        check if they have an extension of listed files in the directory."""
+        added = []
+        listed = set(rp.abspath for rp in self.recent_paths)
+        for d, contents in self._dir_contents.items():
+            try:
+                current = set(os.listdir(d))
+            except OSError:
+                continue
+            self._dir_contents[d] = current
+            # the most recently added listed file of every extension
+            formats = {}
+            for rp in self.recent_paths:
+                if os.path.dirname(rp.abspath) == d:
+                    formats[os.path.splitext(rp.abspath)[1].lower()] = rp.file_format
+            for name in sorted(current - contents):
+                fn = os.path.join(d, name)
+                ext = os.path.splitext(name)[1].lower()
+                if ext in formats and fn not in listed and os.path.isfile(fn):
+                    added.append((fn, formats[ext]))
+
+        for fn, file_format in added:
+            reader = class_from_qualified_name(file_format) if file_format else None
+            self.add_path(fn, reader)
+            self.lb.addItem(fn)
+        if added:
+            self._update_sheet_combo()
+        if added or any(self._file_changed(i, key)
+                        for i, key in zip(self._loading, self._keys)):
+            self.update_data()
+
+    def _file_changed(self, i, key):
+        """Return True if the i-th file does not match the key it was read with.
+        Files whose reader can not be created anymore are marked as failed."""
+        try:
+            reader = _get_reader(self.recent_paths[i])
+            assert reader is not None
+        except Exception:  # pylint: disable=broad-except
+            self._show_error(self.lb.item(i), "Reader not found.")
+            self.Error.missing_reader()
+            return True
+        return _file_key(reader, self.sheet) != key
+
+    def on_exception(self, ex):
+        self.cancel_button.setEnabled(False)
+        if isinstance(ex, InterruptException):
+            return
+        raise ex
+
+    def cancel_loading(self):
+        self.cancel()
+        self.cancel_button.setEnabled(False)
+        for i in self._loading:
+            li = self.lb.item(i)
+            if li is not None and li.toolTip() == "Loading...":
+                li.setForeground(self.default_foreground)
+                li.setToolTip("")
+        self.Warning.cancelled()
+        self._set_data(None)
+
+    def _set_data(self, data):
+        self.data = data
+        if data is None:
             self.domain_editor.set_domain(None)
         else:
-            data = concatenate_data(data_list, fnok_list, self.label)
-            self.data = data
             self.openContext(data.domain)
-
         self.apply_domain_edit()  # sends data
 
+    def onDeleteWidget(self):
+        self._watch_timer.stop()
+        self.shutdown()
+        super().onDeleteWidget()
+
     def storeSpecificSettings(self):
         self.current_context.modified_variables = self.variables[:]
 
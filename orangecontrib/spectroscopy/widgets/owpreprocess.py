@@ -39,7 +39,7 @@ from AnyQt.QtGui import (
 )
 from AnyQt.QtCore import pyqtSignal as Signal, pyqtSlot as Slot, QObject
 
-from orangecontrib.spectroscopy.data import getx
+from orangecontrib.spectroscopy.data import getx, spectral_axis
 
 from orangecontrib.spectroscopy.preprocess import (
     PCADenoising, GaussianSmoothing, Cut, SavitzkyGolayFiltering,
@@ -593,9 +593,8 @@ class SpectralTransformEditor(BaseEditorOrange):
                 if len(self.reference) > 1 else "1 spectrum"
             self.reference_info.setText("Reference: " + rinfo)
             X_ref = self.reference.X[0]
-            x = getx(self.reference)
-            xsind = np.argsort(x)
-            self.reference_curve.setData(x=x[xsind], y=X_ref[xsind])
+            axis = spectral_axis(self.reference.domain)
+            self.reference_curve.setData(x=axis.x[axis.order], y=X_ref[axis.order])
             self.reference_curve.show()
 
 
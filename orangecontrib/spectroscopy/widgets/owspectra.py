@@ -40,7 +40,7 @@ except ImportError:
     from Orange.widgets.visualize.owscatterplotgraph import HelpEventDelegate
 
 
-from orangecontrib.spectroscopy.data import getx
+from orangecontrib.spectroscopy.data import spectral_axis
 from orangecontrib.spectroscopy.utils import apply_columns_numpy
 from orangecontrib.spectroscopy.widgets.line_geometry import \
     distance_curves, intersect_curves_chunked
@@ -1472,10 +1472,9 @@ class CurvePlot(QWidget, OWComponent, SelectionGroupMixin):
             self.restore_selection_settings()
 
             # get and sort input data
-            x = getx(self.data)
-            xsind = np.argsort(x)
-            self.data_x = x[xsind]
-            self.data_xsind = xsind
+            axis = spectral_axis(self.data.domain)
+            self.data_x = axis.x[axis.order]
+            self.data_xsind = axis.order
             self._set_subset_indices()  # refresh subset indices according to the current subset
             self.make_selection_valid()
         else:
@@ -29,6 +29,7 @@ from Orange.widgets.widget import Input, Msg, Output
 from Orange.widgets.utils.filedialogs import RecentPath
 
 from orangecontrib.spectroscopy import get_sample_datasets_dir
+from orangecontrib.spectroscopy.preprocess import Cut
 
 
 log = logging.getLogger(__name__)
@@ -74,6 +75,7 @@ class OWTilefile(widget.OWWidget, RecentPathsWComboMixin):
     xls_sheet = ContextSetting("")
     sheet_names = Setting({})
     url = Setting("")
+    workers = Setting(1)
 
     variables = ContextSetting([])
 
@@ -214,6 +216,8 @@ class OWTilefile(widget.OWWidget, RecentPathsWComboMixin):
 
         box = gui.vBox(self.controlArea, "Preprocessor")
         self.info_preproc = gui.widgetLabel(box, 'No preprocessor on input.')
+        gui.spin(box, self, "workers", 1, os.cpu_count() or 1,
+                 label="Worker processes:")
 
         self.Warning.file_too_big()
 
@@ -477,6 +481,18 @@ class OWTilefile(widget.OWWidget, RecentPathsWComboMixin):
         """
         return not(p is None or (isinstance(p, PreprocessorList) and len(p.preprocessors) == 0))
 
+    @staticmethod
+    def _head_cut_limits(p):
+        """
+        Return (low, high) limits of a Cut that is applied first, or None
+        """
+        while isinstance(p, PreprocessorList) and p.preprocessors:
+            p = p.preprocessors[0]
+        if isinstance(p, Cut) and not p.inverse:
+            return (-np.inf if p.lowlim is None else p.lowlim,
+                    np.inf if p.highlim is None else p.highlim)
+        return None
+
     @staticmethod
     def _format_preproc_str(p):
         pstring = str()
@@ -563,6 +579,9 @@ class OWTilefile(widget.OWWidget, RecentPathsWComboMixin):
             # set preprocessor here
             if hasattr(reader, "read_tile"):
                 reader.set_preprocessor(self.preprocessor)
+                reader.set_workers(self.workers)
+                # only read wavenumbers that a leading Cut keeps
+                reader.set_limits(self._head_cut_limits(self.preprocessor))
                 if self.preprocessor is not None:
                     self.info_preproc.setText(
                         self._format_preproc_str(self.preprocessor).lstrip("\n"))
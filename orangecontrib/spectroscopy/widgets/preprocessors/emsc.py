@@ -5,7 +5,7 @@ from PyQt5.QtGui import QColor
 from PyQt5.QtWidgets import QVBoxLayout, QLabel, QPushButton, QApplication, QStyle, QSizePolicy
 
 from Orange.widgets import gui
-from orangecontrib.spectroscopy.data import spectra_mean, getx
+from orangecontrib.spectroscopy.data import spectra_mean, spectral_axis
 from orangecontrib.spectroscopy.preprocess import EMSC
 from orangecontrib.spectroscopy.preprocess.emsc import SelectionFunction, SmoothedSelectionFunction
 from orangecontrib.spectroscopy.preprocess.npfunc import Sum
@@ -227,9 +227,8 @@ class EMSCEditor(BaseEditorOrange, PreviewMinMaxMixin):
             self.reference_info.setText("Reference: " + rinfo)
             self.reference_info.setStyleSheet("color: black")
             X_ref = spectra_mean(self.reference.X)
-            x = getx(self.reference)
-            xsind = np.argsort(x)
-            self.reference_curve.setData(x=x[xsind], y=X_ref[xsind])
+            axis = spectral_axis(self.reference.domain)
+            self.reference_curve.setData(x=axis.x[axis.order], y=X_ref[axis.order])
             self.reference_curve.setVisible(self.scaling)
 
     def update_weight_curve(self, params):
@@ -1,3 +1,5 @@
+import os
+
 from PyQt5.QtWidgets import QVBoxLayout, QLabel
 
 from Orange.widgets import gui
@@ -10,6 +12,7 @@ from orangecontrib.spectroscopy.widgets.preprocessors.emsc import EMSCEditor
 class MeEMSCEditor(EMSCEditor):
     MAX_ITER_DEFAULT = 30
     OUTPUT_MODEL_DEFAULT = False
+    WORKERS_DEFAULT = 1
 
     def __init__(self, parent=None, **kwargs):
         BaseEditorOrange.__init__(self, parent, **kwargs)
@@ -26,6 +29,10 @@ class MeEMSCEditor(EMSCEditor):
         gui.spin(self.controlArea, self, "max_iter", label="Max iterations", minv=0, maxv=100,
                  controlWidth=50, callback=self.edited.emit)
 
+        self.workers = self.WORKERS_DEFAULT
+        gui.spin(self.controlArea, self, "workers", label="Processes", minv=1,
+                 maxv=os.cpu_count() or 1, controlWidth=50, callback=self.edited.emit)
+
         self.reference_info = QLabel("", self)
         self.controlArea.layout().addWidget(self.reference_info)
 
@@ -44,6 +51,7 @@ class MeEMSCEditor(EMSCEditor):
 
         self.max_iter = params.get("max_iter", self.MAX_ITER_DEFAULT)
         self.output_model = params.get("output_model", self.OUTPUT_MODEL_DEFAULT)
+        self.workers = params.get("workers", self.WORKERS_DEFAULT)
         self._set_range_parameters(params)
 
         self.update_reference_info()
@@ -53,6 +61,7 @@ class MeEMSCEditor(EMSCEditor):
     def createinstance(cls, params):
         max_iter = params.get("max_iter", cls.MAX_ITER_DEFAULT)
         output_model = params.get("output_model", cls.OUTPUT_MODEL_DEFAULT)
+        workers = params.get("workers", cls.WORKERS_DEFAULT)
 
         weights = cls._compute_weights(params)
 
@@ -61,4 +70,4 @@ class MeEMSCEditor(EMSCEditor):
             return lambda data: data[:0]  # return an empty data table
         else:
             return ME_EMSC(reference=reference, weights=weights, max_iter=max_iter,
-                           output_model=output_model)
+                           output_model=output_model, workers=workers)
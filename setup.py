@@ -136,7 +136,7 @@ if __name__ == '__main__':
             'AnyQt>=0.0.6',
             'pyqtgraph>=0.10.0',
             'colorcet',
-            'h5py',
+            'h5py>=3',
             'extranormal3',
             'renishawWiRE>=0.1.8',
             'pillow',